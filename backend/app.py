@@ -1,4 +1,3 @@
-import os
 import sys
 from pathlib import Path
 
@@ -6,67 +5,90 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.append(str(backend_dir))
 
+import click
 from flask import Flask
 from flask_cors import CORS
 from flask_caching import Cache
-from flask_migrate import Migrate
 from config import Config
 from database import init_db, bcrypt, db
 from models.user import User
 from models.donation import Donation
+from models.article import Article, ArticleQuery, NewsCursor
+
+MIGRATIONS_DIR = backend_dir.parent / 'migrations'
+
+cache = Cache()
+
+
+def create_app(config_object=Config):
+    """Build the Flask app.
+
+    Nothing here touches the database or imports the model stack: tables are
+    created by ``flask db upgrade``, and the prediction and risk routes
+    import NumPy and the model registry on first use (or in the gunicorn
+    master, see ``gunicorn.conf.py``).
+    """
+    app = Flask(__name__)
+
+    # Enable CORS
+    CORS(app,
+         origins=[
+             "http://localhost:5173",
+             "https://disasterpredict.vercel.app",
+             "https://disaster-predict-1nfpgalad-tina-pudaris-projects.vercel.app"
+         ],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+         allow_headers=["Content-Type", "Authorization", "Accept", "Origin"],
+         supports_credentials=True,
+         expose_headers=["Content-Type", "Authorization", "X-Next-Cursor", "X-Model-Version"],
+         max_age=600)
+
+    # Load config
+    app.config.from_object(config_object)
+    if not app.config['JWT_SECRET_KEY'] and not app.debug:
+        app.logger.warning('JWT_SECRET_KEY is not set: /login will refuse to issue tokens')
+
+    # Set up caching (backend selected by Config.CACHE_TYPE)
+    cache.init_app(app)
+
+    # Initialize the database and services
+    init_db(app)
+    bcrypt.init_app(app)
+
+    # Alembic is slow to import and only the `flask db` commands need it
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=str(MIGRATIONS_DIR))
+
+    # Register blueprints
+    from routes.auth_routes import auth_bp
+    from routes.news_routes import news_bp
+    from routes.donation_routes import donation_bp
+    from routes.prediction_routes import prediction_bp, register_cache as register_prediction_cache
+    from routes.risk_routes import risk_bp
+
+    # Inject cache into routes
+    if app.config['PREDICTION_CACHE_SHARED']:
+        register_prediction_cache(cache)
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(news_bp)
+    app.register_blueprint(donation_bp, url_prefix='/api')
+    app.register_blueprint(prediction_bp, url_prefix='/api')
+    app.register_blueprint(risk_bp, url_prefix='/api')
+
+    from metrics import init_metrics
+    init_metrics(app)
+
+    # Registered after the metrics hooks so compression runs first and is timed
+    from serialization import init_serialization
+    init_serialization(app)
+
+    from commands import register_commands
+    register_commands(app)
+
+    return app
 
-app = Flask(__name__)
-migrate = Migrate(app, db)
-
-# Enable CORS
-CORS(app,
-     origins=[
-         "http://localhost:5173",
-         "https://disasterpredict.vercel.app",
-         "https://disaster-predict-1nfpgalad-tina-pudaris-projects.vercel.app"
-     ],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization", "Accept", "Origin"],
-     supports_credentials=True,
-     expose_headers=["Content-Type", "Authorization"],
-     max_age=600)
-
-# Load config
-app.config.from_object(Config)
-
-# Set up caching
-cache = Cache(config={'CACHE_TYPE': 'SimpleCache'})
-cache.init_app(app)
-
-# Initialize the database and services
-init_db(app)
-bcrypt.init_app(app)
-
-# Create all database tables
-with app.app_context():
-    db.create_all()
-    print("Database tables created successfully!")
-
-# Register blueprints
-from routes.auth_routes import auth_bp
-from routes.news_routes import news_bp, register_cache
-from routes.donation_routes import donation_bp
-from routes.prediction_routes import prediction_bp
-
-# Inject cache into routes
-register_cache(cache)
-
-app.register_blueprint(auth_bp)
-app.register_blueprint(news_bp)
-app.register_blueprint(donation_bp, url_prefix='/api')
-app.register_blueprint(prediction_bp, url_prefix='/api')
-
-@app.cli.command("init-db")
-def init_db_command():
-    """Creates the database tables."""
-    with app.app_context():
-        db.create_all()
-    print("Initialized the database.")
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
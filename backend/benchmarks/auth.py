@@ -0,0 +1,141 @@
+"""Logins per second and the per-request cost of token verification.
+
+* Logins: ``--clients`` threads log in as registered users for
+  ``--seconds``, while one more thread polls /api/health to show whether
+  other routes stay responsive. bcrypt runs on the bounded hash pool
+  (AUTH_HASH_WORKERS / AUTH_HASH_QUEUE); logins beyond it get a 503.
+* Auth overhead: ``decode_token`` with the JWT cache against a plain
+  ``jwt.decode``, and GET /api/donations/<id> with a cached token, with
+  the cache off and with no token.
+
+    python -m benchmarks.auth --clients 8 --seconds 5 --rounds 12
+"""
+import argparse
+import os
+import secrets
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('NEWS_WARMER_ENABLED', 'false')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'auth.db'))
+os.environ.setdefault('JWT_SECRET_KEY', secrets.token_hex(32))
+
+import jwt
+
+from app import create_app
+from config import Config
+from database import db
+from services import auth
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def per_request(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def login_storm(client, users, seconds):
+    statuses = {}
+    latencies = []
+    health = []
+    stop = time.perf_counter() + seconds
+    lock = threading.Lock()
+
+    def login(i):
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            status = client.post('/login', json={'username': users[i % len(users)], 'password': 'benchmark-pass'}).status_code
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+            i += 1
+
+    def poll_health():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            client.get('/api/health')
+            health.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login, args=(i,)) for i in range(len(users))]
+    threads.append(threading.Thread(target=poll_health))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses, latencies, health
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rounds', type=int, default=Config.BCRYPT_LOG_ROUNDS, help='bcrypt log rounds')
+    parser.add_argument('--requests', type=int, default=5000, help='requests per auth overhead case')
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        BCRYPT_LOG_ROUNDS = args.rounds
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+    users = [f'bench{i}' for i in range(args.clients)]
+    for name in users:
+        client.post('/register', json={'username': name, 'email': f'{name}@example.com', 'password': 'benchmark-pass'})
+
+    idle = []
+    for _ in range(200):
+        start = time.perf_counter()
+        client.get('/api/health')
+        idle.append(time.perf_counter() - start)
+
+    statuses, latencies, health = login_storm(client, users, args.seconds)
+    ok = statuses.get(200, 0)
+    print(f"bcrypt rounds {args.rounds}, {args.clients} clients, hash pool {Config.AUTH_HASH_WORKERS} "
+          f"threads + {Config.AUTH_HASH_QUEUE} queued, {os.cpu_count()} CPUs")
+    if latencies:
+        p50, p99 = percentiles(latencies)
+        print(f"logins             {ok / args.seconds:8.1f} /s   p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   "
+              f"statuses {dict(sorted(statuses.items()))}")
+    p50, p99 = percentiles(idle)
+    print(f"/api/health idle   p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+    p50, p99 = percentiles(health)
+    print(f"/api/health busy   p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   (during the logins)")
+
+    token = client.post('/login', json={'username': users[0], 'password': 'benchmark-pass'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    with app.app_context():
+        auth.decode_token(token)
+        cached = per_request(lambda: auth.decode_token(token), args.requests)
+        uncached = per_request(lambda: jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256']),
+                               args.requests)
+    print(f"decode_token       cached {cached:6.2f} us   jwt.decode {uncached:6.2f} us")
+
+    history = lambda h: client.get('/api/donations/1?limit=1', headers=h)
+    timings = {}
+    for label, h, cache_size in (('no token', {}, Config.JWT_CACHE_SIZE),
+                                 ('token, cached', headers, Config.JWT_CACHE_SIZE),
+                                 ('token, cache off', headers, 0)):
+        auth.token_cache.max_size = cache_size
+        auth.token_cache.clear()
+        history(h)
+        timings[label] = statistics.median(per_request(lambda: history(h), args.requests // 5) for _ in range(5))
+    auth.token_cache.max_size = Config.JWT_CACHE_SIZE
+    base = timings['no token']
+    for label, us in timings.items():
+        print(f"GET /api/donations {label:<17} {us:8.1f} us   auth {us - base:+6.1f} us")
+
+
+if __name__ == '__main__':
+    main()
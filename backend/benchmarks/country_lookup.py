@@ -0,0 +1,64 @@
+"""Lookups/sec for country names (exact and fuzzy) and for the coordinate raster.
+
+Uses the installed raster (COUNTRY_RASTER_PATH) when there is one, otherwise
+a random 0.1 degree raster of the same shape; lookup cost does not depend on
+the contents.
+
+    python -m benchmarks.country_lookup --points 1000000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from ml.countries import CountryRaster
+from ml.predict import registry
+
+
+def rate(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--scalar', type=int, default=100000)
+    args = parser.parse_args()
+
+    country_names = registry.bundle.country_names
+    exact = list(registry.bundle.countries.values()) * 50
+    variants = ['Philippines', 'South Korea', 'Phillipines', 'cote divoire', 'United States',
+                'Venezuela', 'Tanzania', 'the Netherlands', 'Republic of Moldova', 'Viet-nam'] * 100
+    print(f"names, exact spelling:  {rate(country_names.lookup, exact):12.0f} lookups/s")
+    print(f"names, variants/fuzzy:  {rate(country_names.lookup, variants):12.0f} lookups/s")
+
+    if Path(Config.COUNTRY_RASTER_PATH).exists():
+        raster = CountryRaster.load(Config.COUNTRY_RASTER_PATH)
+        source = Config.COUNTRY_RASTER_PATH
+    else:
+        rng = np.random.default_rng(0)
+        raster = CountryRaster(rng.integers(-1, 228, (1800, 3600)).astype(np.int16), 0.1)
+        source = 'random 0.1 degree raster'
+    print(f"raster: {source} {raster.raster.shape}")
+
+    rng = np.random.default_rng(1)
+    lat = rng.uniform(-90, 90, args.points)
+    lon = rng.uniform(-180, 180, args.points)
+    points = list(zip(lat[:args.scalar], lon[:args.scalar]))
+    scalar = rate(lambda point: raster.lookup(*point), points)
+    print(f"raster, one point/call: {scalar:12.0f} lookups/s ({1e6 / scalar:.1f} us each)")
+
+    raster.lookup(lat[:1000], lon[:1000])
+    start = time.perf_counter()
+    raster.lookup(lat, lon)
+    elapsed = time.perf_counter() - start
+    print(f"raster, {args.points} per call: {args.points / elapsed:12.0f} lookups/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Donation history and aggregates against a seeded SQLite table.
+
+Seeds ``--rows`` donations spread over ``--users`` users (a few heavy
+donors get a large share), then times, for the heaviest donor:
+
+- the old path: unindexed ``Donation.query.filter_by(...).all()`` with
+  full ORM hydration of every row,
+- the first and a deep keyset page of ``GET /api/donations/<id>`` with the
+  (user_id, created_at) index,
+- ``GET /api/donations/<id>/summary``.
+
+    python -m benchmarks.donation_history --rows 2000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def seed(path, rows, users):
+    conn = sqlite3.connect(path)
+    rng = random.Random(0)
+    start = datetime(2015, 1, 1)
+    currencies = ('USD', 'EUR', 'GBP')
+    batch = []
+    for i in range(rows):
+        # user 1 is the heavy donor with ~5% of all rows
+        user_id = 1 if rng.random() < 0.05 else rng.randint(2, users)
+        created = start + timedelta(seconds=rng.randint(0, 10 * 365 * 86400))
+        batch.append((user_id, rng.uniform(1, 500), rng.choice(currencies), 'credit_card',
+                      f'TX{i}', 'completed', created.isoformat(sep=' ')))
+        if len(batch) == 100000:
+            conn.executemany(
+                "INSERT INTO donation (user_id, amount, currency, payment_method, transaction_id, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany(
+            "INSERT INTO donation (user_id, amount, currency, payment_method, transaction_id, status, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--users', type=int, default=50000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'history.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('NEWS_WARMER_ENABLED', 'false')
+    from wsgi import app
+    from database import db
+    from models.donation import Donation
+    with app.app_context():
+        db.create_all()
+
+    start = time.perf_counter()
+    seed(path, args.rows, args.users)
+    print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f} s")
+
+    client = app.test_client()
+    with app.app_context():
+        def old_path():
+            donations = Donation.query.filter_by(user_id=1).all()
+            return [{'id': d.id, 'amount': float(d.amount), 'currency': d.currency,
+                     'date': d.created_at.isoformat()} for d in donations]
+
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_donation_user_id_created_at")
+        elapsed, result = timed(old_path, repeat=1)
+        print(f"old: unindexed full history   {elapsed:9.1f} ms  ({len(result)} rows)")
+
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("CREATE INDEX ix_donation_user_id_created_at ON donation (user_id, created_at)")
+            conn.commit()
+        elapsed, result = timed(old_path, repeat=1)
+        print(f"old: indexed full history     {elapsed:9.1f} ms  ({len(result)} rows)")
+
+    elapsed, response = timed(lambda: client.get('/api/donations/1?limit=50'))
+    print(f"new: first keyset page        {elapsed:9.1f} ms  (50 rows)")
+    cursor = response.headers['X-Next-Cursor']
+    for _ in range(200):
+        cursor = client.get(f'/api/donations/1?limit=50&cursor={cursor}').headers['X-Next-Cursor']
+    elapsed, _ = timed(lambda: client.get(f'/api/donations/1?limit=50&cursor={cursor}'))
+    print(f"new: keyset page 200          {elapsed:9.1f} ms  (50 rows)")
+    elapsed, _ = timed(lambda: client.get('/api/donations/1/summary'))
+    print(f"new: SQL summary              {elapsed:9.1f} ms")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Donation throughput under concurrent load: inline charge vs background pool.
+
+Starts gunicorn (4 sync workers, throwaway SQLite database) once with
+``DONATION_INLINE_PROCESSING=true`` (the old behaviour) and once with the
+background pool. Each run sends donations from ``--clients`` threads for
+``--seconds`` and reports accepted/sec, request latency, and how long the
+background pool then takes to settle everything that was accepted.
+
+    python -m benchmarks.donation_throughput --clients 32 --seconds 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def start_server(port, env_overrides):
+    env = dict(os.environ, **env_overrides)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'wsgi', 'db', 'upgrade'],
+                   cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', '4',
+         '--bind', f'127.0.0.1:{port}', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/health', timeout=1)
+            return server
+        except (requests.ConnectionError, requests.Timeout):
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not start')
+
+
+def drive(base_url, clients, seconds):
+    stop_at = time.perf_counter() + seconds
+    latencies = []
+    donation_ids = []
+    lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            response = session.post(f'{base_url}/api/donate', json={'user_id': 1, 'amount': 5})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                donation_ids.append(response.json().get('donation_id'))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, donation_ids, time.perf_counter() - start
+
+
+def wait_settled(base_url, donation_ids, timeout=120):
+    start = time.perf_counter()
+    last = donation_ids[-1]
+    while time.perf_counter() - start < timeout:
+        if requests.get(f'{base_url}/api/donate/{last}').json().get('status') not in ('pending', 'processing'):
+            return time.perf_counter() - start
+        time.sleep(0.1)
+    return float('nan')
+
+
+def run(label, inline, port, clients, seconds):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    server = start_server(port, {
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'DONATION_INLINE_PROCESSING': str(inline).lower(),
+        'NEWS_WARMER_ENABLED': 'false',
+    })
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        latencies, donation_ids, elapsed = drive(base_url, clients, seconds)
+        settle = 0.0 if inline else wait_settled(base_url, [i for i in donation_ids if i])
+        latencies.sort()
+        print(f"{label:<11} {len(latencies) / elapsed:7.1f} donations/sec accepted   "
+              f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms   "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms   "
+              f"settled {settle:5.1f} s after load")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5077)
+    args = parser.parse_args()
+
+    run('inline', True, args.port, args.clients, args.seconds)
+    run('background', False, args.port + 1, args.clients, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Concurrent donation writes on SQLite: default engine settings vs the tuned ones.
+
+Starts gunicorn (4 workers, throwaway SQLite database) twice. Both runs
+send donations from ``--clients`` threads for ``--seconds``, while
+``--readers`` more threads page through donation history. Each donation
+is two writes from different threads: the insert in the request and the
+status update by the payment pool (``PAYMENT_PROCESSING_DELAY=0``, so the
+updates land while inserts are still arriving).
+
+* ``before``: SQLite's defaults: rollback journal, ``synchronous=FULL``,
+  and pysqlite's 5 s lock wait.
+* ``after``: ``SQLITE_JOURNAL_MODE=WAL``, ``SQLITE_SYNCHRONOUS=NORMAL``
+  and ``SQLITE_BUSY_TIMEOUT_MS`` from Config.
+
+It reports donations accepted per second, write and read latency, and
+failed requests ("database is locked" surfaces as a 500).
+
+    python -m benchmarks.donation_writes --clients 32 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.donation_throughput import drive, start_server, wait_settled
+
+BEFORE = {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT_MS': '5000'}
+
+
+def read_history(base_url, stop):
+    latencies = []
+    failures = 0
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            ok = session.get(f'{base_url}/api/donations/1?limit=20', timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        failures += not ok
+    return latencies, failures
+
+
+def run(label, env, port, args):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    server = start_server(port, dict(env, **{
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'PAYMENT_PROCESSING_DELAY': '0',
+        'NEWS_WARMER_ENABLED': 'false',
+    }))
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        requests.post(f'{base_url}/register', json={
+            'username': 'bench', 'email': 'bench@example.com', 'password': 'benchmark-pass'})
+        stop = threading.Event()
+        reads = []
+        readers = [threading.Thread(target=lambda: reads.append(read_history(base_url, stop)))
+                   for _ in range(args.readers)]
+        for reader in readers:
+            reader.start()
+        latencies, donation_ids, elapsed = drive(base_url, args.clients, args.seconds)
+        stop.set()
+        for reader in readers:
+            reader.join()
+        accepted = [i for i in donation_ids if i]
+        settle = wait_settled(base_url, accepted) if accepted else float('nan')
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    read_latencies = sorted(latency for samples, _ in reads for latency in samples)
+    print(f"{label:<7} {len(accepted) / elapsed:7.1f} donations/sec   "
+          f"write p50 {latencies[len(latencies) // 2] * 1000:7.1f}   p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms   "
+          f"failed {len(donation_ids) - len(accepted):4}   settled {settle:5.1f} s")
+    if read_latencies:
+        print(f"{'':<7} {len(read_latencies) / elapsed:7.1f} history reads/sec   "
+              f"read  p50 {read_latencies[len(read_latencies) // 2] * 1000:7.1f}   "
+              f"p99 {read_latencies[int(len(read_latencies) * 0.99)] * 1000:7.1f} ms   "
+              f"failed {sum(failures for _, failures in reads):4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5081)
+    args = parser.parse_args()
+
+    run('before', BEFORE, args.port, args)
+    run('after', {}, args.port + 1, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Check the compiled forest against sklearn and compare latency/throughput.
+
+Verifies on a random test corpus (including NaNs) that
+``CompiledForest.predict_proba`` is bit-for-bit identical to
+``RandomForestClassifier.predict_proba``, then times both at batch sizes
+1, 100 and 100k.
+
+    python -m benchmarks.forest_engine
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ml.forest_engine import CompiledForest
+from ml.predict import registry
+
+
+def corpus(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = registry.scaler.transform(np.column_stack([
+        rng.integers(1900, 2024, n_rows),
+        rng.integers(0, 6, n_rows),
+        rng.uniform(0, 200000, n_rows),
+        rng.integers(0, 228, n_rows),
+        rng.uniform(0, 4000, n_rows),
+        rng.uniform(0, 2500, n_rows),
+    ]).astype(np.float64))
+    X[rng.random(n_rows) < 0.01, 2] = np.nan
+    return X
+
+
+def best_time(fn, X, min_seconds=1.0):
+    runs = 0
+    best = float('inf')
+    start = time.perf_counter()
+    while runs < 3 or time.perf_counter() - start < min_seconds:
+        t0 = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - t0)
+        runs += 1
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check-rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    model = registry.model
+    engine = CompiledForest.from_sklearn(model)
+
+    X = corpus(args.check_rows)
+    identical = np.array_equal(model.predict_proba(X), engine.predict_proba(X))
+    same_labels = np.array_equal(model.predict(X), engine.predict(X))
+    print(f"{args.check_rows} rows: predict_proba bit-identical={identical}, labels identical={same_labels}")
+
+    for batch in (1, 100, 100000):
+        Xb = corpus(batch, seed=batch)
+        sk = best_time(model.predict, Xb)
+        compiled = best_time(engine.predict, Xb)
+        print(f"batch {batch:>6}: sklearn {sk * 1000:9.3f} ms ({batch / sk:11.0f} rows/s)   "
+              f"compiled {compiled * 1000:9.3f} ms ({batch / compiled:11.0f} rows/s)   {sk / compiled:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
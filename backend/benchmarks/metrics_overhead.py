@@ -0,0 +1,105 @@
+"""Measure what the /metrics instrumentation costs per request.
+
+Two views of the same number:
+
+* Direct: the cost of the request hooks and of one ``stage()`` timer,
+  times the number of stages each endpoint records, against the endpoint's
+  uninstrumented latency. This is stable even on a noisy machine.
+* End to end: alternating rounds of identical requests against an app built
+  with METRICS_ENABLED and one without, best round of each.
+
+/api/health is the worst case (almost no work to hide the hooks behind).
+
+    python -m benchmarks.metrics_overhead --requests 1000 --rounds 9
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('NEWS_WARMER_ENABLED', 'false')
+
+from app import create_app
+from config import Config
+from metrics import metrics, stage, _before_request, _after_request, _teardown_request
+
+EVENT = {'year': 2020, 'mag_scale_index': 1, 'dis_mag_value': 6.0,
+         'country_code_index': 3, 'longitude': 1.0, 'latitude': 1.0}
+
+
+class MetricsOff(Config):
+    METRICS_ENABLED = False
+
+
+def per_request(client, method, url, n, json=None):
+    send = client.post if method == 'POST' else client.get
+    start = time.perf_counter()
+    for _ in range(n):
+        send(url, json=json)
+    return (time.perf_counter() - start) / n
+
+
+def stage_count(route):
+    """Stage observations recorded so far for ``route``"""
+    return sum(histogram.count for (name, labels), histogram in metrics._histograms.items()
+               if name == 'disaster_stage_duration_seconds' and ('route', route) in labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=9)
+    args = parser.parse_args()
+
+    off_app = create_app(MetricsOff)
+    on_app = create_app(Config)
+    off, on = off_app.test_client(), on_app.test_client()
+    metrics.enabled = True
+
+    n = 100000
+    start = time.perf_counter()
+    for _ in range(n):
+        with stage('bench'):
+            pass
+    stage_us = (time.perf_counter() - start) / n * 1e6
+
+    with on_app.test_request_context('/api/health'):
+        response = on_app.response_class()
+        start = time.perf_counter()
+        for _ in range(n):
+            _before_request()
+            _after_request(response)
+            _teardown_request(None)
+        hooks_us = (time.perf_counter() - start) / n * 1e6
+    print(f"one stage() timer: {stage_us:.2f} us   request hooks: {hooks_us:.2f} us")
+
+    cases = [
+        ('GET', '/api/health', None),
+        ('POST', '/api/predict', EVENT),
+        ('POST', '/api/predict/batch', [EVENT] * 100),
+    ]
+    for method, url, body in cases:
+        for client in (off, on):
+            per_request(client, method, url, 50, body)  # warm up (model load, cache)
+        metrics.enabled = True
+        before = stage_count(url)
+        per_request(on, method, url, 100, body)
+        stages = (stage_count(url) - before) / 100
+
+        timings = {'off': [], 'on': []}
+        order = [('off', off), ('on', on)]
+        for _ in range(args.rounds):
+            order.reverse()  # alternate which app runs first
+            for label, client in order:
+                metrics.enabled = label == 'on'
+                timings[label].append(per_request(client, method, url, args.requests, body))
+        base = min(timings['off']) * 1e6
+        instrumented = min(timings['on']) * 1e6
+        direct = hooks_us + stages * stage_us
+        print(f"{method:4} {url:<20} {base:8.1f} us uninstrumented, {stages:.0f} stages   "
+              f"direct {direct:5.1f} us ({direct / base * 100:4.1f}%)   "
+              f"end to end {instrumented - base:+6.1f} us ({(instrumented / base - 1) * 100:+5.1f}%)")
+    metrics.enabled = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Per-worker RSS/PSS and cold-start time with and without master preloading.
+
+Forks worker processes the way gunicorn does and has each one score a row:
+
+- ``per-worker``: every worker loads the model itself after the fork
+  (the old ``gunicorn app:app`` behaviour).
+- ``preloaded``: the master loads once before forking (``gunicorn.conf.py``).
+
+PSS splits shared pages between the processes mapping them, so it shows
+how much of the forest is actually shared. Linux only.
+
+    python -m benchmarks.model_loading --workers 4
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from ml.predict import COUNTRY_MAPPING, DISASTER_MAPPING, MAGNITUDE_SCALE_MAPPING, MODEL_DIR, registry
+from ml.registry import ModelRegistry
+
+ROW = np.array([[2000, 1, 6.5, 89, 1000, 800]], dtype=np.float64)
+
+
+def memory_kb():
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0][:-1].lower()] = int(parts[1])
+    return values
+
+
+def run_workers(n_workers, worker_registry, hold_seconds=1.0):
+    """Fork workers, let each score one row, and collect their stats"""
+    children = []
+    for _ in range(n_workers):
+        read_fd, write_fd = os.pipe()
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            worker_registry.model.predict(worker_registry.scaler.transform(ROW))
+            stats = {'cold_start_s': time.perf_counter() - forked_at}
+            # Keep every worker alive while the others measure, so PSS is shared
+            time.sleep(hold_seconds)
+            stats.update(memory_kb())
+            os.write(write_fd, json.dumps(stats).encode())
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    results = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd) as f:
+            results.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    return results
+
+
+def summarize(label, results):
+    mean = lambda key: sum(r[key] for r in results) / len(results)
+    print(f"{label:<11} cold start {mean('cold_start_s') * 1000:8.1f} ms   "
+          f"RSS {mean('rss') / 1024:7.1f} MiB   PSS {mean('pss') / 1024:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    fresh = ModelRegistry(MODEL_DIR, disaster_types=DISASTER_MAPPING, countries=COUNTRY_MAPPING,
+                          magnitude_scales=MAGNITUDE_SCALE_MAPPING)
+    summarize('per-worker', run_workers(args.workers, fresh))
+
+    registry.preload()
+    print(f"master preload took {registry.load_seconds * 1000:.1f} ms")
+    summarize('preloaded', run_workers(args.workers, registry))
+
+
+if __name__ == '__main__':
+    main()
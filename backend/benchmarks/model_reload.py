@@ -0,0 +1,114 @@
+"""Activating a new model bundle under load: failed requests and latency around the swap.
+
+Builds two bundles in a throwaway MODEL_BUNDLE_DIR: ``v1`` from the files
+in ml/ and ``v2``, the same forest cut to its first ``--v2-trees`` trees
+(a different checksum, so the prediction cache is invalidated too).
+gunicorn serves v1 with ``MODEL_RELOAD_INTERVAL=--interval`` while
+``--clients`` threads post single predictions; ``activate_bundle('v2')``
+runs halfway through. No worker is restarted.
+
+It reports failed requests (should be 0), latency before and after the
+activation, and how long it took until every response came from v2.
+
+    python -m benchmarks.model_reload --clients 16 --seconds 10 --interval 1
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import requests
+
+from benchmarks.suite import percentile, sample_events, start_server
+from ml.bundle import FILES, activate_bundle, build_bundle
+from ml.predict import COUNTRY_MAPPING, DISASTER_MAPPING, MAGNITUDE_SCALE_MAPPING, MODEL_DIR
+
+
+def build_bundles(bundle_dir, v2_trees):
+    defaults = {'disaster_types': DISASTER_MAPPING, 'countries': COUNTRY_MAPPING,
+                'magnitude_scales': MAGNITUDE_SCALE_MAPPING}
+    build_bundle(bundle_dir, MODEL_DIR, version='v1', **defaults)
+    activate_bundle(bundle_dir, 'v1')
+    source = Path(tempfile.mkdtemp())
+    try:
+        for member in ('scaler', 'country_encoder', 'disaster_type_encoder', 'magnitude_scale_encoder'):
+            if (MODEL_DIR / FILES[member]).exists():
+                shutil.copy2(MODEL_DIR / FILES[member], source / FILES[member])
+        model = joblib.load(MODEL_DIR / FILES['model'])
+        model.estimators_ = model.estimators_[:v2_trees]
+        model.n_estimators = len(model.estimators_)
+        joblib.dump(model, source / FILES['model'])
+        build_bundle(bundle_dir, source, version='v2', **defaults)
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+
+
+def client(base_url, events, stop, samples, seed):
+    rng = random.Random(seed)
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = session.post(f'{base_url}/api/predict', json=rng.choice(events), timeout=30)
+            version = response.headers.get('X-Model-Version') if response.status_code == 200 else None
+        except requests.RequestException:
+            version = None
+        samples.append((start, time.perf_counter() - start, version))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--interval', type=float, default=1, help='MODEL_RELOAD_INTERVAL for the workers')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--v2-trees', type=int, default=50)
+    parser.add_argument('--port', type=int, default=5091)
+    args = parser.parse_args()
+
+    bundle_dir = Path(tempfile.mkdtemp()) / 'bundles'
+    build_bundles(bundle_dir, args.v2_trees)
+    events = sample_events(500)
+    server = start_server(args.port, args.workers, {
+        'DATABASE_URL': f'sqlite:///{tempfile.mkdtemp()}/bench.db',
+        'NEWS_WARMER_ENABLED': 'false',
+        'MODEL_BUNDLE_DIR': str(bundle_dir),
+        'MODEL_RELOAD_INTERVAL': str(args.interval),
+    })
+    samples = []
+    stop = threading.Event()
+    try:
+        base_url = f'http://127.0.0.1:{args.port}'
+        threads = [threading.Thread(target=client, args=(base_url, events, stop, samples, seed))
+                   for seed in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds / 2)
+        activated_at = time.perf_counter()
+        activate_bundle(bundle_dir, 'v2')
+        time.sleep(args.seconds / 2)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(bundle_dir.parent, ignore_errors=True)
+
+    failed = sum(1 for _, _, version in samples if version is None)
+    before = sorted(latency for start, latency, _ in samples if start < activated_at)
+    after = sorted(latency for start, latency, _ in samples if start >= activated_at)
+    last_v1 = max((start for start, _, version in samples if version == 'v1'), default=activated_at)
+    print(f"{len(samples)} requests, {failed} failed, {args.workers} workers, reload interval {args.interval}s")
+    for label, latencies in (('before', before), ('after', after)):
+        print(f"{label:<7} {len(latencies):6} requests   p50 {percentile(latencies, 0.5) * 1000:7.2f}   "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.2f}   max {max(latencies, default=0) * 1000:7.2f} ms")
+    print(f"all responses from v2 {max(0.0, last_v1 - activated_at):.2f}s after activation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Offline p50/p99 of a news refresh: sequential vs concurrent provider fetches.
+
+Runs both providers as local stubs with lognormal latency (the Guardian
+stub is made slower and heavier-tailed), then times a refresh done the
+old way (NewsAPI, then the Guardian) against ``fetch_all_news``.
+
+    python -m benchmarks.news_fanout --refreshes 200
+"""
+import argparse
+import time
+
+from wsgi import app
+from benchmarks.stub_upstreams import lognormal_latency, start_stub_upstreams
+from config import Config
+from services.news_service import fetch_all_news, get_guardian_news, get_newsapi_news
+
+
+def sequential(limit, query):
+    return {
+        'newsapi': get_newsapi_news(limit, query, timeout=Config.NEWSAPI_TIMEOUT),
+        'guardian': get_guardian_news(limit, query, timeout=Config.GUARDIAN_TIMEOUT),
+    }
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def run(fetch, refreshes):
+    latencies = []
+    partial = 0
+    for _ in range(refreshes):
+        start = time.perf_counter()
+        results = fetch(5, 'natural disasters')
+        latencies.append(time.perf_counter() - start)
+        partial += len(results) < 2
+    return latencies, partial
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--refreshes', type=int, default=200)
+    parser.add_argument('--newsapi-median', type=float, default=0.08, help='seconds')
+    parser.add_argument('--guardian-median', type=float, default=0.15, help='seconds')
+    parser.add_argument('--total-timeout', type=float, default=0.5, help='overall deadline, seconds')
+    args = parser.parse_args()
+
+    newsapi, guardian = start_stub_upstreams(
+        lognormal_latency(args.newsapi_median),
+        lognormal_latency(args.guardian_median, sigma=0.9),
+    )
+    Config.NEWS_TOTAL_TIMEOUT = args.total_timeout
+    try:
+        with app.app_context():
+            for label, fetch in (('sequential', sequential), ('concurrent', fetch_all_news)):
+                latencies, partial = run(fetch, args.refreshes)
+                p50, p99 = percentiles(latencies)
+                print(f"{label:<11} p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   partial results {partial}")
+    finally:
+        newsapi.close()
+        guardian.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Upstream traffic and latency of /api/disaster-news on the article store.
+
+Replays ``--requests`` news requests per refresh period, with the limits
+and queries the frontend mixes, against stub providers. It runs for
+``--periods`` periods, ageing the store's cursors by NEWS_CACHE_TTL
+between them. It then reports:
+
+* upstream calls and articles transferred by the store's incremental
+  refreshes, against the old cache keyed on (query, limit), which refetched
+  a full ``limit``-sized page per provider for every key in every period;
+* response latency of a store read against the old miss path: fetch every
+  provider, standardize, merge.
+
+    python -m benchmarks.news_store --requests 200 --periods 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+os.environ.setdefault('NEWS_WARMER_ENABLED', 'false')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'news_store.db'))
+
+from benchmarks.stub_upstreams import lognormal_latency, start_stub_upstreams
+from app import create_app
+from database import db
+from models.article import NewsCursor
+from routes.news_routes import _key_lock, _next_due
+from services import news_store
+from services.news_service import fetch_all_news, standardize_article
+
+LIMITS = (5, 10, 20)
+QUERIES = ('natural disasters', 'earthquake', 'flood')
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def refetch(limit, query):
+    """What every miss and refresh did before the store"""
+    results = fetch_all_news(limit, query)
+    articles = [standardize_article(item, provider) for provider, items in results.items() for item in items or ()]
+    return sorted(articles, key=lambda x: x.get('published') or '', reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='requests per refresh period')
+    parser.add_argument('--periods', type=int, default=5)
+    parser.add_argument('--upstream-median', type=float, default=0.05, help='stub provider latency, seconds')
+    args = parser.parse_args()
+
+    newsapi, guardian = start_stub_upstreams(lognormal_latency(args.upstream_median),
+                                             lognormal_latency(args.upstream_median))
+    app = create_app()
+    client = app.test_client()
+    rng = random.Random(0)
+    try:
+        with app.app_context():
+            db.create_all()
+            ttl = app.config['NEWS_CACHE_TTL']
+
+        latencies = []
+        keys_per_period = []
+        for _ in range(args.periods):
+            keys = set()
+            for _ in range(args.requests):
+                limit, query = rng.choice(LIMITS), rng.choice(QUERIES)
+                keys.add((query, limit))
+                start = time.perf_counter()
+                client.get('/api/disaster-news', query_string={'limit': limit, 'query': query})
+                latencies.append(time.perf_counter() - start)
+            keys_per_period.append(keys)
+            for query in QUERIES:
+                with _key_lock(news_store.normalize_query(query)):
+                    pass  # wait for background refreshes
+            with app.app_context():
+                for cursor in db.session.scalars(db.select(NewsCursor)):
+                    cursor.fetched_at -= timedelta(seconds=ttl)
+                    cursor.attempted_at -= timedelta(seconds=ttl)
+                db.session.commit()
+            _next_due.clear()  # the workers' memo of when queries fall due, as if time had passed
+        store_calls = newsapi.requests + guardian.requests
+        store_articles = newsapi.articles + guardian.articles
+
+        newsapi.requests = guardian.requests = newsapi.articles = guardian.articles = 0
+        refetch_latencies = []
+        with app.app_context():
+            for keys in keys_per_period:
+                for query, limit in keys:
+                    start = time.perf_counter()
+                    refetch(limit, query)
+                    refetch_latencies.append(time.perf_counter() - start)
+        refetch_calls = newsapi.requests + guardian.requests
+        refetch_articles = newsapi.articles + guardian.articles
+    finally:
+        newsapi.close()
+        guardian.close()
+
+    total = args.requests * args.periods
+    print(f"{total} requests over {args.periods} refresh periods")
+    print(f"upstream calls     store {store_calls:5}   refetch per (query, limit) {refetch_calls:5}")
+    print(f"articles fetched   store {store_articles:5}   refetch per (query, limit) {refetch_articles:5}")
+    p50, p99 = percentiles(latencies)
+    print(f"store read         p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   (every request, first fetches included)")
+    p50, p99 = percentiles(refetch_latencies)
+    print(f"refetch (old miss) p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
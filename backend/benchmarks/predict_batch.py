@@ -0,0 +1,73 @@
+"""Compare rows/sec of /api/predict (one row per request) and /api/predict/batch.
+
+Run from the backend directory:
+
+    python -m benchmarks.predict_batch --rows 50000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from wsgi import app
+
+
+def make_events(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        'year': int(rng.integers(1900, 2024)),
+        'mag_scale_index': int(rng.integers(0, 6)),
+        'dis_mag_value': float(rng.uniform(0, 100000)),
+        'country_code_index': int(rng.integers(0, 228)),
+        # The API takes degrees; anything else is a 400
+        'longitude': float(rng.uniform(-180, 180)),
+        'latitude': float(rng.uniform(-90, 90)),
+    } for _ in range(n_rows)]
+
+
+def check_events(client, events):
+    """Fail before timing anything if the events don't all score cleanly"""
+    response = client.post('/api/predict', json=events[0])
+    assert response.status_code == 200, response.get_json()
+    response = client.post('/api/predict/batch', json=events[:1000])
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['errors'] == 0, next(r for r in response.get_json()['results'] if not r['success'])
+
+
+def bench_single(client, events):
+    start = time.perf_counter()
+    for event in events:
+        response = client.post('/api/predict', json=event)
+        assert response.status_code == 200, response.get_json()
+    return len(events) / (time.perf_counter() - start)
+
+
+def bench_batch(client, events):
+    start = time.perf_counter()
+    response = client.post('/api/predict/batch', json=events)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['errors'] == 0, 'some rows were rejected'
+    return len(events) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000, help='rows scored through the batch endpoint')
+    parser.add_argument('--single-rows', type=int, default=500, help='rows scored one request at a time')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    single_events, batch_events = make_events(args.single_rows), make_events(args.rows)
+    check_events(client, single_events)
+    check_events(client, batch_events)
+    single_rate = bench_single(client, single_events)
+    batch_rate = bench_batch(client, batch_events)
+
+    print(f"single-row path: {single_rate:10.1f} rows/sec ({args.single_rows} requests)")
+    print(f"batch path:      {batch_rate:10.1f} rows/sec ({args.rows} rows, 1 request)")
+    print(f"speedup:         {batch_rate / single_rate:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
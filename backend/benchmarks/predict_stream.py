@@ -0,0 +1,102 @@
+"""Peak server memory of /api/predict/stream vs /api/predict/batch.
+
+Starts gunicorn with one worker and uploads ``--rows`` synthetic events
+as a chunked NDJSON body (generated on the fly, so the client holds none
+of it), reading the NDJSON results as they arrive. The memory (PSS) of
+the gunicorn master and worker is sampled throughout. For contrast,
+/api/predict/batch is sent ``--batch-rows`` rows as one JSON document.
+
+    python -m benchmarks.predict_stream --rows 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.suite import MemorySampler, process_tree_memory, sample_events, start_server
+
+
+def ndjson_body(rows, template):
+    """Yield the upload in ~64 KB pieces, cycling through ``template`` events"""
+    lines = [json.dumps(event) + '\n' for event in template]
+    buffer = []
+    size = 0
+    for i in range(rows):
+        line = lines[i % len(lines)]
+        buffer.append(line)
+        size += len(line)
+        if size >= 65536:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def run_stream(base_url, pid, rows, chunk_size, template):
+    sampler = MemorySampler(pid, interval=0.05)
+    start = time.perf_counter()
+    response = requests.post(f'{base_url}/api/predict/stream?chunk_size={chunk_size}',
+                             data=ndjson_body(rows, template),
+                             headers={'Content-Type': 'application/x-ndjson'}, stream=True)
+    results = 0
+    summary = None
+    for line in response.iter_lines():
+        record = json.loads(line)
+        if 'done' in record:
+            summary = record
+        else:
+            results += 1
+    elapsed = time.perf_counter() - start
+    memory = sampler.stop()
+    if not summary or not summary['done'] or results != rows:
+        raise RuntimeError(f'stream ended early after {results} rows: {summary}')
+    return elapsed, memory
+
+
+def run_batch(base_url, pid, rows, template):
+    sampler = MemorySampler(pid, interval=0.05)
+    start = time.perf_counter()
+    events = [template[i % len(template)] for i in range(rows)]
+    response = requests.post(f'{base_url}/api/predict/batch', json=events)
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed, sampler.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=5097)
+    args = parser.parse_args()
+
+    template = sample_events(1000)
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    # One worker so the numbers are that worker's; a long timeout for the big stream
+    server = start_server(args.port, 1, {'DATABASE_URL': f'sqlite:///{db_path}', 'NEWS_WARMER_ENABLED': 'false'},
+                          extra_args=('--timeout', '3600'))
+    base_url = f'http://127.0.0.1:{args.port}'
+    try:
+        requests.post(f'{base_url}/api/predict/batch', json=template[:10]).raise_for_status()  # load the model
+        idle = process_tree_memory(server.pid) / 2 ** 20
+        print(f"idle server {idle:.1f} MB")
+        for label, rows, run in [
+            # Streams first: memory the batch frees is not handed back to the OS
+            ('stream', args.batch_rows, lambda rows: run_stream(base_url, server.pid, rows, args.chunk_size, template)),
+            ('stream', args.rows, lambda rows: run_stream(base_url, server.pid, rows, args.chunk_size, template)),
+            ('batch', args.batch_rows, lambda rows: run_batch(base_url, server.pid, rows, template)),
+        ]:
+            elapsed, memory = run(rows)
+            print(f"{label:<7} {rows:>9} rows   {elapsed:7.1f} s   {rows / elapsed:9.0f} rows/s   "
+                  f"peak {memory['memory_peak_mb']:7.1f} MB ({memory['memory_peak_mb'] - idle:+.1f} over idle)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
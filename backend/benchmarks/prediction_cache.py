@@ -0,0 +1,91 @@
+"""Replay /api/predict traffic with and without the prediction cache.
+
+By default a synthetic log is generated that mirrors the form traffic: a
+Zipf-distributed set of (country, magnitude scale, year) combinations with
+coordinates jittered below the cache resolution. Pass ``--log`` to replay
+a file of JSON request bodies, one per line, instead.
+
+    python -m benchmarks.prediction_cache --requests 5000
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from wsgi import app
+from ml.predict import prediction_cache
+
+
+def synthetic_log(n_requests, n_hot_keys=200, seed=0):
+    rng = np.random.default_rng(seed)
+    hot = [{
+        'year': int(rng.integers(1990, 2024)),
+        'mag_scale_index': int(rng.integers(0, 6)),
+        'dis_mag_value': round(float(rng.uniform(1, 10)), 1),
+        'country_code_index': int(rng.integers(0, 228)),
+        # Degrees, kept clear of the edges so the jitter below stays in range
+        'longitude': float(rng.uniform(-179, 179)),
+        'latitude': float(rng.uniform(-89, 89)),
+    } for _ in range(n_hot_keys)]
+    ranks = np.minimum(rng.zipf(1.3, n_requests), n_hot_keys) - 1
+    log = []
+    for rank in ranks:
+        body = dict(hot[rank])
+        body['longitude'] += float(rng.uniform(-0.004, 0.004))
+        body['latitude'] += float(rng.uniform(-0.004, 0.004))
+        log.append(body)
+    return log
+
+
+def replay(client, log):
+    latencies = []
+    for body in log:
+        start = time.perf_counter()
+        response = client.post('/api/predict', json=body)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+    latencies.sort()
+    return {
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--log', help='file of JSON request bodies, one per line')
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log) as f:
+            log = [json.loads(line) for line in f if line.strip()]
+    else:
+        log = synthetic_log(args.requests)
+
+    client = app.test_client()
+    # Every body must score, or the timings below would be of error responses
+    for body in log:
+        response = client.post('/api/predict', json=body)
+        assert response.status_code == 200, (body, response.get_json())
+    max_size = prediction_cache.max_size
+
+    prediction_cache.max_size = 0
+    uncached = replay(client, log)
+
+    prediction_cache.max_size = max_size
+    prediction_cache.clear()
+    cached = replay(client, log)
+    stats = prediction_cache.stats()
+
+    for label, result in (('uncached', uncached), ('cached', cached)):
+        print(f"{label:<9} mean {result['mean_ms']:7.2f} ms   p50 {result['p50_ms']:7.2f} ms   "
+              f"p99 {result['p99_ms']:7.2f} ms")
+    print(f"hit rate {stats['hit_rate']:.1%} over {len(log)} requests")
+
+
+if __name__ == '__main__':
+    main()
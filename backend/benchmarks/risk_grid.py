@@ -0,0 +1,65 @@
+"""Build a risk grid with 1..N workers and compare a map tile served from it
+with scoring the same cells one /api/predict request at a time.
+
+Needs a country raster (``flask build-country-raster``) and a model with a
+coordinate encoder (``ml/coordinates.py``); ``build_risk_grid`` refuses to
+sweep without them. Run from the backend directory:
+
+    python -m benchmarks.risk_grid --resolution 1 --workers 1,2,4
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from config import Config
+from ml.predict import MODEL_PATH, registry
+from ml.risk_grid import build_risk_grid, raster_country
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--resolution', type=float, default=1.0)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    registry.preload(include_model=True)
+    resolver = raster_country(Config.COUNTRY_RASTER_PATH, Config.RISK_GRID_COUNTRY_INDEX)
+    path = Path(tempfile.mkdtemp()) / 'risk_grid.npy'
+    for workers in [int(n) for n in args.workers.split(',')]:
+        meta = build_risk_grid(path, MODEL_PATH, resolver, resolution=args.resolution, workers=workers)
+        print(f"build with {workers} workers: {meta['cells']} cells in {meta['seconds']:.2f}s "
+              f"({meta['cells'] / meta['seconds']:.0f} cells/s), {path.stat().st_size / 1e6:.1f} MB")
+
+    from wsgi import app
+    Config.RISK_GRID_PATH = str(path)
+    client = app.test_client()
+
+    tile = '/api/risk/tiles/4/8/5?scale=1&magnitude=6'
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        client.get(tile)
+    tile_ms = (time.perf_counter() - start) / args.requests * 1000
+
+    body = client.get(tile).get_json()
+    rows, cols = len(body['labels']), len(body['labels'][0])
+    north, west = body['bounds']['north'], body['bounds']['west']
+    res = body['resolution']
+    sample = min(rows * cols, 200)
+    start = time.perf_counter()
+    for n in range(sample):
+        i, j = divmod(n, cols)
+        lat, lon = north - (i + 0.5) * res, west + (j + 0.5) * res
+        client.post('/api/predict', json={
+            'year': body['year'], 'mag_scale_index': 1, 'dis_mag_value': body['magnitude'],
+            'country_code_index': int(resolver(lat, lon)), 'longitude': lon, 'latitude': lat,
+        })
+    point_ms = (time.perf_counter() - start) / sample * 1000
+
+    print(f"tile of {rows}x{cols} cells from the grid: {tile_ms:.2f} ms per request")
+    print(f"same tile via /api/predict: {point_ms:.2f} ms per cell, ~{point_ms * rows * cols:.0f} ms per tile")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Throughput of ``flask score`` (ml.batch_score.score_file) for 1..N workers.
+
+Writes a synthetic CSV of ``--rows`` events, preloads the model (as the
+command does, so forked workers share it), then scores the file with each
+worker count and reports rows/sec and the speedup over one process.
+Scaling stops at the number of physical cores.
+
+    python -m benchmarks.score_scaling --rows 500000 --max-workers 8
+"""
+import argparse
+import csv
+import os
+import tempfile
+
+from benchmarks.suite import sample_events
+from ml.batch_score import score_file
+from ml.predict import registry
+
+
+def write_events(path, rows):
+    template = sample_events(1000)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, list(template[0]))
+        writer.writeheader()
+        for i in range(rows):
+            writer.writerow(template[i % len(template)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    events = os.path.join(directory, 'events.csv')
+    write_events(events, args.rows)
+    registry.preload(include_model=True)
+    print(f"{args.rows} rows, {os.cpu_count()} CPUs")
+
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        report = score_file(events, os.path.join(directory, 'scored.csv'),
+                            workers=workers, chunk_size=args.chunk_size)
+        baseline = baseline or report['rows_per_sec']
+        print(f"{workers:3} workers   {report['seconds']:7.2f} s   {report['rows_per_sec']:9.0f} rows/s   "
+              f"x{report['rows_per_sec'] / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
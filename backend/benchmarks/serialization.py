@@ -0,0 +1,110 @@
+"""Bytes on the wire and CPU per response for large batch and news payloads.
+
+Encodes the same payloads with each JSON provider and each content
+encoding the client can negotiate, through the app's own provider and
+compression hook, and reports response size and CPU milliseconds per
+response (serialize + compress). Batch payloads are built with and
+without the ``original_data`` debug fields. ``before`` is the old path:
+Flask's stdlib provider on plain Python values (the ``int()``/``float()``
+conversions the formatter used to do), uncompressed.
+
+    python -m benchmarks.serialization --rows 5000 --articles 50 --repeat 20
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('NEWS_WARMER_ENABLED', 'false')
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from config import Config
+from ml import predict
+import serialization
+
+WORDS = ('flood', 'earthquake', 'storm', 'river', 'warning', 'residents', 'evacuated', 'region', 'officials',
+         'damage', 'rainfall', 'coast', 'emergency', 'relief', 'killed', 'homes', 'after', 'the', 'of', 'and',
+         'in', 'as', 'heavy', 'wildfire', 'drought', 'aid', 'rescue', 'teams', 'reported', 'thousands')
+
+
+def batch_payload(rows, debug, top_k=3, seed=0):
+    rng = random.Random(seed)
+    events = [{
+        'year': rng.randint(1990, 2024),
+        'mag_scale_index': rng.randint(0, 4),
+        'dis_mag_value': round(rng.uniform(0, 10000), 2),
+        'country_code_index': rng.randint(0, 200),
+        'longitude': round(rng.uniform(-180, 180), 4),
+        'latitude': round(rng.uniform(-60, 70), 4),
+    } for _ in range(rows)]
+    results = predict.predict_batch(events, top_k=top_k, debug=debug)
+    return {'success': True, 'count': len(results), 'errors': 0, 'results': results}
+
+
+def news_payload(articles, seed=0):
+    rng = random.Random(seed)
+    text = lambda n: ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize()
+    return [{
+        'title': text(10),
+        'url': f'https://news.example.com/{rng.getrandbits(48):x}/{text(5).lower().replace(" ", "-")}',
+        'image': f'https://media.example.com/{rng.getrandbits(64):x}.jpg',
+        'content': text(40) + '.',
+        'source': rng.choice(('The Guardian', 'Reuters', 'BBC News', 'Al Jazeera')),
+        'published': f'2026-10-{rng.randint(1, 18):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z',
+        'id': f'world/2026/{rng.getrandbits(32):x}',
+    } for _ in range(articles)]
+
+
+def encode(app, payload, encoding, repeat):
+    """Bytes and CPU ms per response through ``app.json`` and the compression hook"""
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    with app.test_request_context(headers=headers):
+        start = time.process_time()
+        for _ in range(repeat):
+            response = serialization._compress_response(app.json.response(payload))
+        elapsed = time.process_time() - start
+        return len(response.get_data()), elapsed / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000, help='rows in the batch response')
+    parser.add_argument('--articles', type=int, default=50, help='articles in the news response')
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['COMPRESS_ENABLED'] = True
+    providers = {'stdlib': serialization.NumpyJSONProvider(app)}
+    if serialization.orjson is not None:
+        providers['orjson'] = serialization.OrjsonProvider(app)
+    encodings = ['gzip'] + (['br'] if serialization.brotli is not None else [])
+
+    with app.app_context():
+        predict.registry.preload(include_model=True)
+        payloads = {
+            f'batch {args.rows} rows, debug': batch_payload(args.rows, True, args.top_k),
+            f'batch {args.rows} rows, no debug': batch_payload(args.rows, False, args.top_k),
+            f'news {args.articles} articles': news_payload(args.articles),
+        }
+    print(f"JSON providers {', '.join(providers)}; encodings identity, {', '.join(encodings)}; "
+          f"gzip level {Config.COMPRESS_GZIP_LEVEL}, brotli quality {Config.COMPRESS_BROTLI_QUALITY}")
+    for name, payload in payloads.items():
+        print(name)
+        # The old response: Python values through Flask's stdlib provider
+        plain = serialization.orjson.loads(serialization.dumps(payload)) if serialization.orjson else payload
+        app.json = DefaultJSONProvider(app)
+        size, ms = encode(app, plain, None, args.repeat)
+        print(f"  {'before':<8} {'identity':<9} {size:10,} bytes {ms:9.2f} ms")
+        for label, provider in providers.items():
+            app.json = provider
+            for encoding in [None] + encodings:
+                size, ms = encode(app, payload, encoding, args.repeat)
+                print(f"  {label:<8} {encoding or 'identity':<9} {size:10,} bytes {ms:9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Hit rate and lookup latency of the cache backends across worker processes.
+
+Each process replays the same Zipf-distributed key stream against its own
+cache instance, "computing" a value on a miss (``--miss-cost`` seconds)
+and storing it. With SimpleCache every process warms up alone; with
+SQLiteCache they share one file, so one worker's miss warms everyone.
+
+    python -m benchmarks.shared_cache --processes 4 --lookups 5000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from flask_caching.backends import SimpleCache
+
+from cache_backends import SQLiteCache
+
+
+def replay(args):
+    backend, path, lookups, n_keys, miss_cost, seed = args
+    cache = SimpleCache() if backend == 'simple' else SQLiteCache(path)
+    keys = np.minimum(np.random.default_rng(seed).zipf(1.2, lookups), n_keys)
+    hits = 0
+    get_latencies = []
+    start = time.perf_counter()
+    for key in keys:
+        key = f"bench:{key}"
+        t0 = time.perf_counter()
+        value = cache.get(key)
+        get_latencies.append(time.perf_counter() - t0)
+        if value is None:
+            time.sleep(miss_cost)
+            cache.set(key, {'articles': ['x'] * 20}, timeout=600)
+        else:
+            hits += 1
+    return hits, statistics.fmean(get_latencies), time.perf_counter() - start
+
+
+def run(backend, processes, lookups, n_keys, miss_cost):
+    path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+    jobs = [(backend, path, lookups, n_keys, miss_cost, seed) for seed in range(processes)]
+    if backend == 'sqlite':
+        SQLiteCache(path)  # create the table before the workers race for it
+    with Pool(processes) as pool:
+        results = pool.map(replay, jobs)
+    hits = sum(r[0] for r in results)
+    print(f"{backend:<7} hit rate {hits / (processes * lookups):6.1%}   "
+          f"get {statistics.fmean(r[1] for r in results) * 1e6:7.1f} us   "
+          f"wall {max(r[2] for r in results):6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--keys', type=int, default=2000)
+    parser.add_argument('--miss-cost', type=float, default=0.002, help='seconds spent per miss')
+    args = parser.parse_args()
+
+    for backend in ('simple', 'sqlite'):
+        run(backend, args.processes, args.lookups, args.keys, args.miss_cost)
+
+
+if __name__ == '__main__':
+    main()
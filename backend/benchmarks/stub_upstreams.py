@@ -0,0 +1,101 @@
+"""Local stand-ins for NewsAPI and the Guardian with injectable latency.
+
+Each stub is a threaded HTTP server on 127.0.0.1 that answers every GET
+with a canned payload in the provider's format after sleeping for a
+delay drawn from ``latency()``. Article ``i`` was published ``i`` minutes
+ago, and the providers' from-date parameters are honoured. Use ``start_stub_upstreams()`` to run both
+and point ``Config.NEWSAPI_URL``/``Config.GUARDIAN_URL`` at them.
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def newsapi_payload(count, offset=0):
+    now = datetime.now(timezone.utc)
+    return {'status': 'ok', 'totalResults': count, 'articles': [{
+        'title': f'Stub NewsAPI article {offset + i}',
+        'url': f'https://news.example.com/{offset + i}',
+        'urlToImage': None,
+        'description': 'Stub description',
+        'source': {'name': 'Stub Wire'},
+        'publishedAt': (now - timedelta(minutes=offset + i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+    } for i in range(count)]}
+
+
+def guardian_payload(count, offset=0):
+    now = datetime.now(timezone.utc)
+    return {'response': {'status': 'ok', 'results': [{
+        'id': f'world/stub/{offset + i}',
+        'webTitle': f'Stub Guardian article {offset + i}',
+        'webUrl': f'https://guardian.example.com/{offset + i}',
+        'webPublicationDate': (now - timedelta(minutes=offset + i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'fields': {'thumbnail': None, 'trailText': 'Stub trail text'},
+    } for i in range(count)]}}
+
+
+class StubUpstream:
+    """One fake provider; ``latency`` returns the delay in seconds per request"""
+
+    def __init__(self, payload, size_param, latency=lambda: 0.0, status=200, since_param=None):
+        self.payload = payload
+        self.size_param = size_param
+        self.since_param = since_param
+        self.latency = latency
+        self.status = status
+        self.requests = 0
+        self.articles = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency())
+                params = parse_qs(urlparse(self.path).query)
+                count = int(params.get(stub.size_param, ['10'])[0])
+                if stub.since_param in params:
+                    since = datetime.fromisoformat(params[stub.since_param][0]).replace(tzinfo=timezone.utc)
+                    age = (datetime.now(timezone.utc) - since).total_seconds()
+                    count = max(0, min(count, int(age // 60) + 1))
+                stub.articles += count
+                body = json.dumps(stub.payload(count)).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def lognormal_latency(median, sigma=0.6, cap=30.0, rng=None):
+    """Heavy-tailed delay generator, roughly what real upstream APIs show"""
+    rng = rng or random.Random(0)
+    return lambda: min(cap, rng.lognormvariate(0, sigma) * median)
+
+
+def start_stub_upstreams(newsapi_latency=lambda: 0.0, guardian_latency=lambda: 0.0):
+    """Start both stubs and point Config at them; returns (newsapi, guardian)"""
+    from config import Config
+
+    newsapi = StubUpstream(newsapi_payload, 'pageSize', newsapi_latency, since_param='from')
+    guardian = StubUpstream(guardian_payload, 'page-size', guardian_latency, since_param='from-date')
+    Config.NEWSAPI_URL = newsapi.url
+    Config.GUARDIAN_URL = guardian.url
+    return newsapi, guardian
@@ -0,0 +1,439 @@
+"""Reproducible load test of the backend under gunicorn, plus micro-benchmarks.
+
+Starts gunicorn on a throwaway SQLite database with NewsAPI and the
+Guardian replaced by local stubs (``stub_upstreams``), then drives each
+scenario below from ``--concurrency`` client threads for ``--seconds``.
+For every endpoint it reports throughput, p50/p95/p99 latency, errors and
+the memory (PSS) of the gunicorn master and workers together: the peak
+during the scenario and the growth since it started. Micro-benchmarks then
+time ``predict_disaster``'s feature path and ``standardize_article``
+in-process.
+
+``--capacity 16 64 256`` also measures how many connections the server
+holds open at once: each level keeps that many clients on news queries
+nobody has asked for before, which wait on the stub providers, and
+polls /api/health alongside. Run it per ``--worker-class`` (sync,
+gthread or gevent) to compare serving modes:
+
+    python -m benchmarks.suite --worker-class gevent --capacity 16 64 256 --skip-micro --only health
+
+Results are written as JSON with ``--output`` so that runs can be
+compared with ``--compare``:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+
+The load generator runs in this process. On a machine with few cores it
+competes with gunicorn for CPU, so compare runs from the same machine only.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+from benchmarks.stub_upstreams import guardian_payload, lognormal_latency, newsapi_payload, start_stub_upstreams
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def sample_events(n, seed=0):
+    """Events spread like the prediction form's traffic (repeats hit the prediction cache)"""
+    rng = random.Random(seed)
+    return [{
+        'year': rng.randint(1990, 2025),
+        'mag_scale_index': rng.randint(0, 5),
+        'dis_mag_value': round(rng.uniform(1, 10), 1),
+        'country_code_index': rng.randint(0, 227),
+        'longitude': round(rng.uniform(-180, 180), 2),
+        'latitude': round(rng.uniform(-90, 90), 2),
+    } for _ in range(n)]
+
+
+def scenarios(seed=0):
+    """(name, method, path, body factory); factories are called once per request"""
+    events = sample_events(500, seed)
+    batch = sample_events(100, seed + 1)
+    counter = iter(range(10 ** 9))
+    return [
+        ('health', 'GET', lambda: ('/api/health', None)),
+        ('predict', 'POST', lambda: ('/api/predict', random.choice(events))),
+        ('predict_batch', 'POST', lambda: ('/api/predict/batch', batch)),
+        # Store read: the query the news page loads by default
+        ('news', 'GET', lambda: ('/api/disaster-news?limit=10', None)),
+        # Every request is a new query and waits on both stub providers
+        ('news_uncached', 'GET', lambda: (f'/api/disaster-news?limit=10&query=bench{next(counter)}', None)),
+        ('donate', 'POST', lambda: ('/api/donate', {'user_id': 1, 'amount': 5})),
+    ]
+
+
+def _process_memory(pid):
+    """Proportional set size of ``pid`` in bytes, or its RSS where smaps_rollup is missing.
+
+    PSS splits pages shared copy-on-write with the master (the preloaded
+    model) between the processes that map them, so summing it over
+    workers doesn't count the model once per worker.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    with open(f'/proc/{pid}/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def process_tree_memory(root_pid):
+    """Memory in bytes of ``root_pid`` and all its descendants"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree = {root_pid}
+    changed = True
+    while changed:
+        children = {pid for pid, parent in parents.items() if parent in tree} - tree
+        tree |= children
+        changed = bool(children)
+    total = 0
+    for pid in tree:
+        try:
+            total += _process_memory(pid)
+        except OSError:
+            continue  # exited while we were looking
+    return total
+
+
+class MemorySampler:
+    """Samples the server's total memory in a background thread"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.start = process_tree_memory(pid)
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, process_tree_memory(self.pid))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        end = process_tree_memory(self.pid)
+        return {
+            'memory_peak_mb': round(max(self.peak, end) / 2 ** 20, 1),
+            'memory_growth_mb': round((end - self.start) / 2 ** 20, 1),
+        }
+
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return float('nan')
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+
+def drive(base_url, method, make_request, concurrency, seconds):
+    """Closed-loop load: each client sends its next request as soon as the last returns"""
+    stop_at = time.perf_counter() + seconds
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        send = session.post if method == 'POST' else session.get
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < stop_at:
+            path, body = make_request()
+            start = time.perf_counter()
+            try:
+                response = send(base_url + path, json=body, timeout=30)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            local_latencies.append(time.perf_counter() - start)
+            local_errors += not ok
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def start_server(port, workers, env_overrides, extra_args=()):
+    # A leftover server on the port would silently answer in place of ours
+    with socket.socket() as probe:
+        if probe.connect_ex(('127.0.0.1', port)) == 0:
+            raise RuntimeError(f'port {port} is already in use')
+    env = dict(os.environ, **env_overrides)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'wsgi', 'db', 'upgrade'],
+                   cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', *extra_args, 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/health', timeout=1)
+            return server
+        except (requests.ConnectionError, requests.Timeout):
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+@contextmanager
+def serving(args):
+    """gunicorn with the stub providers, as configured by ``args``; yields its base URL and process"""
+    newsapi, guardian = start_stub_upstreams(
+        lognormal_latency(args.upstream_median),
+        lognormal_latency(args.upstream_median * 1.5, rng=random.Random(1)),
+    )
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    env = {
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'NEWSAPI_URL': newsapi.url,
+        'GUARDIAN_URL': guardian.url,
+        'NEWSAPI_KEY': 'bench',
+        'GUARDIAN_KEY': 'bench',
+        'NEWS_WARMER_ENABLED': 'false',
+        'GUNICORN_WORKER_CLASS': args.worker_class,
+    }
+    if args.threads:
+        env['GUNICORN_THREADS'] = str(args.threads)
+    try:
+        server = start_server(args.port, args.workers, env)
+    except BaseException:
+        newsapi.close()
+        guardian.close()
+        raise
+    try:
+        yield f'http://127.0.0.1:{args.port}', server
+    finally:
+        server.terminate()
+        server.wait()
+        newsapi.close()
+        guardian.close()
+
+
+def run_load(args):
+    results = {}
+    with serving(args) as (base_url, server):
+        for name, method, make_request in scenarios(args.seed):
+            if args.only and name not in args.only:
+                continue
+            drive(base_url, method, make_request, args.concurrency, args.warmup)
+            sampler = MemorySampler(server.pid)
+            result = drive(base_url, method, make_request, args.concurrency, args.seconds)
+            result.update(sampler.stop())
+            results[name] = result
+            print(f"{name:<14} {result['throughput_rps']:8.1f} req/s   p50 {result['p50_ms']:7.2f}   "
+                  f"p95 {result['p95_ms']:7.2f}   p99 {result['p99_ms']:7.2f} ms   "
+                  f"errors {result['errors']:4}   memory peak {result['memory_peak_mb']:6.1f} MB "
+                  f"({result['memory_growth_mb']:+.1f})")
+    return results
+
+
+def probe_health(base_url, stop, interval=0.05):
+    """/api/health latencies, polled until ``stop`` is set"""
+    latencies = []
+    session = requests.Session()
+    while not stop.wait(interval):
+        start = time.perf_counter()
+        try:
+            session.get(base_url + '/api/health', timeout=30)
+        except requests.RequestException:
+            pass
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def run_capacity(args):
+    """Connections held open on upstream waits: every request is a new news
+    query that waits on both stub providers, at each of ``--capacity``
+    concurrency levels, while /api/health is polled alongside"""
+    results = {}
+    counter = iter(range(10 ** 9))
+    make_request = lambda: (f'/api/disaster-news?limit=10&query=capacity{next(counter)}', None)
+    with serving(args) as (base_url, server):
+        drive(base_url, 'GET', make_request, min(args.capacity), args.warmup)
+        for level in args.capacity:
+            stop = threading.Event()
+            health = []
+            prober = threading.Thread(target=lambda: health.extend(probe_health(base_url, stop)))
+            prober.start()
+            sampler = MemorySampler(server.pid)
+            result = drive(base_url, 'GET', make_request, level, args.seconds)
+            stop.set()
+            prober.join()
+            result.update(sampler.stop())
+            result['health_p99_ms'] = round(percentile(health, 0.99) * 1000, 2)
+            results[str(level)] = result
+            print(f"{level:5} connections {result['throughput_rps']:8.1f} req/s   p50 {result['p50_ms']:8.2f}   "
+                  f"p99 {result['p99_ms']:8.2f} ms   errors {result['errors']:4}   "
+                  f"health p99 {result['health_p99_ms']:8.2f} ms   memory peak {result['memory_peak_mb']:6.1f} MB")
+    return results
+
+
+def time_call(fn, repeat=5):
+    """Best-of-``repeat`` time per call in microseconds"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return round(min(timer.repeat(repeat, number)) / number * 1e6, 3)
+
+
+def run_micro():
+    os.environ.setdefault('NEWS_WARMER_ENABLED', 'false')
+    import numpy as np
+    from flask import request
+    from wsgi import app
+    from ml import predict
+    from services.news_service import standardize_article
+
+    event = sample_events(1)[0]
+    predict.registry.preload(include_model=True)
+
+    def feature_path():
+        # What predict_disaster does per request, minus Flask and the prediction cache
+        features = np.array([[event[field] for field in predict.REQUIRED_FIELDS]], dtype=np.float64)
+        proba = predict._forest_predict_proba(features)
+        predict._format_prediction(predict._labels(proba)[0], event['mag_scale_index'],
+                                   event['dis_mag_value'], event['country_code_index'])
+
+    def view():
+        # The whole view for a repeated event: the prediction cache answers it
+        with app.test_request_context('/api/predict', method='POST', json=event):
+            predict.predict_disaster(request)
+
+    newsapi_item = newsapi_payload(1)['articles'][0]
+    guardian_item = guardian_payload(1)['response']['results'][0]
+    articles = [(item, 'newsapi') for item in newsapi_payload(50)['articles']] + \
+               [(item, 'guardian') for item in guardian_payload(50)['response']['results']]
+
+    feature_path()  # load the engine and scaler outside the timing
+    results = {'predict_feature_path_us': time_call(feature_path)}
+    results['predict_disaster_cached_us'] = time_call(view)
+    results['standardize_article_newsapi_us'] = time_call(lambda: standardize_article(newsapi_item, 'newsapi'))
+    results['standardize_article_guardian_us'] = time_call(lambda: standardize_article(guardian_item, 'guardian'))
+    results['standardize_100_articles_us'] = time_call(lambda: [standardize_article(i, s) for i, s in articles])
+    for name, value in results.items():
+        print(f"{name:<34} {value:10.2f} us")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """Print the change of every shared number; lower is better except throughput"""
+    print(f"\nChange vs {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')}):")
+    for section in ('load', 'capacity'):
+        for name, result in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            parts = [f"{key} {(result[key] / old[key] - 1) * 100:+6.1f}%"
+                     for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'health_p99_ms', 'memory_peak_mb')
+                     if old.get(key) and key in result]
+            label = name if section == 'load' else f'{name} connections'
+            print(f"  {label:<14} " + '   '.join(parts))
+    for name, value in current.get('micro', {}).items():
+        old = baseline.get('micro', {}).get(name)
+        if old:
+            print(f"  {name:<34} {(value / old - 1) * 100:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads per scenario')
+    parser.add_argument('--seconds', type=float, default=10, help='measured time per scenario')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured time per scenario')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--worker-class', default='gthread', choices=('sync', 'gthread', 'gevent'),
+                        help='gunicorn worker type (GUNICORN_WORKER_CLASS)')
+    parser.add_argument('--threads', type=int, help='threads per gthread worker (default: gunicorn.conf.py)')
+    parser.add_argument('--capacity', type=int, nargs='+', metavar='N',
+                        help='also hold N connections open on uncached news, for each N')
+    parser.add_argument('--port', type=int, default=5091)
+    parser.add_argument('--upstream-median', type=float, default=0.05, help='stub provider latency, seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', help='scenarios to run (default all)')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file from an earlier run')
+    args = parser.parse_args()
+
+    report = {'meta': {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+    }}
+    if not args.skip_load:
+        report['load'] = run_load(args)
+    if args.capacity:
+        report['capacity'] = run_capacity(args)
+    if not args.skip_micro:
+        report['micro'] = run_micro()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from flask_caching.backends.base import BaseCache
+
+# SQLite's default limit on bound parameters per statement
+_MAX_VARIABLES = 500
+
+
+class SQLiteCache(BaseCache):
+    """Cache stored in a single SQLite file shared by every worker process.
+
+    Needs no external service: gunicorn workers on the same host open the
+    same file and see each other's entries. Writes are single statements in
+    their own transaction, so readers never see a half-written value, and
+    WAL mode lets readers proceed while a writer commits. Values are
+    pickled; expired rows are purged opportunistically on writes.
+
+    Select it with ``CACHE_TYPE=cache_backends.SQLiteCache`` and
+    ``CACHE_SQLITE_PATH``.
+    """
+
+    def __init__(self, path, default_timeout=300, purge_every=500, **kwargs):
+        super().__init__(default_timeout=default_timeout)
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.setdefault('path', config['CACHE_SQLITE_PATH'])
+        kwargs.pop('ignore_delete_many_errors', None)
+        return cls(*args, **kwargs)
+
+    def _connect(self):
+        """One connection per thread and process; sqlite3 connections must
+        not cross either boundary."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return 0 if timeout == 0 else time.time() + timeout
+
+    def _maybe_purge(self, conn):
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            conn.execute("DELETE FROM cache WHERE expires != 0 AND expires <= ?", (time.time(),))
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires = 0 OR expires > ?)",
+            (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def get_many(self, *keys):
+        found = {}
+        now = time.time()
+        conn = self._connect()
+        for start in range(0, len(keys), _MAX_VARIABLES):
+            chunk = keys[start:start + _MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires = 0 OR expires > ?)",
+                (*chunk, now)
+            )
+            found.update((key, pickle.loads(value)) for key, value in rows)
+        return [found.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires_at(timeout))
+        )
+        self._maybe_purge(conn)
+        return True
+
+    def set_many(self, mapping, timeout=None):
+        expires = self._expires_at(timeout)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires) for key, value in mapping.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge(conn)
+        return list(mapping)
+
+    def add(self, key, value, timeout=None):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE key = ? AND expires != 0 AND expires <= ?", (key, time.time()))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires_at(timeout))
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        cursor = self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount == 1
+
+    def has(self, key):
+        row = self._connect().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires = 0 OR expires > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+        return True
@@ -0,0 +1,316 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+import sqlalchemy as sa
+from flask.cli import with_appcontext
+from config import Config
+from database import db
+
+backend_dir = Path(__file__).parent
+
+# Run in a fresh interpreter by `flask profile-startup`
+_STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'create_app_ms': (done - imported) * 1000}))
+"""
+
+
+# Newest first: each revision with a schema object that only it (or a later
+# revision) created, to tell which revision a create_all() database matches
+_SCHEMA_MARKERS = [
+    ("c4d7e1a95b62", lambda inspector: inspector.has_table("article")),
+    ("8b2e4d6f9a31", lambda inspector: inspector.has_table("donation") and "ix_donation_user_id_created_at"
+        in {index["name"] for index in inspector.get_indexes("donation")}),
+    ("3f1a9c2b7d10", lambda inspector: inspector.has_table("donation")
+        and "status" in {column["name"] for column in inspector.get_columns("donation")}),
+    ("e76d88b2c49d", lambda inspector: inspector.has_table("user")),
+]
+
+
+def unversioned_revision():
+    """The migration a database built by ``db.create_all()`` (before the app
+    used migrations) matches, or None when it is empty or already versioned"""
+    inspector = sa.inspect(db.engine)
+    if inspector.has_table("alembic_version"):
+        with db.engine.connect() as connection:
+            if connection.execute(sa.text("SELECT version_num FROM alembic_version")).first() is not None:
+                return None
+    for revision, present in _SCHEMA_MARKERS:
+        if present(inspector):
+            return revision
+    return None
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Puts a database created without migrations under Alembic; then run flask db upgrade."""
+    from flask_migrate import stamp
+    revision = unversioned_revision()
+    if revision is None:
+        print("Database is empty or already versioned; flask db upgrade will bring it up to date.")
+        return
+    stamp(revision=revision)
+    print(f"Stamped the existing tables at revision {revision}; run flask db upgrade next.")
+
+
+@click.command("compile-model")
+def compile_model_command():
+    """Exports the random forest to flat arrays that workers memory-map."""
+    from ml.predict import registry
+    engine = registry.compile()
+    print(f"Compiled {engine.n_trees} trees ({len(engine.feature)} nodes) to {registry.compiled_path}")
+
+
+@click.command("build-model-bundle")
+@click.option("--version", help="Bundle version. Defaults to a UTC timestamp and checksum prefix.")
+@click.option("--activate", is_flag=True, help="Make it the served version once it is built.")
+@click.option("--bundle-dir", default=Config.MODEL_BUNDLE_DIR, show_default=True, type=click.Path(file_okay=False))
+def build_model_bundle_command(version, activate, bundle_dir):
+    """Packages the model, scaler and encoders in ml/ as a versioned bundle."""
+    from ml.bundle import activate_bundle, build_bundle
+    from ml.predict import COUNTRY_MAPPING, DISASTER_MAPPING, MAGNITUDE_SCALE_MAPPING, MODEL_DIR
+    try:
+        manifest = build_bundle(bundle_dir, MODEL_DIR, version=version, disaster_types=DISASTER_MAPPING,
+                                countries=COUNTRY_MAPPING, magnitude_scales=MAGNITUDE_SCALE_MAPPING)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+    print(f"Built model bundle {manifest['version']} ({len(manifest['classes'])} classes, "
+          f"{len(manifest['mappings']['countries'])} countries) in {bundle_dir}")
+    for note in manifest["notes"]:
+        print(f"  note: {note}")
+    if activate:
+        activate_bundle(bundle_dir, manifest["version"])
+        print(f"Activated {manifest['version']}")
+
+
+@click.command("activate-model")
+@click.argument("version")
+@click.option("--bundle-dir", default=Config.MODEL_BUNDLE_DIR, show_default=True, type=click.Path(file_okay=False))
+def activate_model_command(version, bundle_dir):
+    """Points CURRENT at a model bundle; workers swap to it within MODEL_RELOAD_INTERVAL."""
+    from ml.bundle import activate_bundle
+    from ml.registry import ModelUnavailableError
+    try:
+        manifest = activate_bundle(bundle_dir, version)
+    except (ModelUnavailableError, ValueError) as e:
+        raise click.ClickException(str(e))
+    print(f"Activated {manifest['version']} (checksum {manifest['checksum'][:12]})")
+
+
+@click.command("model-bundles")
+@click.option("--bundle-dir", default=Config.MODEL_BUNDLE_DIR, show_default=True, type=click.Path(file_okay=False))
+def model_bundles_command(bundle_dir):
+    """Lists the model bundles, marking the active one."""
+    from ml.bundle import current_version, list_bundles
+    current = current_version(bundle_dir)
+    manifests = list_bundles(bundle_dir)
+    if not manifests:
+        print(f"No model bundles in {bundle_dir}; the loose files in ml/ are served")
+    for manifest in manifests:
+        marker = "*" if manifest["version"] == current else " "
+        print(f"{marker} {manifest['version']:<32} {manifest.get('created_at', '')}  {manifest['checksum'][:12]}")
+
+
+@click.command("import-donations")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--batch-size", default=Config.DONATION_IMPORT_BATCH_SIZE, show_default=True, help="Rows per commit.")
+@with_appcontext
+def import_donations_command(path, fmt, batch_size):
+    """Bulk-imports donations from a CSV or JSONL file."""
+    from services.donation_import import import_donations, iter_records, detect_format
+    fmt = fmt or detect_format(name=path)
+    with open(path, encoding="utf-8", newline="") as f:
+        report = import_donations(iter_records(f, fmt), batch_size=batch_size)
+    print(f"Inserted {report['inserted']} rows, rejected {report['rejected']} "
+          f"in {report['seconds']}s ({report['rows_per_sec']} rows/sec)")
+    for reject in report["rejects"]:
+        print(f"  row {reject['row']}: {reject['error']}")
+
+
+@click.command("sweep-donations")
+@click.option("--stale-after", default=Config.DONATION_STALE_SECONDS, show_default=True,
+              help="Seconds a donation may stay pending or processing.")
+@with_appcontext
+def sweep_donations_command(stale_after):
+    """Charges donations stuck in pending and fails those stuck in processing."""
+    from services.payment_service import process_donation, recover_stale_donations
+    pending, failed = recover_stale_donations(stale_after)
+    print(f"Marked {failed} interrupted donations failed; processing {len(pending)} pending")
+    for donation_id in pending:
+        donation = process_donation(donation_id)
+        print(f"  donation {donation_id}: {donation.status if donation else 'gone'}")
+
+
+@click.command("build-risk-grid")
+@click.option("--resolution", default=Config.RISK_GRID_RESOLUTION, show_default=True, help="Cell size in degrees.")
+@click.option("--years", default=None, help="Comma-separated years. Defaults to the current year.")
+@click.option("--workers", default=Config.RISK_GRID_WORKERS, type=int, help="Scoring processes. Defaults to the CPU count.")
+@click.option("--resolver", default=Config.RISK_GRID_COUNTRY_RESOLVER, show_default=True, help="How cells get a country index.")
+@click.option("--output", default=Config.RISK_GRID_PATH, show_default=True, type=click.Path(dir_okay=False))
+def build_risk_grid_command(resolution, years, workers, resolver, output):
+    """Precomputes predictions over a lat/lon grid for the /api/risk endpoints."""
+    from ml.predict import registry
+    from ml.risk_grid import build_risk_grid, get_country_resolver
+    kwargs = {
+        "raster": {"path": Config.COUNTRY_RASTER_PATH, "fallback": Config.RISK_GRID_COUNTRY_INDEX},
+    }.get(resolver, {})
+    # Load once here so forked scoring processes share the model
+    registry.preload(include_model=True)
+    try:
+        metadata = build_risk_grid(
+            output, registry.bundle.model_path,
+            resolver=get_country_resolver(resolver, **kwargs),
+            resolution=resolution,
+            years=[int(year) for year in years.split(",")] if years else None,
+            workers=workers,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f"Scored {metadata['cells']} cells {tuple(metadata['shape'])} with {metadata['workers']} workers "
+          f"in {metadata['seconds']}s ({round(metadata['cells'] / metadata['seconds'])} cells/sec) to {output}")
+
+
+@click.command("build-country-raster")
+@click.argument("geojson", type=click.Path(exists=True, dir_okay=False))
+@click.option("--resolution", default=0.1, show_default=True, help="Cell size in degrees.")
+@click.option("--output", default=Config.COUNTRY_RASTER_PATH, show_default=True, type=click.Path(dir_okay=False))
+def build_country_raster_command(geojson, resolution, output):
+    """Rasterizes country polygons (e.g. Natural Earth admin 0) for coordinate lookups."""
+    from ml.predict import registry
+    from ml.countries import build_country_raster
+    metadata = build_country_raster(geojson, output, registry.bundle.country_names, resolution=resolution)
+    print(f"Wrote {metadata['countries']} countries at {resolution} degrees to {output}")
+    if metadata["unmatched"]:
+        print(f"No country_code_index for: {', '.join(str(name) for name in metadata['unmatched'])}")
+
+
+@click.command("score")
+@click.argument("input_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output_path", type=click.Path(dir_okay=False))
+@click.option("--workers", type=int, help="Scoring processes. Defaults to the CPU count.")
+@click.option("--chunk-size", default=Config.PREDICT_STREAM_CHUNK_SIZE, show_default=True, help="Rows per vectorized pass.")
+@click.option("--top-k", type=int, help="Also write confidence and the top-k disaster types.")
+def score_command(input_path, output_path, workers, chunk_size, top_k):
+    """Scores a CSV, JSONL or Parquet file of events, writing enriched rows."""
+    from ml.predict import registry
+    from ml.batch_score import score_file
+    # Load once here so forked scoring processes share the model
+    registry.preload(include_model=True)
+    try:
+        report = score_file(input_path, output_path, workers=workers, chunk_size=chunk_size, top_k=top_k)
+    except (ImportError, ValueError) as e:
+        raise click.ClickException(str(e))
+    print(f"Scored {report['rows']} rows ({report['errors']} errors) with {report['workers']} workers "
+          f"in {report['seconds']}s ({report['rows_per_sec']} rows/sec) to {output_path}")
+
+
+def parse_importtime(stderr):
+    """Parse ``-X importtime`` output into ``(module, depth, self_us, cumulative_us)`` rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _startup_imports(modules):
+    """Modules imported directly by app.py or by create_app()"""
+    rows = []
+    children = []
+    for row in modules:
+        if row[1] == 1:
+            children.append(row)
+        elif row[1] == 0:
+            rows.extend(children if row[0] == "app" else [row])
+            children = []
+    return rows
+
+
+def profile_startup(runs=3):
+    """Time ``import app`` + ``create_app()`` in fresh interpreters.
+
+    Returns the fastest run's timings plus the ``-X importtime`` breakdown
+    of the last one.
+    """
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _STARTUP_SCRIPT],
+            cwd=backend_dir, capture_output=True, text=True, check=True,
+        )
+        timings.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    best = min(timings, key=lambda timing: timing["import_ms"] + timing["create_app_ms"])
+    modules = parse_importtime(result.stderr)
+    return {
+        "import_ms": round(best["import_ms"], 1),
+        "create_app_ms": round(best["create_app_ms"], 1),
+        "total_ms": round(best["import_ms"] + best["create_app_ms"], 1),
+        "modules_imported": len(modules),
+        "modules": modules,
+    }
+
+
+@click.command("profile-startup")
+@click.option("--runs", default=3, show_default=True, help="Fresh interpreters to time; the fastest is reported.")
+@click.option("--top", default=15, show_default=True, help="Rows in each breakdown.")
+@click.option("--json", "as_json", is_flag=True, help="Print machine-readable results.")
+@click.option("--max-ms", type=float, help="Exit with status 1 if startup takes longer (for CI).")
+def profile_startup_command(runs, top, as_json, max_ms):
+    """Measures cold start (import app + create_app) with -X importtime."""
+    report = profile_startup(runs)
+    modules = report.pop("modules")
+    top_level = sorted(_startup_imports(modules), key=lambda row: -row[3])[:top]
+    slowest = sorted(modules, key=lambda row: -row[2])[:top]
+    heavy = {name: name in {row[0] for row in modules} for name in ("numpy", "sklearn", "joblib", "alembic")}
+
+    if as_json:
+        report["top_level_ms"] = {name: round(cumulative / 1000, 1) for name, _, _, cumulative in top_level}
+        report["slowest_self_ms"] = {name: round(self_us / 1000, 1) for name, _, self_us, _ in slowest}
+        report["heavy_imports"] = heavy
+        click.echo(json.dumps(report, indent=2))
+    else:
+        click.echo(f"import app: {report['import_ms']} ms, create_app(): {report['create_app_ms']} ms, "
+                   f"total {report['total_ms']} ms ({report['modules_imported']} modules, best of {runs})")
+        click.echo("\nImports by app.py and create_app(), cumulative:")
+        for name, _, _, cumulative in top_level:
+            click.echo(f"  {cumulative / 1000:9.1f} ms  {name}")
+        click.echo("\nModules by self time:")
+        for name, _, self_us, _ in slowest:
+            click.echo(f"  {self_us / 1000:9.1f} ms  {name}")
+        click.echo("\nHeavy imports at startup: " + ", ".join(f"{name}={'yes' if loaded else 'no'}" for name, loaded in heavy.items()))
+
+    if max_ms is not None and report["total_ms"] > max_ms:
+        raise SystemExit(f"Startup took {report['total_ms']} ms, over the {max_ms} ms budget")
+
+
+COMMANDS = [
+    init_db_command,
+    compile_model_command,
+    build_model_bundle_command,
+    activate_model_command,
+    model_bundles_command,
+    import_donations_command,
+    sweep_donations_command,
+    build_risk_grid_command,
+    build_country_raster_command,
+    score_command,
+    profile_startup_command,
+]
+
+
+def register_commands(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
@@ -1,12 +1,158 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL').replace("postgres://", "postgresql://", 1) if os.getenv('DATABASE_URL') else 'sqlite:///../instance/disaster.db'
-    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'super-secret-fallback-key')
+    # Absolute, so the flask CLI, python app.py and gunicorn all open <repo>/instance/disaster.db
+    SQLALCHEMY_DATABASE_URI = (os.getenv('DATABASE_URL').replace("postgres://", "postgresql://", 1) if os.getenv('DATABASE_URL')
+                               else f"sqlite:///{(Path(__file__).parent.parent / 'instance' / 'disaster.db').as_posix()}")
+    # Required outside debug mode; without it /login refuses to issue tokens
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine tuning (database.engine_options). Server databases: a pool of
+    # DB_POOL_SIZE connections per worker plus DB_MAX_OVERFLOW more under load,
+    # checked with a ping before use and replaced after DB_POOL_RECYCLE seconds
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # SQLite: WAL journal, fewer fsyncs, and writers wait this long for the lock
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))
+    # Log statements slower than this many milliseconds (0 disables the hook)
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 0))
+
+    # Auth. Tokens are HS256 JWTs; verified tokens are cached until they expire
+    JWT_EXPIRES_HOURS = int(os.getenv('JWT_EXPIRES_HOURS', 24))
+    JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 10000))
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    # bcrypt runs on this many threads per process, with at most AUTH_HASH_QUEUE
+    # more logins waiting; further logins get a 503 instead of tying up workers
+    AUTH_HASH_WORKERS = int(os.getenv('AUTH_HASH_WORKERS', 2))
+    AUTH_HASH_QUEUE = int(os.getenv('AUTH_HASH_QUEUE', 8))
+    # Reject requests without a token on protected routes (donations). Off until
+    # the frontend sends the token it gets from /login everywhere
+    AUTH_REQUIRED = os.getenv('AUTH_REQUIRED', 'false').lower() == 'true'
+    # Comma-separated usernames allowed on admin routes (bulk donation import).
+    # Empty closes those routes; the CLI commands still work
+    ADMIN_USERNAMES = frozenset(name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip())
     
     NEWSAPI_KEY = os.getenv('NEWSAPI_KEY')
     GUARDIAN_KEY = os.getenv('GUARDIAN_KEY')
+
+    PREDICT_BATCH_MAX_ROWS = int(os.getenv('PREDICT_BATCH_MAX_ROWS', 100000))
+    # Rows scored per vectorized pass by /api/predict/stream. There is no row
+    # limit, but ?chunk_size= is capped and the spooled upload is limited in bytes
+    PREDICT_STREAM_CHUNK_SIZE = int(os.getenv('PREDICT_STREAM_CHUNK_SIZE', 5000))
+    PREDICT_STREAM_MAX_CHUNK_SIZE = int(os.getenv('PREDICT_STREAM_MAX_CHUNK_SIZE', 50000))
+    PREDICT_STREAM_MAX_BYTES = int(os.getenv('PREDICT_STREAM_MAX_BYTES', 512 * 1024 * 1024))
+    # Echo each row's input back as `original_data`; requests can override it with `debug`
+    PREDICT_DEBUG_FIELDS = os.getenv('PREDICT_DEBUG_FIELDS', 'true').lower() == 'true'
+
+    # joblib mmap_mode for the model files ('r' maps uncompressed arrays read-only)
+    MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE') or None
+    # 'compiled' runs the forest as flat NumPy arrays (ml/forest_engine.py), 'sklearn' uses
+    # model.predict, 'auto' uses the compiled engine up to COMPILED_ENGINE_MAX_ROWS rows per call
+    INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'auto')
+    COMPILED_ENGINE_MAX_ROWS = int(os.getenv('COMPILED_ENGINE_MAX_ROWS', 512))
+    # Load the model in the gunicorn master so forked workers share it copy-on-write
+    MODEL_PRELOAD = os.getenv('MODEL_PRELOAD', 'true').lower() == 'true'
+    # Versioned model bundles (flask build-model-bundle); CURRENT in this directory names
+    # the active one. Without bundles the loose files in ml/ are served.
+    MODEL_BUNDLE_DIR = os.getenv('MODEL_BUNDLE_DIR', str(Path(__file__).parent.parent / 'instance' / 'model_bundles'))
+    # Seconds between checks of CURRENT for a newly activated bundle (0 disables hot reload)
+    MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', 30))
+
+    # Memoization of predictions keyed on quantized features (size 0 disables it)
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+    PREDICTION_CACHE_TTL = int(os.getenv('PREDICTION_CACHE_TTL', 3600))
+    # Step per feature: year, mag_scale_index, dis_mag_value, country_code_index, longitude, latitude
+    PREDICTION_CACHE_RESOLUTION = [float(step) for step in os.getenv('PREDICTION_CACHE_RESOLUTION', '1,1,0.01,1,0.01,0.01').split(',')]
+
+    NEWSAPI_URL = os.getenv('NEWSAPI_URL', 'https://newsapi.org/v2/everything')
+    GUARDIAN_URL = os.getenv('GUARDIAN_URL', 'https://content.guardianapis.com/search')
+    # Per-provider deadlines and the overall budget for one news refresh, in seconds
+    NEWSAPI_TIMEOUT = float(os.getenv('NEWSAPI_TIMEOUT', 8))
+    GUARDIAN_TIMEOUT = float(os.getenv('GUARDIAN_TIMEOUT', 8))
+    NEWS_TOTAL_TIMEOUT = float(os.getenv('NEWS_TOTAL_TIMEOUT', 10))
+    NEWS_FETCH_WORKERS = int(os.getenv('NEWS_FETCH_WORKERS', 8))
+    # News store: a query's articles from a provider are refetched (only what
+    # is new) once they are NEWS_CACHE_TTL old; meanwhile reads never wait
+    NEWS_CACHE_TTL = int(os.getenv('NEWS_CACHE_TTL', 3600))
+    # A provider that failed or missed the deadline is retried after this long
+    NEWS_PARTIAL_CACHE_TIMEOUT = int(os.getenv('NEWS_PARTIAL_CACHE_TIMEOUT', 60))
+    # Articles requested from each provider per refresh
+    NEWS_INGEST_PAGE_SIZE = int(os.getenv('NEWS_INGEST_PAGE_SIZE', 20))
+    # Background warmer for the query the news page loads by default
+    NEWS_WARMER_ENABLED = os.getenv('NEWS_WARMER_ENABLED', 'true').lower() == 'true'
+    NEWS_WARM_QUERY = os.getenv('NEWS_WARM_QUERY', 'natural disasters')
+    NEWS_WARM_INTERVAL = int(os.getenv('NEWS_WARM_INTERVAL', 300))
+    # Queries come from users: at most NEWS_MAX_QUERIES are stored, and one
+    # nobody has read for NEWS_QUERY_IDLE seconds is dropped. A comma-separated
+    # NEWS_ALLOWED_QUERIES limits /api/disaster-news to those queries.
+    NEWS_MAX_QUERIES = int(os.getenv('NEWS_MAX_QUERIES', 500))
+    NEWS_QUERY_IDLE = int(os.getenv('NEWS_QUERY_IDLE', 7 * 24 * 3600))
+    NEWS_ALLOWED_QUERIES = [q for q in os.getenv('NEWS_ALLOWED_QUERIES', '').split(',') if q.strip()]
+
+    # Pooled upstream sessions: pool size, retries on 429/5xx and circuit breaker
+    NEWS_POOL_SIZE = int(os.getenv('NEWS_POOL_SIZE', 10))
+    NEWS_MAX_RETRIES = int(os.getenv('NEWS_MAX_RETRIES', 2))
+    NEWS_BACKOFF_FACTOR = float(os.getenv('NEWS_BACKOFF_FACTOR', 0.2))
+    NEWS_BACKOFF_MAX = float(os.getenv('NEWS_BACKOFF_MAX', 2))
+    NEWS_BREAKER_THRESHOLD = int(os.getenv('NEWS_BREAKER_THRESHOLD', 5))
+    NEWS_BREAKER_RESET = int(os.getenv('NEWS_BREAKER_RESET', 30))
+
+    # Cache backend. SimpleCache is per process; cache_backends.SQLiteCache is
+    # one file shared by every worker on the host.
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
+    CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', str(Path(__file__).parent.parent / 'instance' / 'cache.sqlite3'))
+    # Also keep predictions in the shared cache, as a second tier behind the in-process LRU
+    PREDICTION_CACHE_SHARED = os.getenv('PREDICTION_CACHE_SHARED', str(CACHE_TYPE != 'SimpleCache')).lower() == 'true'
+
+    # Donations are accepted as pending and charged by a background pool
+    DONATION_WORKERS = int(os.getenv('DONATION_WORKERS', 8))
+    PAYMENT_PROCESSING_DELAY = float(os.getenv('PAYMENT_PROCESSING_DELAY', 1.5))
+    # Charge inside the request instead (the old behaviour; useful for debugging)
+    DONATION_INLINE_PROCESSING = os.getenv('DONATION_INLINE_PROCESSING', 'false').lower() == 'true'
+    # Donations left pending/processing this long by a worker that went away are
+    # re-queued/failed when the server starts (and by flask sweep-donations)
+    DONATION_STALE_SECONDS = int(os.getenv('DONATION_STALE_SECONDS', 300))
+    DONATION_SWEEP_ON_STARTUP = os.getenv('DONATION_SWEEP_ON_STARTUP', 'true').lower() == 'true'
+
+    # Rows per commit for bulk donation imports
+    DONATION_IMPORT_BATCH_SIZE = int(os.getenv('DONATION_IMPORT_BATCH_SIZE', 1000))
+
+    # Precomputed risk grid (flask build-risk-grid) served by /api/risk/*
+    RISK_GRID_PATH = os.getenv('RISK_GRID_PATH', str(Path(__file__).parent.parent / 'instance' / 'risk_grid.npy'))
+    RISK_GRID_RESOLUTION = float(os.getenv('RISK_GRID_RESOLUTION', 1.0))
+    RISK_GRID_WORKERS = int(os.getenv('RISK_GRID_WORKERS', 0)) or None
+    # How grid cells get a country_code_index: 'raster' looks it up in COUNTRY_RASTER_PATH,
+    # falling back to RISK_GRID_COUNTRY_INDEX at sea
+    RISK_GRID_COUNTRY_RESOLVER = os.getenv('RISK_GRID_COUNTRY_RESOLVER', 'raster')
+    RISK_GRID_COUNTRY_INDEX = int(os.getenv('RISK_GRID_COUNTRY_INDEX', 0))
+    # Largest region (in cells) one request may read
+    RISK_REGION_MAX_CELLS = int(os.getenv('RISK_REGION_MAX_CELLS', 260000))
+
+    # Coordinates -> country_code_index raster (flask build-country-raster), used
+    # when a prediction request leaves country_code_index out
+    COUNTRY_RASTER_PATH = os.getenv('COUNTRY_RASTER_PATH', str(Path(__file__).parent / 'ml' / 'country_raster.npy'))
+
+    # Response JSON: 'orjson' (falls back to the stdlib if it isn't installed) or 'stdlib'
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+    # gzip/brotli (when installed) for JSON and text responses of at least
+    # COMPRESS_MIN_SIZE bytes, as the client's Accept-Encoding allows
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 3))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+    # Per-route and per-stage latency histograms, served at /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    # cProfile this fraction of requests and keep the ones slower than
+    # METRICS_PROFILE_SLOW_MS (see /metrics/profiles); 0 disables profiling
+    METRICS_PROFILE_SAMPLE_RATE = float(os.getenv('METRICS_PROFILE_SAMPLE_RATE', 0))
+    METRICS_PROFILE_SLOW_MS = float(os.getenv('METRICS_PROFILE_SLOW_MS', 1000))
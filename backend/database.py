@@ -1,12 +1,80 @@
+import time
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 
+
+def engine_options(config):
+    """SQLAlchemy engine options for ``config``'s database.
+
+    Server databases (Postgres) get a sized, pre-pinged and recycled pool.
+    SQLite gets a busy timeout, so a writer waits for another worker's
+    write instead of failing with "database is locked"; its journal and
+    sync pragmas are set per connection by ``_sqlite_pragmas``.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('timeout', config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+        return options
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    return options
+
+
+def _sqlite_pragmas(engine, journal_mode, synchronous):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the single writer; NORMAL syncs at
+        # checkpoints rather than on every commit (safe against app crashes,
+        # a power cut can lose the last commits)
+        if journal_mode:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+        if synchronous:
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.close()
+
+
+def _log_slow_queries(engine, logger, threshold_ms):
+    """Log statements slower than ``threshold_ms``, without their parameters"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def log_if_slow(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+        if elapsed_ms >= threshold_ms:
+            logger.warning(f"Slow query ({elapsed_ms:.1f} ms{', executemany' if executemany else ''}): "
+                           f"{' '.join(statement.split())[:1000]}")
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_timer(context):
+        # A failed statement never reaches after_cursor_execute
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
 def init_db(app):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        _sqlite_pragmas(engine, app.config['SQLITE_JOURNAL_MODE'], app.config['SQLITE_SYNCHRONOUS'])
+    if app.config['DB_SLOW_QUERY_MS'] > 0:
+        _log_slow_queries(engine, app.logger, app.config['DB_SLOW_QUERY_MS'])
 
 def create_tables(app):
     with app.app_context():
-        db.create_all()
\ No newline at end of file
+        db.create_all()
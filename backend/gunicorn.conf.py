@@ -0,0 +1,114 @@
+import os
+import sys
+from pathlib import Path
+
+# Worker type: 'gthread' (default), 'gevent' (needs the gevent package) or 'sync'.
+# Set it here rather than with -k: gevent has to patch the standard library
+# before the app is preloaded below, or locks created at import would block
+# a whole worker instead of one greenlet.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+    # Upstream fetches run on greenlets here, which cost next to nothing, so
+    # let far more of a worker's news requests wait on the providers at once
+    os.environ.setdefault('NEWS_FETCH_WORKERS', '100')
+    try:
+        # Cooperative Postgres connections when psycogreen is installed
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _cgroup_cpu_limit():
+    """The container's CPU quota in whole CPUs (rounded up), or None if unlimited.
+
+    Container runtimes usually cap CPU with a CFS quota rather than by
+    pinning CPUs, so the affinity mask still lists every host core.
+    """
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota == 'max':
+            return None
+        quota, period = int(quota), int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            return None
+    if quota <= 0 or period <= 0:
+        return None
+    return max(1, -(-quota // period))
+
+
+def _cpu_count():
+    """CPUs this process may run on (the container's share, not the host's)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+
+cpus = _cpu_count()
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# Sync workers serve one request each, so they need a few per core; thread
+# and gevent workers overlap I/O waits themselves and need one per core plus
+# one to cover a worker that is busy scoring a large batch.
+workers = int(os.getenv('WEB_CONCURRENCY', 2 * cpus + 1 if worker_class == 'sync' else cpus + 1))
+# gthread: request threads per worker. Requests mostly wait on SQLite and
+# the news providers; past a handful per core more threads only add GIL contention.
+threads = int(os.getenv('GUNICORN_THREADS', 4 * cpus if worker_class == 'gthread' else 1))
+# gevent: open connections per worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Import the app once in the master so workers are forked with everything
+# already in memory; the model itself is loaded in when_ready below.
+preload_app = True
+wsgi_app = 'wsgi:app'
+
+
+def when_ready(server):
+    from config import Config
+    cfg = server.cfg
+    server.log.info(f"{cfg.workers} {cfg.worker_class_str} workers for {cpus} CPUs"
+                    + (f", {cfg.threads} threads each" if cfg.worker_class_str == 'gthread' else ''))
+    if not Config.MODEL_PRELOAD:
+        return
+    from ml.predict import registry
+    if registry.preload(include_model=Config.INFERENCE_ENGINE != 'compiled'):
+        server.log.info(f"Model {registry.status()['version']} preloaded in master in {registry.load_seconds:.2f}s")
+    else:
+        server.log.warning(f"Model preload failed: {registry.last_error}")
+
+
+def post_worker_init(worker):
+    # The first worker picks up donations the previous server left unfinished;
+    # the pending -> processing claim keeps a re-queued one from being charged twice
+    from config import Config
+    if worker.age != 1 or not Config.DONATION_SWEEP_ON_STARTUP:
+        return
+    from services.payment_service import recover_stale_donations, submit_donation
+    app = worker.wsgi
+    with app.app_context():
+        try:
+            pending, failed = recover_stale_donations(Config.DONATION_STALE_SECONDS)
+        except Exception as e:
+            worker.log.warning(f"Donation sweep failed: {str(e)}")
+            return
+    for donation_id in pending:
+        submit_donation(app, donation_id)
+    if pending or failed:
+        worker.log.info(f"Re-queued {len(pending)} pending donations, failed {failed} interrupted ones")
@@ -0,0 +1,282 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+
+from flask import Response, g, jsonify, request
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect and three increments"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+class MetricsRegistry:
+    """In-process histograms and gauges keyed on metric name and label values.
+
+    Each gunicorn worker keeps its own registry, so ``/metrics`` reports the
+    worker that answered the scrape.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.enabled = True
+        self._histograms = {}
+        self._gauges = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def histogram(self, name, labels):
+        """The histogram for ``name`` and a tuple of ``(label, value)`` pairs"""
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, name, value, **labels):
+        if self.enabled:
+            self.histogram(name, tuple(labels.items())).observe(value)
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(labels.items()))] = value
+
+    def clear_gauge(self, name):
+        """Drop every series of gauge ``name``"""
+        with self._lock:
+            for key in [key for key in self._gauges if key[0] == name]:
+                del self._gauges[key]
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            items = sorted(self._histograms.items(), key=lambda item: (item[0][0], item[0][1]))
+            gauges = sorted(self._gauges.items())
+        lines = []
+        current = None
+        for (name, labels), histogram in items:
+            if name != current:
+                current = name
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} histogram')
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels, ("le", repr(bound)))} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total!r}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        current = None
+        for (name, labels), value in gauges:
+            if name != current:
+                current = name
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name}{_format_labels(labels)} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('disaster_request_duration_seconds', 'Time spent handling a request, by route, method and status.')
+metrics.describe('disaster_stage_duration_seconds', 'Time spent in one stage of a request, by route and stage.')
+metrics.describe('disaster_upstream_request_duration_seconds', 'Time spent calling an upstream provider, by outcome.')
+metrics.describe('disaster_model_info', 'The model bundle this worker is serving (always 1), by version.')
+
+
+# Route of the request being handled, set once per request so stage timers
+# don't have to go through Flask's request proxy
+_current_route = ContextVar('metrics_route', default='background')
+_stage_histograms = {}
+_request_histograms = {}
+
+
+def _stage_histogram(route, name):
+    histogram = _stage_histograms.get((route, name))
+    if histogram is None:
+        histogram = _stage_histograms[(route, name)] = metrics.histogram(
+            'disaster_stage_duration_seconds', (('route', route), ('stage', name)))
+    return histogram
+
+
+class stage:
+    """Time a block as one stage of the current request (or of background work)::
+
+        with stage('model_predict'):
+            ...
+    """
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter() if metrics.enabled else None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            _stage_histogram(_current_route.get(), self.name).observe(time.perf_counter() - self.start)
+        return False
+
+
+def observe_upstream(provider, outcome, seconds):
+    metrics.observe('disaster_upstream_request_duration_seconds', seconds, provider=provider, outcome=outcome)
+
+
+class SlowRequestProfiler:
+    """Profile a random sample of requests and keep those that were slow.
+
+    Only one request is profiled at a time per process (cProfile cannot run
+    two profilers at once on newer Pythons), and only the last ``keep``
+    slow profiles are retained, as pstats text.
+    """
+
+    def __init__(self, sample_rate=0.0, slow_seconds=1.0, keep=20, limit=30):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.limit = limit
+        self.profiles = deque(maxlen=keep)
+        self._active = threading.Lock()
+
+    def maybe_start(self):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            self._active.release()
+            return None
+        return profiler
+
+    def finish(self, profiler, route, method, seconds):
+        profiler.disable()
+        self._active.release()
+        if seconds < self.slow_seconds:
+            return
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(self.limit)
+        self.profiles.append({
+            'route': route,
+            'method': method,
+            'seconds': round(seconds, 6),
+            'pid': os.getpid(),
+            'at': time.time(),
+            'stats': out.getvalue()
+        })
+
+
+profiler = SlowRequestProfiler()
+
+
+def _request_histogram(route, method, status):
+    histogram = _request_histograms.get((route, method, status))
+    if histogram is None:
+        histogram = _request_histograms[(route, method, status)] = metrics.histogram(
+            'disaster_request_duration_seconds', (('route', route), ('method', method), ('status', str(status))))
+    return histogram
+
+
+def _before_request():
+    rule = request.url_rule
+    route = rule.rule if rule is not None else 'unmatched'
+    # One g entry per request: Flask's proxies cost about a microsecond each
+    g.metrics_state = (_current_route.set(route), route, request.method,
+                       profiler.maybe_start(), time.perf_counter())
+
+
+def _after_request(response):
+    state = g.get('metrics_state')
+    if state is None:
+        return response
+    token, route, method, active, start = state
+    elapsed = time.perf_counter() - start
+    _request_histogram(route, method, response.status_code).observe(elapsed)
+    if active is not None:
+        profiler.finish(active, route, method, elapsed)
+        g.metrics_state = (token, route, method, None, start)
+    return response
+
+
+def _teardown_request(exc):
+    state = g.pop('metrics_state', None)
+    if state is None:
+        return
+    token, route, method, active, _ = state
+    # Requests that raised never reach after_request; release the profiler
+    if active is not None:
+        profiler.finish(active, route, method, 0.0)
+    _current_route.reset(token)
+
+
+def metrics_endpoint():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def profiles_endpoint():
+    return jsonify({'profiles': list(profiler.profiles)})
+
+
+def init_metrics(app):
+    """Time every request on ``app`` and serve ``/metrics`` (Prometheus text)
+    and ``/metrics/profiles`` (recent slow-request profiles)"""
+    metrics.enabled = app.config['METRICS_ENABLED']
+    profiler.sample_rate = app.config['METRICS_PROFILE_SAMPLE_RATE']
+    profiler.slow_seconds = app.config['METRICS_PROFILE_SLOW_MS'] / 1000
+    if not metrics.enabled:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
+    app.add_url_rule('/metrics/profiles', 'metrics_profiles', profiles_endpoint)
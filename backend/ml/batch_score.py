@@ -0,0 +1,241 @@
+import csv
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from serialization import dumps
+from services.donation_import import iter_records
+
+# Columns added to every input row; confidence and top_predictions only with top_k
+OUTPUT_COLUMNS = ['predicted_label', 'disaster_name', 'country_code_index', 'country_name', 'magnitude_scale', 'error']
+TOP_K_COLUMNS = ['confidence', 'top_predictions']
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl', '.parquet': 'parquet', '.pq': 'parquet'}
+
+
+def detect_file_format(path):
+    fmt = FORMATS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported file type {Path(path).suffix!r}; use .csv, .jsonl or .parquet")
+    return fmt
+
+
+def _parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Parquet files need pyarrow (pip install pyarrow)') from None
+    return pyarrow
+
+
+def _chunked(items, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _open_input(path, fmt, chunk_size):
+    """Return ``(input columns, raw chunks)`` for a file.
+
+    Chunks stay as cheap as possible to read and to send to a worker: raw
+    lines for JSONL, cell lists for CSV (the header is returned separately)
+    and dicts for Parquet. Workers turn them into records.
+    """
+    if fmt == 'parquet':
+        pa = _parquet()
+        parquet = pa.parquet.ParquetFile(path)
+        return parquet.schema_arrow.names, (batch.to_pylist() for batch in parquet.iter_batches(batch_size=chunk_size))
+
+    f = open(path, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        rows = csv.reader(f)
+        header = next(rows, [])
+        return header, _closing(f, _chunked(rows, chunk_size))
+
+    first = next(iter_records(f, 'jsonl'), None)
+    f.seek(0)
+    return list(first) if isinstance(first, dict) else [], _closing(f, _chunked(f, chunk_size))
+
+
+def _closing(f, chunks):
+    with f:
+        yield from chunks
+
+
+def _records(chunk):
+    fmt = _worker['in_fmt']
+    if fmt == 'csv':
+        header = _worker['header']
+        return [dict(zip(header, cells)) for cells in chunk]
+    if fmt == 'jsonl':
+        return list(iter_records(chunk, 'jsonl'))
+    return chunk
+
+
+def _output_row(record, result, top_k):
+    row = dict(record) if isinstance(record, dict) else {}
+    if result['success']:
+        row.update({
+            'predicted_label': result['original_data']['predicted_label'],
+            'disaster_name': result['disaster_name'],
+            'country_code_index': result['original_data']['country_code_index'],
+            'country_name': result['country_name'],
+            'magnitude_scale': result['magnitude_scale'],
+            'error': None,
+        })
+    else:
+        for column in OUTPUT_COLUMNS:
+            row.setdefault(column, None)
+        row['error'] = result['error']
+    if top_k:
+        row['confidence'] = result.get('confidence')
+        row['top_predictions'] = result.get('top_predictions')
+    return row
+
+
+def _serialize(rows):
+    """Output rows as CSV or JSONL text, or as-is for the Parquet writer"""
+    fmt = _worker['out_fmt']
+    if fmt == 'jsonl':
+        return b''.join(dumps(row) + b'\n' for row in rows).decode()
+    if fmt == 'csv':
+        for row in rows:
+            if row.get('top_predictions') is not None:
+                row['top_predictions'] = dumps(row['top_predictions']).decode()
+        out = io.StringIO()
+        csv.DictWriter(out, _worker['columns'], extrasaction='ignore').writerows(rows)
+        return out.getvalue()
+    return rows
+
+
+# Per-process settings for pool workers, set by _init_worker
+_worker = {}
+
+
+def _init_worker(settings):
+    from ml.predict import registry
+    # A no-op when the parent loaded the model before forking
+    registry.preload(include_model=True)
+    _worker.update(settings)
+
+
+def _score_chunk(chunk):
+    """Parse, score (one scaler and forest pass) and serialize one chunk.
+
+    Returns ``(output, rows, errors)``; doing the parsing and serializing
+    here keeps the parent's serial share of the work small.
+    """
+    from ml.predict import predict_stream
+
+    records = _records(chunk)
+    top_k = _worker['top_k']
+    # Parquet rows arrive typed like JSON; only CSV cells need parsing
+    record_fmt = 'csv' if _worker['in_fmt'] == 'csv' else 'jsonl'
+    results = predict_stream(records, len(records) or 1, top_k, record_fmt)
+    rows = [_output_row(record, result, top_k) for record, result in zip(records, results)]
+    errors = sum(1 for row in rows if row['error'] is not None)
+    return _serialize(rows), len(rows), errors
+
+
+def _ordered(pool, chunks, in_flight):
+    """``pool.map`` that keeps at most ``in_flight`` chunks queued, so a large
+    file is never read into memory ahead of the workers"""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(_score_chunk, chunk))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class _TextWriter:
+    def __init__(self, path, header=None):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        if header:
+            csv.writer(self.file).writerow(header)
+
+    def write(self, text):
+        self.file.write(text)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.pa = _parquet()
+        self.path = path
+        self.writer = None
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.writer is None:
+            table = self.pa.Table.from_pylist(rows)
+            self.writer = self.pa.parquet.ParquetWriter(self.path, table.schema)
+        else:
+            # Later chunks must match the first chunk's column types
+            table = self.pa.Table.from_pylist(rows, schema=self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def score_file(input_path, output_path, workers=None, chunk_size=5000, top_k=None):
+    """Score every event in ``input_path`` and write enriched rows to ``output_path``.
+
+    Both files may be CSV, JSONL or Parquet (by extension). Input rows are
+    read ``chunk_size`` at a time; a process pool parses, scores (one
+    vectorized scaler and forest pass per chunk) and serializes each chunk,
+    and the results are written in input order with ``OUTPUT_COLUMNS`` added. Rows that fail validation keep their
+    input columns and carry an ``error``. With ``workers=1`` chunks are
+    scored in this process. Returns row counts and throughput.
+    """
+    in_fmt = detect_file_format(input_path)
+    out_fmt = detect_file_format(output_path)
+    header, chunks = _open_input(input_path, in_fmt, chunk_size)
+    extra = OUTPUT_COLUMNS + (TOP_K_COLUMNS if top_k else [])
+    columns = [column for column in header if column not in extra] + extra
+    settings = {'in_fmt': in_fmt, 'out_fmt': out_fmt, 'header': header, 'columns': columns, 'top_k': top_k}
+    writer = _ParquetWriter(output_path) if out_fmt == 'parquet' else \
+        _TextWriter(output_path, columns if out_fmt == 'csv' else None)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    rows = errors = 0
+    pool = None
+    try:
+        if workers == 1:
+            _init_worker(settings)
+            scored = map(_score_chunk, chunks)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,))
+            scored = _ordered(pool, chunks, in_flight=2 * workers)
+        for output, count, failed in scored:
+            writer.write(output)
+            rows += count
+            errors += failed
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'errors': errors,
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+    }
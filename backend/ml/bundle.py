@@ -0,0 +1,352 @@
+"""Versioned model bundles.
+
+A bundle is one directory, ``<MODEL_BUNDLE_DIR>/<version>/``, holding
+everything a prediction needs: the forest, its compiled arrays, the scaler,
+the encoders and ``manifest.json``. The manifest records each file's
+SHA-256, the model's classes and the label mappings derived from the
+encoders, plus a checksum over all of it. ``CURRENT`` in the bundle
+directory names the active version; ``activate_bundle`` replaces it
+atomically and serving workers pick the change up (see ``ModelRegistry``).
+
+Without bundles, the loose files in ``ml/`` are served as an unversioned
+bundle named ``files-<checksum>``.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+
+from ml.coordinates import CoordinateEncoder
+from ml.countries import CountryNameIndex
+from ml.forest_engine import CompiledForest
+from ml.prediction_cache import file_sha256
+
+MANIFEST = 'manifest.json'
+POINTER = 'CURRENT'
+BUNDLE_FORMAT = 1
+
+# Bundle member -> file name, the same inside a bundle and among the loose files
+FILES = {
+    'model': 'random_forest_model.joblib',
+    'compiled': 'random_forest_model.compiled.joblib',
+    'scaler': 'scaler.joblib',
+    'country_encoder': 'country_encoder.joblib',
+    'disaster_type_encoder': 'disaster_type_label_encoder.joblib',
+    'magnitude_scale_encoder': 'magnitude_scale_encoder.joblib',
+    'coordinate_encoder': 'coordinate_encoder.joblib',
+}
+
+_VERSION = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+
+class ModelUnavailableError(RuntimeError):
+    """Raised when the model or scaler files cannot be loaded"""
+
+
+def check_version(version):
+    """Reject version names that are not a plain directory name"""
+    if not isinstance(version, str) or not _VERSION.match(version) or version == POINTER:
+        raise ValueError(f'Invalid model bundle version: {version!r}')
+    return version
+
+
+# Display names for the magnitude scale encoder's classes (EM-DAT's "Dis Mag Scale")
+MAGNITUDE_SCALE_NAMES = {
+    'Km2': 'Km²',
+    'Kph': 'Wind Speed (km/h)',
+    'Richter': 'Richter Scale',
+    'Vaccinated': 'Vaccinated',
+    '°C': 'Temperature (°C)',
+}
+
+
+def magnitude_scale_names(classes):
+    """mag_scale_index -> display name for the encoder's ``classes``"""
+    return {str(index): 'Unknown' if name is None else MAGNITUDE_SCALE_NAMES.get(name, str(name))
+            for index, name in enumerate(classes)}
+
+
+def _encoder_classes(path):
+    """An encoder's ``classes_`` as JSON values (NaN becomes None), or None"""
+    if not path.exists():
+        return None
+    classes = getattr(joblib.load(path), 'classes_', None)
+    if classes is None:
+        return None
+    return [None if isinstance(value, float) and math.isnan(value) else
+            value.item() if hasattr(value, 'item') else value for value in classes]
+
+
+def derive_mappings(model_dir, classes, disaster_types=None, countries=None, magnitude_scales=None):
+    """Label mappings for a model predicting ``classes``, from the encoders in ``model_dir``.
+
+    Returns ``(mappings, encoder_classes, members, notes)``: ``mappings``
+    holds ``disaster_types`` (model label -> name), ``countries``
+    (country_code_index -> name) and ``magnitude_scales``
+    (mag_scale_index -> name); ``members`` are the encoders that were
+    used. An encoder that is missing or does not fit the model is replaced
+    by the ``disaster_types``/``countries``/``magnitude_scales`` defaults,
+    and ``notes`` says so.
+    """
+    model_dir = Path(model_dir)
+    mappings = {}
+    encoder_classes = {}
+    members = []
+    notes = []
+
+    names = _encoder_classes(model_dir / FILES['disaster_type_encoder'])
+    if names is not None and len(names) == len(classes) and all(0 <= label < len(names) for label in classes):
+        mappings['disaster_types'] = {str(label): str(names[label]) for label in classes}
+        members.append('disaster_type_encoder')
+    elif disaster_types is not None and all(label in disaster_types for label in classes):
+        mappings['disaster_types'] = {str(label): disaster_types[label] for label in classes}
+        notes.append(f"{FILES['disaster_type_encoder']} "
+                     + ('is missing' if names is None else f'has {len(names)} classes for {len(classes)} model labels')
+                     + '; disaster names come from DISASTER_MAPPING')
+    else:
+        raise ValueError(f"No disaster type names for model labels {classes}")
+
+    names = _encoder_classes(model_dir / FILES['country_encoder'])
+    if names is not None:
+        mappings['countries'] = {str(index): str(name) for index, name in enumerate(names)}
+        members.append('country_encoder')
+    elif countries is not None:
+        mappings['countries'] = {str(index): name for index, name in countries.items()}
+        notes.append(f"{FILES['country_encoder']} is missing; country names come from COUNTRY_MAPPING")
+    else:
+        raise ValueError(f"{FILES['country_encoder']} is missing")
+
+    # mag_scale_index is the index of the scale among the encoder's classes
+    names = _encoder_classes(model_dir / FILES['magnitude_scale_encoder'])
+    if names is not None:
+        encoder_classes['magnitude_scale'] = names
+        mappings['magnitude_scales'] = magnitude_scale_names(names)
+        members.append('magnitude_scale_encoder')
+    elif magnitude_scales is not None:
+        mappings['magnitude_scales'] = {str(index): name for index, name in magnitude_scales.items()}
+        notes.append(f"{FILES['magnitude_scale_encoder']} is missing; magnitude scale names come from "
+                     "MAGNITUDE_SCALE_MAPPING")
+    else:
+        raise ValueError(f"{FILES['magnitude_scale_encoder']} is missing")
+
+    if (model_dir / FILES['coordinate_encoder']).exists():
+        CoordinateEncoder.load(model_dir / FILES['coordinate_encoder'])
+        members.append('coordinate_encoder')
+    else:
+        notes.append(f"{FILES['coordinate_encoder']} is missing; longitude and latitude reach the model "
+                     "in degrees, not the encoded values it was trained on")
+    return mappings, encoder_classes, members, notes
+
+
+def _checksum(manifest):
+    content = {key: manifest[key] for key in ('format', 'files', 'classes', 'mappings', 'encoder_classes')}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _manifest(directory, members, classes, mappings, encoder_classes, notes):
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'files': {member: {'file': FILES[member], 'sha256': file_sha256(directory / FILES[member])}
+                  for member in members},
+        'classes': classes,
+        'mappings': mappings,
+        'encoder_classes': encoder_classes,
+        'notes': notes,
+    }
+    manifest['checksum'] = _checksum(manifest)
+    return manifest
+
+
+class ModelBundle:
+    """One model version's forest, scaler and label mappings, loaded together.
+
+    Requests read ``registry.bundle`` once and use only that object, so a
+    swap to a newer bundle never pairs one version's scaler or mappings
+    with another's forest. The sklearn forest is unpickled on first use;
+    small requests only need the compiled ``engine``.
+    """
+
+    def __init__(self, manifest, path, scaler, engine, engine_source, mmap_mode=None, model=None):
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.checksum = manifest['checksum']
+        self.path = Path(path)
+        self.scaler = scaler
+        self.engine = engine
+        self.engine_source = engine_source
+        self.mmap_mode = mmap_mode
+        self.disaster_types = {int(label): name for label, name in manifest['mappings']['disaster_types'].items()}
+        self.countries = {int(index): name for index, name in manifest['mappings']['countries'].items()}
+        # Bundles built before magnitude names were derived only recorded the encoder's classes
+        magnitude_scales = manifest['mappings'].get('magnitude_scales') or magnitude_scale_names(
+            manifest.get('encoder_classes', {}).get('magnitude_scale', []))
+        self.magnitude_scales = {int(index): name for index, name in magnitude_scales.items()}
+        # Degrees -> the Longitude/Latitude features the forest was trained on (see ml/coordinates.py)
+        encoder = manifest['files'].get('coordinate_encoder')
+        self.coordinates = CoordinateEncoder.load(self.path / encoder['file']) if encoder else None
+        # Fuzzy name -> country_code_index lookup ('Philippines', 'South Korea', ...)
+        self.country_names = CountryNameIndex(self.countries)
+        self._model = model
+        self._model_lock = threading.Lock()
+
+    @property
+    def model_path(self):
+        return self.path / self.manifest['files']['model']['file']
+
+    @property
+    def model_loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    try:
+                        self._model = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
+                    except Exception as e:
+                        raise ModelUnavailableError(f"Failed to load model files: {str(e)}") from e
+        return self._model
+
+
+def load_bundle(path, mmap_mode=None, verify=True):
+    """Load the bundle in ``path``, checking its manifest and (with ``verify``) every file's hash"""
+    path = Path(path)
+    try:
+        manifest = json.loads((path / MANIFEST).read_text(encoding='utf-8'))
+        if manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"unsupported bundle format {manifest.get('format')!r}")
+        if _checksum(manifest) != manifest.get('checksum'):
+            raise ValueError('manifest does not match its checksum')
+        if verify:
+            for entry in manifest['files'].values():
+                if file_sha256(path / entry['file']) != entry['sha256']:
+                    raise ValueError(f"{entry['file']} does not match the manifest")
+        scaler = joblib.load(path / manifest['files']['scaler']['file'], mmap_mode=mmap_mode)
+        engine = CompiledForest.load(path / manifest['files']['compiled']['file'], mmap_mode='r')
+        return ModelBundle(manifest, path, scaler, engine, 'bundle', mmap_mode)
+    except Exception as e:
+        raise ModelUnavailableError(f"Failed to load model bundle {path.name}: {str(e)}") from e
+
+
+def load_files(model_dir, mmap_mode=None, disaster_types=None, countries=None, magnitude_scales=None):
+    """The loose model files in ``model_dir`` as an unversioned bundle.
+
+    The compiled forest is memory-mapped if ``flask compile-model`` wrote
+    it from the current model file; otherwise the sklearn forest is loaded
+    and compiled in memory.
+    """
+    model_dir = Path(model_dir)
+    model = None
+    try:
+        # Hashed before loading and compared with the manifest after, so the
+        # checksum (which keys the prediction cache) is that of what was loaded
+        loaded = {member: file_sha256(model_dir / FILES[member]) for member in ('model', 'scaler')}
+        scaler = joblib.load(model_dir / FILES['scaler'], mmap_mode=mmap_mode)
+        engine = None
+        if (model_dir / FILES['compiled']).exists():
+            engine = CompiledForest.load(model_dir / FILES['compiled'], mmap_mode='r')
+            if engine.source_sha256 != loaded['model']:
+                engine = None
+        if engine is not None:
+            engine_source = 'compiled_file'
+        else:
+            model = joblib.load(model_dir / FILES['model'], mmap_mode=mmap_mode)
+            engine = CompiledForest.from_sklearn(model)
+            engine_source = 'compiled_in_memory'
+        classes = [int(label) for label in engine.classes]
+        mappings, encoder_classes, members, notes = derive_mappings(
+            model_dir, classes, disaster_types, countries, magnitude_scales)
+        manifest = _manifest(model_dir, ['model', 'scaler', *members], classes, mappings, encoder_classes, notes)
+        if any(manifest['files'][member]['sha256'] != sha256 for member, sha256 in loaded.items()):
+            raise ValueError('model files changed while they were being loaded')
+        manifest['version'] = f"files-{manifest['checksum'][:12]}"
+        return ModelBundle(manifest, model_dir, scaler, engine, engine_source, mmap_mode, model=model)
+    except Exception as e:
+        raise ModelUnavailableError(f"Failed to load model files: {str(e)}") from e
+
+
+def build_bundle(bundle_dir, model_dir, version=None, disaster_types=None, countries=None, magnitude_scales=None):
+    """Package the loose files in ``model_dir`` as a new bundle and return its manifest.
+
+    The forest is compiled into the bundle, so workers always memory-map
+    it. The bundle is assembled in a hidden staging directory and renamed
+    into place, so a version directory is either complete or absent. The
+    version defaults to ``<UTC timestamp>-<checksum prefix>``.
+    """
+    bundle_dir = Path(bundle_dir)
+    model_dir = Path(model_dir)
+    if version is not None:
+        check_version(version)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix='.building-', dir=bundle_dir))
+    try:
+        model = joblib.load(model_dir / FILES['model'])
+        classes = [int(label) for label in model.classes_]
+        mappings, encoder_classes, members, notes = derive_mappings(
+            model_dir, classes, disaster_types, countries, magnitude_scales)
+        for member in ('model', 'scaler', *members):
+            shutil.copy2(model_dir / FILES[member], staging / FILES[member])
+        CompiledForest.from_sklearn(model, source_sha256=file_sha256(staging / FILES['model'])).save(
+            staging / FILES['compiled'])
+
+        manifest = _manifest(staging, ['model', 'compiled', 'scaler', *members],
+                             classes, mappings, encoder_classes, notes)
+        created_at = datetime.now(timezone.utc)
+        manifest['version'] = version or f"{created_at:%Y%m%d%H%M%S}-{manifest['checksum'][:8]}"
+        manifest['created_at'] = created_at.isoformat()
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+
+        target = bundle_dir / manifest['version']
+        if target.exists():
+            raise ValueError(f"Model bundle {manifest['version']} already exists")
+        os.chmod(staging, 0o755)
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+def current_version(bundle_dir):
+    """The version ``CURRENT`` points at, or None when no bundle is active"""
+    try:
+        version = (Path(bundle_dir) / POINTER).read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return None
+    return check_version(version) if version else None
+
+
+def activate_bundle(bundle_dir, version):
+    """Point ``CURRENT`` at ``version`` once it loads and verifies; returns its manifest"""
+    bundle_dir = Path(bundle_dir)
+    bundle = load_bundle(bundle_dir / check_version(version))
+    tmp_path = bundle_dir / f'.{POINTER}.{os.getpid()}.tmp'
+    tmp_path.write_text(version + '\n', encoding='utf-8')
+    # Readers see the old pointer or the new one, never a partial write
+    os.replace(tmp_path, bundle_dir / POINTER)
+    return bundle.manifest
+
+
+def list_bundles(bundle_dir):
+    """Manifests of the bundles in ``bundle_dir``, oldest first"""
+    bundle_dir = Path(bundle_dir)
+    if not bundle_dir.is_dir():
+        return []
+    manifests = []
+    for path in bundle_dir.iterdir():
+        if path.name.startswith('.') or not (path / MANIFEST).is_file():
+            continue
+        try:
+            manifests.append(json.loads((path / MANIFEST).read_text(encoding='utf-8')))
+        except ValueError:
+            continue
+    return sorted(manifests, key=lambda manifest: (manifest.get('created_at') or '', manifest.get('version') or ''))
@@ -0,0 +1,81 @@
+"""Longitude/latitude in degrees -> the features the forest was trained on.
+
+The training pipeline label-encoded the dataset's Longitude and Latitude
+columns, so the model does not see degrees: it sees each coordinate as the
+index of its spelling among the training values, sorted as strings.
+``scaler.joblib`` shows it (Longitude mean ~2257, scale ~416; Latitude mean
+~1233, scale ~219). ``CoordinateEncoder`` holds those two lists, the
+``classes_`` of the training encoders, and maps each coordinate to the
+index of the nearest training value.
+
+The encoders are not part of the shipped model files. Export them from the
+training run as ``ml/coordinate_encoder.joblib``::
+
+    joblib.dump({'longitude': longitude_encoder, 'latitude': latitude_encoder},
+                'coordinate_encoder.joblib')
+
+Without it, coordinates reach the model in degrees, as they always have.
+"""
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+# Feature columns (REQUIRED_FIELDS order) holding longitude and latitude
+LONGITUDE_COLUMN = 4
+LATITUDE_COLUMN = 5
+
+
+class _Axis:
+    """One encoder's classes, sorted by value in degrees for nearest-neighbour lookup"""
+
+    def __init__(self, classes):
+        values, codes = [], []
+        for code, value in enumerate(classes):
+            try:
+                degrees = float(value)
+            except (TypeError, ValueError):
+                continue
+            if np.isfinite(degrees):
+                values.append(degrees)
+                codes.append(code)
+        if len(values) < 2:
+            raise ValueError('A coordinate encoder needs at least two numeric classes')
+        order = np.argsort(values, kind='stable')
+        self.values = np.asarray(values, dtype=np.float64)[order]
+        self.codes = np.asarray(codes, dtype=np.float64)[order]
+
+    def encode(self, degrees):
+        degrees = np.asarray(degrees, dtype=np.float64)
+        right = np.clip(np.searchsorted(self.values, degrees), 1, len(self.values) - 1)
+        left = right - 1
+        nearer_left = np.abs(degrees - self.values[left]) <= np.abs(self.values[right] - degrees)
+        return self.codes[np.where(nearer_left, left, right)]
+
+
+class CoordinateEncoder:
+    """Encodes degrees the way the training data's Longitude/Latitude were"""
+
+    def __init__(self, longitudes, latitudes):
+        self.longitude = _Axis(longitudes)
+        self.latitude = _Axis(latitudes)
+
+    @classmethod
+    def load(cls, path):
+        """Read ``{'longitude': encoder, 'latitude': encoder}`` (fitted
+        LabelEncoders or plain sequences of training values)"""
+        encoders = joblib.load(path)
+        classes = lambda encoder: getattr(encoder, 'classes_', encoder)
+        return cls(classes(encoders['longitude']), classes(encoders['latitude']))
+
+    def encode_features(self, features):
+        """A copy of the feature matrix with its coordinate columns encoded"""
+        encoded = np.array(features, dtype=np.float64)
+        encoded[:, LONGITUDE_COLUMN] = self.longitude.encode(encoded[:, LONGITUDE_COLUMN])
+        encoded[:, LATITUDE_COLUMN] = self.latitude.encode(encoded[:, LATITUDE_COLUMN])
+        return encoded
+
+
+def load_coordinate_encoder(path):
+    """The encoder at ``path``, or None if there is none"""
+    return CoordinateEncoder.load(path) if Path(path).exists() else None
@@ -0,0 +1,297 @@
+import difflib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+# Common spellings that do not reduce to a COUNTRY_MAPPING name on their own
+ALIASES = {
+    'usa': 'United States of America (the)',
+    'us': 'United States of America (the)',
+    'united states': 'United States of America (the)',
+    'uk': 'United Kingdom of Great Britain and Northern Ireland (the)',
+    'united kingdom': 'United Kingdom of Great Britain and Northern Ireland (the)',
+    'great britain': 'United Kingdom of Great Britain and Northern Ireland (the)',
+    'russia': 'Russian Federation (the)',
+    'south korea': 'Korea (the Republic of)',
+    'north korea': "Korea (the Democratic People's Republic of)",
+    'dr congo': 'Congo (the Democratic Republic of the)',
+    'drc': 'Congo (the Democratic Republic of the)',
+    'democratic republic of the congo': 'Congo (the Democratic Republic of the)',
+    'republic of the congo': 'Congo (the)',
+    'iran': 'Iran (Islamic Republic of)',
+    'syria': 'Syrian Arab Republic',
+    'laos': "Lao People's Democratic Republic (the)",
+    'vietnam': 'Viet Nam',
+    'bolivia': 'Bolivia (Plurinational State of)',
+    'venezuela': 'Venezuela (Bolivarian Republic of)',
+    'tanzania': 'Tanzania, United Republic of',
+    'moldova': 'Moldova (the Republic of)',
+    'micronesia': 'Micronesia (Federated States of)',
+    'czechia': 'Czech Republic (the)',
+    'ivory coast': "Côte d'Ivoire",
+    'cape verde': 'Cabo Verde',
+    'north macedonia': 'Macedonia (the former Yugoslav Republic of)',
+    'macedonia': 'Macedonia (the former Yugoslav Republic of)',
+    'eswatini': 'Swaziland',
+    'palestine': 'Palestine, State of',
+    'taiwan': 'Taiwan (Province of China)',
+    'brunei': 'Brunei Darussalam',
+    'east timor': 'Timor-Leste',
+    'burma': 'Myanmar',
+    'turkiye': 'Turkey',
+    'uae': 'United Arab Emirates (the)',
+    'british virgin islands': 'Virgin Island (British)',
+    'us virgin islands': 'Virgin Island (U.S.)',
+    'united states virgin islands': 'Virgin Island (U.S.)',
+    'the bahamas': 'Bahamas (the)',
+    'canary islands': 'Canary Is',
+    'azores': 'Azores Islands',
+}
+
+_PARENTHETICAL = re.compile(r'\s*\(([^)]*)\)\s*')
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_name(name):
+    """Lower-case, strip accents and punctuation, drop a leading 'the'"""
+    # Typographic apostrophes would otherwise be dropped rather than split on
+    text = str(name).replace('\u2019', "'").replace('\u2018', "'")
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    text = _NON_WORD.sub(' ', text.replace('&', ' and ')).strip()
+    return text[4:] if text.startswith('the ') else text
+
+
+def _name_keys(name):
+    """Every normalized spelling one COUNTRY_MAPPING entry should answer to.
+
+    'Korea (the Republic of)' yields 'korea the republic of',
+    'republic of korea' and 'korea'; 'Tanzania, United Republic of' also
+    yields 'united republic of tanzania' and 'tanzania'.
+    """
+    keys = {normalize_name(name)}
+    match = _PARENTHETICAL.search(name)
+    base = _PARENTHETICAL.sub(' ', name).strip()
+    if match:
+        qualifier = normalize_name(match.group(1))
+        keys.add(normalize_name(base))
+        if qualifier:
+            keys.add(normalize_name(f'{qualifier} {base}'))
+    if ',' in base:
+        head, tail = (part.strip() for part in base.split(',', 1))
+        keys.add(normalize_name(head))
+        keys.add(normalize_name(f'{tail} {head}'))
+    return keys
+
+
+class CountryNameIndex:
+    """Inverse of COUNTRY_MAPPING that tolerates the usual spelling variants.
+
+    Names are normalized (case, accents, punctuation, '(the)' qualifiers,
+    'X, Republic of' inversions) and looked up in a dict; anything else is
+    matched with difflib against the same keys. Keys shared by more than one
+    country (plain 'korea', 'congo') are left out rather than guessed.
+    """
+
+    def __init__(self, mapping, aliases=None, cutoff=0.85):
+        self.mapping = mapping
+        self.cutoff = cutoff
+        owners = {}
+        for index, name in mapping.items():
+            for key in _name_keys(name):
+                owners.setdefault(key, set()).add(index)
+        self._index = {key: indexes.pop() for key, indexes in owners.items() if len(indexes) == 1}
+        # Aliases name their country as spelled in COUNTRY_MAPPING; match on the
+        # normalized form so encoder spellings ('Côte d’Ivoire') still resolve
+        by_name = {normalize_name(name): index for index, name in mapping.items()}
+        for alias, name in (aliases if aliases is not None else ALIASES).items():
+            if normalize_name(name) in by_name:
+                self._index[normalize_name(alias)] = by_name[normalize_name(name)]
+        self._keys = list(self._index)
+
+    def lookup(self, name):
+        """Country index for ``name``, or ``None`` if nothing matches closely enough"""
+        if name is None:
+            return None
+        key = normalize_name(name)
+        if key in self._index:
+            return self._index[key]
+        close = difflib.get_close_matches(key, self._keys, n=1, cutoff=self.cutoff)
+        return self._index[close[0]] if close else None
+
+    def matches(self, name, n=5):
+        """Best ``(index, name, score)`` candidates, for suggestions"""
+        key = normalize_name(name)
+        candidates = difflib.get_close_matches(key, self._keys, n=n * 3, cutoff=0.5)
+        seen = {}
+        for candidate in candidates:
+            index = self._index[candidate]
+            score = difflib.SequenceMatcher(None, key, candidate).ratio()
+            seen[index] = max(score, seen.get(index, 0.0))
+        ranked = sorted(seen.items(), key=lambda item: -item[1])[:n]
+        return [(index, self.mapping[index], round(score, 3)) for index, score in ranked]
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+def _fill_polygon(raster, rings, value, lat_max, lon_min, resolution):
+    """Scanline fill of one polygon (outer ring plus holes, even-odd rule)
+    at the raster's cell centres"""
+    edges = []
+    for ring in rings:
+        points = np.asarray(ring, dtype=np.float64)[:, :2]
+        edges.append(np.column_stack([points[:-1], points[1:]]))
+    edges = np.concatenate(edges)
+    x0, y0, x1, y1 = edges.T
+    n_lat, n_lon = raster.shape
+    top = max(0, int(np.floor((lat_max - edges[:, [1, 3]].max()) / resolution)))
+    bottom = min(n_lat, int(np.ceil((lat_max - edges[:, [1, 3]].min()) / resolution)))
+    centres_lon = lon_min + (np.arange(n_lon) + 0.5) * resolution
+    for row in range(top, bottom):
+        y = lat_max - (row + 0.5) * resolution
+        crossing = (y0 <= y) != (y1 <= y)
+        if not crossing.any():
+            continue
+        xs = np.sort(x0[crossing] + (y - y0[crossing]) * (x1[crossing] - x0[crossing]) / (y1[crossing] - y0[crossing]))
+        for start, stop in zip(xs[0::2], xs[1::2]):
+            cols = slice(*np.searchsorted(centres_lon, [start, stop]))
+            raster[row, cols] = value
+
+
+def rasterize_countries(features, names, resolution=0.1, name_properties=('ADMIN', 'NAME', 'name', 'NAME_LONG')):
+    """Burn GeoJSON country polygons into an int16 grid of country indexes.
+
+    Rows run north to south from 90°, columns west to east from -180°;
+    cells outside every polygon are -1. Returns the raster and the feature
+    names that ``names`` (a ``CountryNameIndex``) could not place.
+    """
+    n_lat, n_lon = int(round(180 / resolution)), int(round(360 / resolution))
+    raster = np.full((n_lat, n_lon), -1, dtype=np.int16)
+    unmatched = []
+    for feature in features:
+        properties = feature.get('properties') or {}
+        name = next((properties[key] for key in name_properties if properties.get(key)), None)
+        index = names.lookup(name)
+        if index is None:
+            unmatched.append(name)
+            continue
+        for rings in _polygons(feature.get('geometry') or {'type': None}):
+            _fill_polygon(raster, rings, index, 90.0, -180.0, resolution)
+    return raster, unmatched
+
+
+def build_country_raster(geojson_path, output, names, resolution=0.1):
+    """Rasterize a country GeoJSON file and write ``output`` (.npy) plus a
+    JSON sidecar, both swapped into place atomically"""
+    with open(geojson_path, encoding='utf-8') as f:
+        features = json.load(f)['features']
+    raster, unmatched = rasterize_countries(features, names, resolution)
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + '.tmp.npy')
+    np.save(tmp, raster)
+    metadata = {
+        'resolution': resolution,
+        'lat_max': 90.0,
+        'lon_min': -180.0,
+        'source': Path(geojson_path).name,
+        'countries': int(len(np.unique(raster[raster >= 0]))),
+        'unmatched': unmatched,
+    }
+    output.with_suffix('.json').write_text(json.dumps(metadata, indent=2))
+    os.replace(tmp, output)
+    return metadata
+
+
+class CountryRaster:
+    """Precomputed raster lookup from coordinates to country_code_index.
+
+    One array index per point, so a batch of lookups is a couple of
+    vectorized NumPy operations. Points outside every country (oceans,
+    non-finite coordinates) come back as -1.
+    """
+
+    def __init__(self, raster, resolution, lat_max=90.0, lon_min=-180.0):
+        self.raster = raster
+        self.resolution = resolution
+        self.lat_max = lat_max
+        self.lon_min = lon_min
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        path = Path(path)
+        metadata = json.loads(path.with_suffix('.json').read_text())
+        return cls(np.load(path, mmap_mode=mmap_mode), metadata['resolution'],
+                   metadata['lat_max'], metadata['lon_min'])
+
+    def lookup(self, lat, lon):
+        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+            return self.lookup_one(lat, lon)
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        n_lat, n_lon = self.raster.shape
+        valid = np.isfinite(lat) & np.isfinite(lon) & (lat >= -90) & (lat <= 90)
+        rows = np.clip(np.floor((self.lat_max - np.where(valid, lat, 0)) / self.resolution), 0, n_lat - 1).astype(np.intp)
+        cols = (np.floor((np.where(valid, lon, 0) - self.lon_min) / self.resolution).astype(np.intp)) % n_lon
+        return np.where(valid, self.raster[rows, cols], -1)
+
+
+    def lookup_one(self, lat, lon):
+        """Scalar lookup without NumPy's per-call array overhead"""
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90):
+            return -1
+        n_lat, n_lon = self.raster.shape
+        row = min(max(int(math.floor((self.lat_max - lat) / self.resolution)), 0), n_lat - 1)
+        col = int(math.floor((lon - self.lon_min) / self.resolution)) % n_lon
+        return int(self.raster[row, col])
+
+
+class RasterCountry:
+    """Country resolver for the risk grid backed by a ``CountryRaster``.
+
+    Picklable (only the path travels to pool workers); cells outside every
+    country get ``fallback``.
+    """
+
+    def __init__(self, path, fallback=0):
+        self.path = str(path)
+        self.fallback = int(fallback)
+        self._raster = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'fallback': self.fallback, '_raster': None}
+
+    def __call__(self, lat, lon):
+        if self._raster is None:
+            self._raster = CountryRaster.load(self.path)
+        indexes = self._raster.lookup(lat, lon)
+        return np.where(indexes >= 0, indexes, self.fallback).astype(np.float64)
+
+    def describe(self):
+        return f'raster:{Path(self.path).name}'
+
+
+_raster_lock = threading.Lock()
+_rasters = {}
+
+
+def load_country_raster(path):
+    """The raster at ``path``, opened once per process; ``None`` if not built"""
+    path = Path(path)
+    with _raster_lock:
+        if path not in _rasters:
+            if not path.exists():
+                return None
+            _rasters[path] = CountryRaster.load(path)
+        return _rasters[path]
@@ -0,0 +1,145 @@
+import joblib
+import numpy as np
+
+
+def _normalizes_leaf_values():
+    """sklearn < 1.4 stored class counts in tree_.value and normalized them in
+    predict_proba; newer versions store fractions and use them as-is"""
+    import sklearn  # only needed (and already loaded) when compiling a forest
+    return tuple(int(part) for part in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+
+# Upper bound on rows * trees traversed at once, to cap temporary memory
+_MAX_CELLS = 1 << 16
+
+
+class CompiledForest:
+    """A fitted ``RandomForestClassifier`` flattened into contiguous arrays.
+
+    Every tree's nodes are concatenated into one set of arrays (feature,
+    threshold, left/right child, NaN direction) and ``roots`` holds each
+    tree's first node. Leaves point to themselves, so all trees can be walked
+    for all rows at once with a fixed number of vectorized steps.
+
+    The arithmetic mirrors sklearn: inputs are cast to float32 before the
+    threshold comparisons, per-tree leaf probabilities are summed in tree
+    order into float64 and divided by the number of trees. ``predict`` and
+    ``predict_proba`` therefore match sklearn bit for bit (for a forest used
+    with ``n_jobs=None``), without its per-call validation and joblib dispatch.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'missing_left', 'leaf_value', 'roots', 'classes')
+
+    def __init__(self, feature, threshold, left, right, missing_left, leaf_value,
+                 roots, classes, max_depth, n_features, source_sha256=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.source_sha256 = source_sha256
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, forest, source_sha256=None):
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        normalize = _normalizes_leaf_values()
+        parts = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'missing_left', 'leaf_value')}
+        roots = []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            nodes = tree.__getstate__()['nodes']
+            n_nodes = tree.node_count
+            is_leaf = nodes['left_child'] == -1
+            own_index = np.arange(offset, offset + n_nodes, dtype=np.intp)
+
+            parts['feature'].append(np.where(is_leaf, 0, nodes['feature']).astype(np.intp))
+            parts['threshold'].append(nodes['threshold'].astype(np.float64))
+            parts['left'].append(np.where(is_leaf, own_index, nodes['left_child'] + offset).astype(np.intp))
+            parts['right'].append(np.where(is_leaf, own_index, nodes['right_child'] + offset).astype(np.intp))
+            if 'missing_go_to_left' in nodes.dtype.names:
+                parts['missing_left'].append(nodes['missing_go_to_left'].astype(bool))
+            else:
+                parts['missing_left'].append(np.zeros(n_nodes, dtype=bool))
+
+            values = np.ascontiguousarray(tree.value[:, 0, :forest.n_classes_], dtype=np.float64)
+            if normalize:
+                normalizer = values.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                values = values / normalizer
+            parts['leaf_value'].append(values)
+
+            roots.append(offset)
+            offset += n_nodes
+
+        return cls(
+            **{name: np.ascontiguousarray(np.concatenate(arrays)) for name, arrays in parts.items()},
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=np.asarray(forest.classes_),
+            max_depth=max(estimator.tree_.max_depth for estimator in forest.estimators_),
+            n_features=forest.n_features_in_,
+            source_sha256=source_sha256
+        )
+
+    def _prepare(self):
+        """Derived arrays for the traversal loop, built once per process"""
+        if getattr(self, '_children', None) is None:
+            # children[2 * node] is the left child, children[2 * node + 1] the right
+            self._children = np.ascontiguousarray(np.column_stack([self.left, self.right]).ravel())
+            self._has_missing = bool(self.missing_left.any())
+
+    def apply(self, X):
+        """Global leaf index reached in every tree, shape (n_samples, n_trees)"""
+        self._prepare()
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            values = flat_X.take(row_offset + self.feature.take(nodes))
+            go_right = ~(values <= self.threshold.take(nodes))
+            if self._has_missing:
+                go_right &= ~(np.isnan(values) & self.missing_left.take(nodes))
+            nodes = self._children.take(2 * nodes + go_right)
+        return nodes
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n_samples, {self.n_features})")
+        proba = np.zeros((X.shape[0], len(self.classes)), dtype=np.float64)
+        chunk = max(1, _MAX_CELLS // self.n_trees)
+        for start in range(0, X.shape[0], chunk):
+            leaves = self.apply(X[start:start + chunk])
+            out = proba[start:start + chunk]
+            for tree in range(self.n_trees):
+                out += self.leaf_value[leaves[:, tree]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def save(self, path):
+        """Write uncompressed so the arrays can be memory-mapped on load"""
+        state = {name: getattr(self, name) for name in self.ARRAYS}
+        state.update(max_depth=self.max_depth, n_features=self.n_features, source_sha256=self.source_sha256)
+        joblib.dump(state, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a saved forest; with ``mmap_mode='r'`` the node arrays stay in
+        the page cache and are shared by every process that maps them"""
+        return cls(**joblib.load(path, mmap_mode=mmap_mode))
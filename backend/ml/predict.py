@@ -1,30 +1,39 @@
-import joblib
+import time
+from itertools import chain, islice
 import numpy as np
 from pathlib import Path
-from flask import jsonify
+from flask import Response, jsonify, stream_with_context
+from config import Config
+from metrics import metrics, stage
+from serialization import dumps
+from ml.registry import ModelRegistry, ModelUnavailableError
+from ml.prediction_cache import PredictionCache
+from ml.countries import load_country_raster
+from ml.coordinates import LATITUDE_COLUMN, LONGITUDE_COLUMN
+
+COORDINATE_RANGE_ERROR = 'latitude and longitude must be in degrees (-90..90, -180..180)'
+NO_RASTER_ERROR = ('country_code_index or country is required: coordinate lookup is off until a country '
+                   'raster is built (flask build-country-raster)')
 
 # Define paths to model files
 MODEL_DIR = Path(__file__).parent
 MODEL_PATH = MODEL_DIR / 'random_forest_model.joblib'
 SCALER_PATH = MODEL_DIR / 'scaler.joblib'
+COMPILED_MODEL_PATH = MODEL_DIR / 'random_forest_model.compiled.joblib'
 
-# Load models at module level
-try:
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-except Exception as e:
-    raise RuntimeError(f"Failed to load model files: {str(e)}")
-
+# Fallback for a missing magnitude_scale_encoder.joblib, in the encoder's class order
+# (Km2, Kph, Richter, Vaccinated, °C, NaN); bundles take the names from the encoder
 MAGNITUDE_SCALE_MAPPING = {
     0: "Km²",
-    1: "Richter Scale", 
-    2: "Wind Speed (km/h)",
-    3: "Water Level (m)",
+    1: "Wind Speed (km/h)",
+    2: "Richter Scale",
+    3: "Vaccinated",
     4: "Temperature (°C)",
-    5: "Rainfall (mm)"
+    5: "Unknown"
 }
 
-# Mappings (unchanged from your version)
+# Disaster and country names are served from the active bundle, which derives them
+# from its encoders; these are the fallbacks for encoders that are missing or don't fit
 DISASTER_MAPPING = {
     0: "Other", 1: "Drought", 2: "Earthquake", 3: "Epidemic",
     4: "Extreme temperature", 5: "Flood", 6: "Fog",
@@ -70,56 +79,611 @@ COUNTRY_MAPPING = {
     224: 'Yemen P Dem Rep', 225: 'Yugoslavia', 226: 'Zambia', 227: 'Zimbabwe'
 }
 
+# Models are loaded lazily on first use (or preloaded by the gunicorn master)
+registry = ModelRegistry(
+    MODEL_DIR,
+    bundle_dir=Config.MODEL_BUNDLE_DIR,
+    mmap_mode=Config.MODEL_MMAP_MODE,
+    reload_interval=Config.MODEL_RELOAD_INTERVAL,
+    disaster_types=DISASTER_MAPPING,
+    countries=COUNTRY_MAPPING,
+    magnitude_scales=MAGNITUDE_SCALE_MAPPING
+)
+
+# Memoized class probabilities for repeat requests, cleared when the model changes
+prediction_cache = PredictionCache(
+    max_size=Config.PREDICTION_CACHE_SIZE,
+    ttl=Config.PREDICTION_CACHE_TTL,
+    resolution=Config.PREDICTION_CACHE_RESOLUTION
+)
+
+
+def _on_model_swap(bundle):
+    prediction_cache.set_model(bundle.checksum)
+    metrics.clear_gauge('disaster_model_info')
+    metrics.set_gauge('disaster_model_info', 1, version=bundle.version)
+
+
+registry.on_swap(_on_model_swap)
+
+REQUIRED_FIELDS = [
+    'year', 'mag_scale_index', 'dis_mag_value',
+    'country_code_index', 'longitude', 'latitude'
+]
+
+
+def _format_prediction(prediction, mag_scale_index, dis_mag_value, country_code_index, top=None, debug=True,
+                       bundle=None):
+    """Build the response body for one predicted label.
+
+    ``top`` is an optional ``(labels, probabilities)`` pair, most likely
+    first, which adds ``confidence`` and ``top_predictions``. Labels and
+    probabilities stay NumPy scalars; the JSON provider serializes them.
+    ``debug`` adds ``original_data``, the inputs the labels came from.
+    Names come from ``bundle``, the one the labels were predicted with.
+    """
+    bundle = bundle or registry.bundle
+    disaster_types = bundle.disaster_types
+    result = {
+        'success': True,
+        'disaster_name': disaster_types.get(prediction, "Unknown"),
+        'magnitude_scale': bundle.magnitude_scales.get(mag_scale_index, "Unknown"),
+        'magnitude_value': dis_mag_value,
+        'country_name': bundle.countries.get(country_code_index, "Unknown"),
+    }
+    if debug:
+        result['original_data'] = {
+            'predicted_label': prediction,
+            'mag_scale_index': mag_scale_index,
+            'country_code_index': country_code_index
+        }
+    if top is not None:
+        labels, probabilities = top
+        result['confidence'] = probabilities[0]
+        result['top_predictions'] = [{
+            'label': label,
+            'disaster_name': disaster_types.get(label, "Unknown"),
+            'probability': probability
+        } for label, probability in zip(labels, probabilities)]
+    return result
+
+
+def _forest_predict_proba(features, bundle=None):
+    """Scale and run the forest, returning class probabilities.
+
+    The flat-array engine has far less per-call overhead, but sklearn's
+    Cython traversal wins on large batches, so 'auto' switches over above
+    COMPILED_ENGINE_MAX_ROWS. Both give identical probabilities.
+    Longitude and latitude arrive in degrees and are encoded the way the
+    training data was, when the bundle has a coordinate encoder.
+    """
+    bundle = bundle or registry.bundle
+    if bundle.coordinates is not None:
+        with stage('encode_coordinates'):
+            features = bundle.coordinates.encode_features(features)
+    with stage('scaler_transform'):
+        features_scaled = bundle.scaler.transform(features)
+    engine = Config.INFERENCE_ENGINE
+    with stage('model_predict'):
+        if engine == 'sklearn' or (engine == 'auto' and len(features_scaled) > Config.COMPILED_ENGINE_MAX_ROWS):
+            return bundle.model.predict_proba(features_scaled)
+        return bundle.engine.predict_proba(features_scaled)
+
+
+def _predict_proba(features, bundle=None):
+    """Class probabilities for a float feature matrix, serving repeats from the cache"""
+    bundle = bundle or registry.bundle
+    if not prediction_cache.enabled:
+        return _forest_predict_proba(features, bundle)
+
+    with stage('cache_lookup'):
+        keys = prediction_cache.keys_for(features)
+        values, missing = prediction_cache.lookup(keys, bundle.checksum)
+    proba = np.zeros((len(keys), len(bundle.engine.classes)), dtype=np.float64)
+    for i, value in enumerate(values):
+        if value is not None:
+            proba[i] = value
+
+    if missing:
+        computed = _forest_predict_proba(features[missing], bundle)
+        proba[missing] = computed
+        with stage('cache_store'):
+            prediction_cache.store([keys[i] for i in missing], [row.copy() for row in computed], bundle.checksum)
+    return proba
+
+
+def _labels(proba, bundle=None):
+    """Argmax label per row, exactly as ``model.predict`` picks it"""
+    return (bundle or registry.bundle).engine.classes.take(np.argmax(proba, axis=1), axis=0)
+
+
+def top_k(proba, k, bundle=None):
+    """Top ``k`` labels and probabilities per row, most likely first.
+
+    Uses a partial sort (argpartition) over each probability vector and only
+    fully sorts the ``k`` survivors.
+    """
+    k = min(k, proba.shape[1])
+    candidates = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    candidate_proba = np.take_along_axis(proba, candidates, axis=1)
+    order = np.argsort(-candidate_proba, axis=1, kind='stable')
+    labels = (bundle or registry.bundle).engine.classes[np.take_along_axis(candidates, order, axis=1)]
+    return labels, np.take_along_axis(candidate_proba, order, axis=1)
+
+
+def _parse_top_k(value):
+    """Validate an optional ``top_k`` request parameter"""
+    if value is None:
+        return None
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('top_k must be a positive integer')
+    if k < 1:
+        raise ValueError('top_k must be a positive integer')
+    return k
+
+
+def _parse_debug(value):
+    """Validate an optional ``debug`` request parameter (default PREDICT_DEBUG_FIELDS)"""
+    if value is None:
+        return Config.PREDICT_DEBUG_FIELDS
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('true', '1'):
+        return True
+    if str(value).lower() in ('false', '0'):
+        return False
+    raise ValueError('debug must be true or false')
+
+
+def register_cache(c):
+    """Use the app's cache backend as a cross-worker tier for predictions"""
+    prediction_cache.shared = c
+
+
+def resolve_countries(latitudes, longitudes):
+    """Vectorized country_code_index for coordinates in degrees; -1 where
+    none is known.
+
+    Raises ``ValueError`` if no country raster has been built.
+    """
+    raster = load_country_raster(Config.COUNTRY_RASTER_PATH)
+    if raster is None:
+        raise ValueError(NO_RASTER_ERROR)
+    return raster.lookup(latitudes, longitudes)
+
+
+def country_lookup_status():
+    """Whether coordinates can be turned into a country_code_index here"""
+    enabled = load_country_raster(Config.COUNTRY_RASTER_PATH) is not None
+    return {
+        'enabled': enabled,
+        'raster_path': Config.COUNTRY_RASTER_PATH,
+        'note': None if enabled else ('No country raster ships with the app. Send country_code_index or a '
+                                      'country name, or build one with flask build-country-raster countries.geojson'),
+    }
+
+
+def _country_from_name(name, country_names):
+    index = country_names.lookup(name)
+    if index is None:
+        raise ValueError(f'Unknown country: {name!r}')
+    return index
+
+
+def _fill_countries(rows, pending, errors):
+    """Derive country_code_index for ``pending`` rows from their coordinates"""
+    if not pending:
+        return
+    coordinates = []
+    located = []
+    for i in pending:
+        try:
+            coordinates.append((float(rows[i][5]), float(rows[i][4])))
+            located.append(i)
+        except (TypeError, ValueError):
+            errors[i] = 'All fields must be numeric'
+    if not located:
+        return
+    try:
+        lat, lon = np.array(coordinates, dtype=np.float64).T
+        indexes = resolve_countries(lat, lon)
+    except ValueError as e:
+        for i in located:
+            errors[i] = str(e)
+        return
+    for i, index in zip(located, indexes):
+        if index < 0:
+            errors[i] = 'Could not determine country_code_index from coordinates'
+        else:
+            rows[i] = rows[i][:3] + (int(index),) + rows[i][4:]
+
+
+def _event_row(event, country_names):
+    """Row tuple for one event dict, resolving a ``country`` name with ``country_names``.
+
+    Returns ``(row, needs_country)``; the row is ``None`` when required
+    fields are missing, and ``needs_country`` means country_code_index
+    should be filled in from the coordinates.
+    """
+    if not isinstance(event, dict):
+        return None, False
+    if 'country_code_index' not in event and event.get('country') is not None:
+        event = dict(event, country_code_index=_country_from_name(event['country'], country_names))
+    if 'country_code_index' in event:
+        if not all(field in event for field in REQUIRED_FIELDS):
+            return None, False
+        return tuple(event[field] for field in REQUIRED_FIELDS), False
+    fields = [field for field in REQUIRED_FIELDS if field != 'country_code_index']
+    if not all(field in event for field in fields):
+        return None, False
+    return tuple(event.get(field) for field in REQUIRED_FIELDS), True
+
+
+def _collect_rows(events, bundle=None):
+    """Turn a list of event dicts or a dict of columns into raw feature rows.
+
+    Returns ``(rows, errors)`` where ``rows[i]`` is a tuple in
+    ``REQUIRED_FIELDS`` order (or ``None``) and ``errors`` maps row index to
+    a message. ``country_code_index`` may be omitted in favour of a
+    ``country`` name (resolved against ``bundle``'s countries) or, failing
+    that, derived from the coordinates.
+    """
+    errors = {}
+    country_names = (bundle or registry.bundle).country_names
+
+    if isinstance(events, dict):
+        events = dict(events)
+        missing = [field for field in REQUIRED_FIELDS if field not in events and field != 'country_code_index']
+        if missing:
+            raise ValueError(f'Missing required columns: {missing}')
+        by_name = 'country_code_index' not in events and isinstance(events.get('country'), list)
+        if by_name:
+            events['country_code_index'] = [country_names.lookup(name) for name in events['country']]
+        elif 'country_code_index' not in events:
+            latitudes = events['latitude']
+            events['country_code_index'] = [None] * len(latitudes) if isinstance(latitudes, list) else None
+        columns = [events[field] for field in REQUIRED_FIELDS]
+        if not all(isinstance(column, list) for column in columns):
+            raise ValueError('Columnar input must map each field to a list')
+        if len({len(column) for column in columns}) != 1:
+            raise ValueError('All columns must have the same length')
+        rows = list(zip(*columns))
+        unresolved = [i for i, row in enumerate(rows) if row[3] is None]
+        if by_name:
+            for i in unresolved:
+                errors[i] = f"Unknown country: {events['country'][i]!r}"
+        else:
+            _fill_countries(rows, unresolved, errors)
+        return rows, errors
+
+    if not isinstance(events, list):
+        raise ValueError('Events must be a list of objects or a dict of columns')
+
+    rows = []
+    pending = []
+    for i, event in enumerate(events):
+        try:
+            row, needs_country = _event_row(event, country_names)
+        except ValueError as e:
+            errors[i] = str(e)
+            rows.append(None)
+            continue
+        if row is None:
+            errors[i] = f'Missing required fields. Required: {REQUIRED_FIELDS}'
+        elif needs_country:
+            pending.append(i)
+        rows.append(row)
+    _fill_countries(rows, pending, errors)
+    return rows, errors
+
+
+def _rows_to_features(rows, errors):
+    """Validate all rows at once and build the float feature matrix.
+
+    Rows that cannot be converted are recorded in ``errors``; the returned
+    mask marks the rows that made it into the matrix.
+    """
+    n_rows = len(rows)
+    features = np.zeros((n_rows, len(REQUIRED_FIELDS)), dtype=np.float64)
+    valid = np.zeros(n_rows, dtype=bool)
+
+    candidates = [i for i in range(n_rows) if i not in errors]
+    try:
+        # Fast path: every candidate row is already numeric
+        features[candidates] = np.array([rows[i] for i in candidates], dtype=np.float64)
+        valid[candidates] = True
+    except (TypeError, ValueError):
+        for i in candidates:
+            try:
+                features[i] = np.array(rows[i], dtype=np.float64)
+                valid[i] = True
+            except (TypeError, ValueError):
+                errors[i] = 'All fields must be numeric'
+
+    non_finite = valid & ~np.isfinite(features).all(axis=1)
+    for i in np.flatnonzero(non_finite):
+        errors[int(i)] = 'All fields must be finite numbers'
+    valid &= ~non_finite
+
+    # Coordinates are taken in degrees and encoded for the model later (see ml/coordinates.py)
+    off_globe = valid & ((np.abs(features[:, LATITUDE_COLUMN]) > 90) | (np.abs(features[:, LONGITUDE_COLUMN]) > 180))
+    for i in np.flatnonzero(off_globe):
+        errors[int(i)] = COORDINATE_RANGE_ERROR
+    valid &= ~off_globe
+
+    return features, valid
+
+
+def predict_batch(events, top_k=None, debug=True):
+    """Score many events with a single scaler and model pass.
+
+    ``events`` is either a list of event dicts or a dict of equal-length
+    columns keyed by ``REQUIRED_FIELDS``. Returns one result per input row,
+    in input order; rows that fail validation carry ``success: False`` and
+    an ``error`` message instead of a prediction. With ``top_k``, each
+    result also lists the ``top_k`` most likely disaster types; ``debug``
+    keeps each result's ``original_data``.
+    """
+    bundle = registry.bundle
+    rows, errors = _collect_rows(events, bundle)
+    return _score_rows(rows, errors, top_k, debug=debug, bundle=bundle)
+
+
+def _score_rows(rows, errors, k=None, cached=True, debug=True, bundle=None):
+    """Run one vectorized transform/predict over the valid rows"""
+    bundle = bundle or registry.bundle
+    with stage('validate'):
+        features, valid = _rows_to_features(rows, errors)
+        valid_index = np.cumsum(valid) - 1
+
+    if valid.any():
+        proba = _predict_proba(features[valid], bundle) if cached else _forest_predict_proba(features[valid], bundle)
+        labels = _labels(proba, bundle)
+        top_labels, top_proba = top_k(proba, k, bundle) if k else (None, None)
+
+    with stage('format'):
+        results = []
+        for i, row in enumerate(rows):
+            if i in errors:
+                results.append({'index': i, 'success': False, 'error': errors[i]})
+                continue
+            j = valid_index[i]
+            top = (top_labels[j], top_proba[j]) if k else None
+            result = _format_prediction(labels[j], row[1], row[2], row[3], top, debug, bundle)
+            result['index'] = i
+            results.append(result)
+    return results
+
+
+def _csv_value(value):
+    """CSV cells are strings; parse them the way JSON numbers would arrive"""
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _csv_event(record):
+    # Empty cells count as missing, so a blank country_code_index falls
+    # back to the country name or the coordinates
+    return {key: _csv_value(value) if key in REQUIRED_FIELDS else value
+            for key, value in record.items() if key is not None and value not in ('', None)}
+
+
+def _score_chunks(records, chunk_size, k=None, fmt='jsonl', debug=True, bundle=None):
+    """Score records ``chunk_size`` at a time, yielding each chunk's results.
+    The whole stream is scored by one bundle, even across a reload."""
+    bundle = bundle or registry.bundle
+    records = iter(records)
+    offset = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        with stage('collect_rows'):
+            events = [_csv_event(record) if fmt == 'csv' and record is not None else record for record in chunk]
+            rows, errors = _collect_rows(events, bundle)
+        results = _score_rows(rows, errors, k, cached=False, debug=debug, bundle=bundle)
+        for result in results:
+            if chunk[result['index']] is None:
+                result['error'] = 'Row is not valid JSON'
+            result['index'] += offset
+        offset += len(chunk)
+        yield results
+
+
+def predict_stream(records, chunk_size=None, top_k=None, fmt='jsonl', debug=True):
+    """Score an iterable of event records lazily, in fixed-size chunks.
+
+    ``records`` are event dicts as parsed from JSONL (``None`` for lines
+    that were not valid JSON) or CSV (string cells, with ``fmt='csv'``).
+    Yields one result per record in input order, ``index`` counting from 0
+    across the whole stream. Only one chunk is held in memory at a time.
+    The prediction cache is bypassed: bulk rescoring rarely repeats rows
+    and would only evict interactive traffic.
+    """
+    for results in _score_chunks(records, chunk_size or Config.PREDICT_STREAM_CHUNK_SIZE, top_k, fmt, debug):
+        yield from results
+
+
 def predict_disaster(request):
     """Handle prediction request"""
-    data = request.get_json()
+    with stage('parse_json'):
+        data = request.get_json()
     
     if not data:
         response = jsonify({'success': False, 'error': 'No data provided'})
         return response, 400
     
     try:
-        required_fields = [
-            'year', 'mag_scale_index', 'dis_mag_value',
-            'country_code_index', 'longitude', 'latitude'
-        ]
-        
-        if not all(field in data for field in required_fields):
+        # One bundle for the whole request, even if a reload swaps in another
+        bundle = registry.bundle
+        if isinstance(data, dict) and 'country_code_index' not in data:
+            # Fill it in from a country name or the coordinates
+            rows, errors = _collect_rows([data], bundle)
+            if errors:
+                return jsonify({'success': False, 'error': errors[0]}), 400
+            data = dict(data, country_code_index=rows[0][3])
+
+        if not all(field in data for field in REQUIRED_FIELDS):
             response = jsonify({
                 'success': False,
-                'error': f'Missing required fields. Required: {required_fields}'
+                'error': f'Missing required fields. Required: {REQUIRED_FIELDS}'
             })
             return response, 400
 
-        # Prepare and predict
-        features = np.array([[
-            data['year'],
-            data['mag_scale_index'],
-            data['dis_mag_value'],
-            data['country_code_index'],
-            data['longitude'],
-            data['latitude']
-        ]])
-        features_scaled = scaler.transform(features)
-        prediction = model.predict(features_scaled)[0]
+        try:
+            k = _parse_top_k(data.get('top_k', request.args.get('top_k')))
+            debug = _parse_debug(data.get('debug', request.args.get('debug')))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        # Prepare and predict (one forest pass, even with top_k)
+        with stage('validate'):
+            # Same checks and messages as the batch path
+            errors = {}
+            features, _ = _rows_to_features([[data[field] for field in REQUIRED_FIELDS]], errors)
+            if errors:
+                return jsonify({'success': False, 'error': errors[0]}), 400
+        proba = _predict_proba(features, bundle)
+        prediction = _labels(proba, bundle)[0]
+        top = tuple(part[0] for part in top_k(proba, k, bundle)) if k else None
         
+        with stage('format'):
+            result = _format_prediction(
+                prediction,
+                data['mag_scale_index'],
+                data['dis_mag_value'],
+                data['country_code_index'],
+                top,
+                debug,
+                bundle
+            )
+            result['model_version'] = bundle.version
+        with stage('jsonify'):
+            response = jsonify(result)
+        response.headers['X-Model-Version'] = bundle.version
+        return response
+
+    except ModelUnavailableError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
         response = jsonify({
-            'success': True,
-            'disaster_name': DISASTER_MAPPING.get(int(prediction), "Unknown"),
-            'magnitude_scale': MAGNITUDE_SCALE_MAPPING.get(data['mag_scale_index'], "Unknown"),
-            'magnitude_value': data['dis_mag_value'],
-            'country_name': COUNTRY_MAPPING.get(data['country_code_index'], "Unknown"),
-            'original_data': {  # Include original values for debugging
-                'predicted_label': int(prediction),
-                'mag_scale_index': data['mag_scale_index'],
-                'country_code_index': data['country_code_index']
-            }
+            'success': False,
+            'error': str(e)
+        })
+        return response, 500
+
+
+def predict_disaster_batch(request):
+    """Handle batch prediction request"""
+    with stage('parse_json'):
+        data = request.get_json()
+
+    if not data:
+        response = jsonify({'success': False, 'error': 'No data provided'})
+        return response, 400
+
+    events = data.get('events', data) if isinstance(data, dict) else data
+
+    try:
+        top_k_param = data.get('top_k') if isinstance(data, dict) else None
+        k = _parse_top_k(top_k_param if top_k_param is not None else request.args.get('top_k'))
+        debug_param = data.get('debug') if isinstance(data, dict) else None
+        debug = _parse_debug(debug_param if debug_param is not None else request.args.get('debug'))
+        bundle = registry.bundle
+        with stage('collect_rows'):
+            rows, errors = _collect_rows(events, bundle)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except ModelUnavailableError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+
+    if len(rows) > Config.PREDICT_BATCH_MAX_ROWS:
+        response = jsonify({
+            'success': False,
+            'error': f'Batch too large. Maximum rows: {Config.PREDICT_BATCH_MAX_ROWS}'
         })
+        return response, 413
+
+    try:
+        results = _score_rows(rows, errors, k, debug=debug, bundle=bundle)
+        with stage('jsonify'):
+            response = jsonify({
+                'success': True,
+                'model_version': bundle.version,
+                'count': len(results),
+                'errors': sum(1 for result in results if not result['success']),
+                'results': results
+            })
+        response.headers['X-Model-Version'] = bundle.version
         return response
 
+    except ModelUnavailableError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         response = jsonify({
             'success': False,
             'error': str(e)
         })
-        return response, 500
\ No newline at end of file
+        return response, 500
+
+
+def predict_disaster_stream(request, records, fmt):
+    """Handle a streaming prediction request: NDJSON results, one per line.
+
+    The first chunk is scored before the response starts so that a bad
+    ``top_k`` or an unavailable model still gets a proper status code.
+    After the results, a last line reports ``done``, ``count``, ``errors``
+    and ``model_version``; a stream that ends without ``"done": true`` was
+    cut short.
+    """
+    try:
+        k = _parse_top_k(request.args.get('top_k'))
+        debug = _parse_debug(request.args.get('debug'))
+        chunk_size = int(request.args.get('chunk_size', Config.PREDICT_STREAM_CHUNK_SIZE))
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be a positive integer')
+        if chunk_size > Config.PREDICT_STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f'chunk_size must be at most {Config.PREDICT_STREAM_MAX_CHUNK_SIZE}')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    start = time.perf_counter()
+    try:
+        bundle = registry.bundle
+        chunks = _score_chunks(records, chunk_size, k, fmt, debug, bundle)
+        first = next(chunks, [])
+    except ModelUnavailableError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    def generate():
+        count = errors = 0
+        try:
+            for results in chain([first], chunks):
+                count += len(results)
+                errors += sum(1 for result in results if not result['success'])
+                with stage('serialize'):
+                    payload = b''.join(dumps(result) + b'\n' for result in results)
+                yield payload
+        except Exception as e:
+            yield dumps({'done': False, 'count': count, 'error': str(e)}) + b'\n'
+            return
+        yield dumps({
+            'done': True,
+            'count': count,
+            'errors': errors,
+            'model_version': bundle.version,
+            'seconds': round(time.perf_counter() - start, 3)
+        }) + b'\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Model-Version'] = bundle.version
+    return response
@@ -0,0 +1,159 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Bounded LRU/TTL memo of predictions keyed on quantized features.
+
+    Each feature is divided by its entry in ``resolution`` and rounded, so
+    requests whose coordinates (or magnitudes) differ by less than one step
+    share a key and skip the forest entirely. ``set_model`` tells the cache
+    which model it is caching for (the bundle checksum); switching to
+    another one clears it, and values computed by a request still running
+    on the old model are not stored.
+
+    ``shared`` may be set to a Flask-Caching backend used as a second tier,
+    so workers reuse each other's predictions. Shared keys embed the model
+    hash, which makes entries from an older model unreachable.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600, resolution=None, shared=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.resolution = np.asarray(resolution if resolution is not None else 1.0, dtype=np.float64)
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.model_hash = None
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def keys_for(self, features):
+        """Quantize an (n, n_features) matrix into hashable per-row keys.
+
+        A row is keyed ``None`` (never cached) when a quantized value is not
+        finite or doesn't fit in int64: the cast would wrap it or make it up,
+        and the row could then share another row's key and probabilities.
+        """
+        quantized = np.round(np.asarray(features, dtype=np.float64) / self.resolution)
+        if quantized.ndim == 1:
+            quantized = quantized.reshape(1, -1)
+        cacheable = (np.isfinite(quantized) & (np.abs(quantized) < 2.0 ** 63)).all(axis=1)
+        rows = np.where(cacheable[:, None], quantized, 0).astype(np.int64)
+        return [tuple(row) if ok else None for row, ok in zip(rows.tolist(), cacheable.tolist())]
+
+    def set_model(self, model_hash):
+        """Cache for the model identified by ``model_hash``, dropping every
+        entry if it differs from the current one"""
+        with self._lock:
+            if self.model_hash is not None and model_hash != self.model_hash:
+                self._entries.clear()
+                self.invalidations += 1
+            self.model_hash = model_hash
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, model_hash):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            # Checked under the lock so a concurrent set_model can't be undone
+            if model_hash != self.model_hash:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _shared_key(self, key, model_hash):
+        return f"proba:{model_hash}:{','.join(map(str, key))}"
+
+    def lookup(self, keys, model_hash):
+        """Return ``(values, missing)``: cached values aligned with ``keys``
+        (``None`` where absent) and the indices that still need predicting.
+
+        ``model_hash`` is the checksum of the bundle the caller will predict
+        with, never of a file on disk; if that is no longer the cached model,
+        every key is reported missing.
+        """
+        if model_hash is None or model_hash != self.model_hash:
+            return [None] * len(keys), list(range(len(keys)))
+        values = [self.get(key) if key is not None else None for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        shareable = [i for i in missing if keys[i] is not None]
+        if shareable and self.shared is not None:
+            found = self.shared.get_many(*[self._shared_key(keys[i], model_hash) for i in shareable])
+            still_missing = [i for i in missing if keys[i] is None]
+            for i, value in zip(shareable, found):
+                if value is None:
+                    still_missing.append(i)
+                else:
+                    values[i] = value
+                    self.set(keys[i], value, model_hash)
+                    self.shared_hits += 1
+            missing = sorted(still_missing)
+        return values, missing
+
+    def store(self, keys, values, model_hash):
+        """Cache ``values`` computed by ``model_hash``, unless it has since been replaced"""
+        if model_hash is None or model_hash != self.model_hash:
+            return
+        pairs = [(key, value) for key, value in zip(keys, values) if key is not None]
+        for key, value in pairs:
+            self.set(key, value, model_hash)
+        if self.shared is not None and pairs:
+            self.shared.set_many(
+                {self._shared_key(key, model_hash): value for key, value in pairs},
+                timeout=self.ttl
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'shared': self.shared is not None,
+            'shared_hits': self.shared_hits,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'model_hash': self.model_hash
+        }
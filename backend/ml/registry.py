@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import joblib
+
+from ml.bundle import (FILES, POINTER, ModelUnavailableError, current_version, load_bundle, load_files)
+from ml.forest_engine import CompiledForest
+from ml.prediction_cache import file_sha256
+
+
+class ModelRegistry:
+    """Process-wide holder for the active ``ModelBundle``, loaded on first use.
+
+    Loading is deferred until a prediction actually needs the model, so a
+    missing ``random_forest_model.joblib`` only fails the prediction routes
+    instead of the whole app import. Call ``preload()`` in the gunicorn
+    master (see ``gunicorn.conf.py``) so forked workers inherit the loaded
+    objects and share their pages copy-on-write.
+
+    The bundle served is the one ``CURRENT`` in ``bundle_dir`` names, or
+    the loose files in ``model_dir`` when there is none (see
+    ``ml/bundle.py``). ``mmap_mode`` is passed through to ``joblib.load``
+    for the scaler and sklearn model.
+
+    Hot reload: ``bundle`` re-reads ``CURRENT`` at most every
+    ``reload_interval`` seconds. A new version is loaded and verified on a
+    background thread while requests keep using the current bundle, then
+    swapped in with a single assignment; requests already running finish
+    on the bundle they started with. A version that fails to load is
+    recorded in ``last_error`` and not retried until ``CURRENT`` changes.
+    """
+
+    def __init__(self, model_dir, bundle_dir=None, mmap_mode=None, reload_interval=30,
+                 disaster_types=None, countries=None, magnitude_scales=None):
+        self.model_dir = Path(model_dir)
+        self.model_path = self.model_dir / FILES['model']
+        self.scaler_path = self.model_dir / FILES['scaler']
+        self.compiled_path = self.model_dir / FILES['compiled']
+        self.bundle_dir = Path(bundle_dir) if bundle_dir else None
+        self.mmap_mode = mmap_mode
+        self.reload_interval = reload_interval
+        self.defaults = {'disaster_types': disaster_types, 'countries': countries,
+                         'magnitude_scales': magnitude_scales}
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self._pointer_signature = None
+        self._next_check = 0.0
+        self._swap_callbacks = []
+        self.load_seconds = None
+        self.loaded_pid = None
+        self.last_error = None
+        self.reloads = 0
+        self.swapped_at = None
+
+    def on_swap(self, callback):
+        """Call ``callback(bundle)`` whenever a bundle becomes the active one"""
+        self._swap_callbacks.append(callback)
+        if self._bundle is not None:
+            callback(self._bundle)
+
+    @property
+    def loaded(self):
+        return self._bundle is not None
+
+    @property
+    def bundle(self):
+        """The active bundle; take it once per request and use only that"""
+        bundle = self._bundle
+        if bundle is None:
+            self.load()
+            return self._bundle
+        if self.reload_interval > 0 and time.monotonic() >= self._next_check:
+            self._check_pointer()
+        return bundle
+
+    # The active bundle's parts, for callers that only need one of them
+    @property
+    def engine(self):
+        return self.bundle.engine
+
+    @property
+    def scaler(self):
+        return self.bundle.scaler
+
+    @property
+    def model(self):
+        return self.bundle.model
+
+    def _pointer_stat(self):
+        if self.bundle_dir is None:
+            return None
+        try:
+            stat = os.stat(self.bundle_dir / POINTER)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_version(self, version):
+        start = time.perf_counter()
+        if version is None:
+            bundle = load_files(self.model_dir, self.mmap_mode, **self.defaults)
+        else:
+            bundle = load_bundle(self.bundle_dir / version, self.mmap_mode)
+        return bundle, time.perf_counter() - start
+
+    def _swap(self, bundle, seconds):
+        self._bundle = bundle
+        self.load_seconds = seconds
+        self.loaded_pid = os.getpid()
+        self.swapped_at = time.time()
+        self.last_error = None
+        for callback in self._swap_callbacks:
+            callback(bundle)
+
+    def load(self):
+        """Load the active bundle once; concurrent callers wait for the first load"""
+        with self._lock:
+            if self._bundle is not None:
+                return
+            # Stat before reading, so a change in between is seen by the next check
+            self._pointer_signature = self._pointer_stat()
+            try:
+                version = current_version(self.bundle_dir) if self.bundle_dir else None
+                bundle, seconds = self._load_version(version)
+            except (ModelUnavailableError, ValueError, OSError) as e:
+                self.last_error = str(e)
+                if isinstance(e, ModelUnavailableError):
+                    raise
+                raise ModelUnavailableError(f"Failed to read the active model version: {str(e)}") from e
+            self._next_check = time.monotonic() + self.reload_interval
+            self._swap(bundle, seconds)
+
+    def _check_pointer(self):
+        """Start a background reload if ``CURRENT`` names another version"""
+        self._next_check = time.monotonic() + self.reload_interval
+        signature = self._pointer_stat()
+        if signature is None or signature == self._pointer_signature:
+            return
+        with self._reload_lock:
+            if self._reloading or signature == self._pointer_signature:
+                return
+            self._pointer_signature = signature
+            try:
+                version = current_version(self.bundle_dir)
+            except (ValueError, OSError) as e:
+                self.last_error = str(e)
+                return
+            if version is None or version == self._bundle.version:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(version,), name='model-reload', daemon=True).start()
+
+    def _reload(self, version):
+        try:
+            bundle, seconds = self._load_version(version)
+            # Workers that have needed the sklearn forest will need it again
+            if self._bundle.model_loaded:
+                bundle.model
+        except ModelUnavailableError as e:
+            self.last_error = str(e)
+        else:
+            self._swap(bundle, seconds)
+            self.reloads += 1
+        finally:
+            self._reloading = False
+
+    def compile(self):
+        """Compile the loose sklearn forest and write it to ``compiled_path``"""
+        try:
+            model = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
+        except Exception as e:
+            raise ModelUnavailableError(f"Failed to load model files: {str(e)}") from e
+        engine = CompiledForest.from_sklearn(model, source_sha256=file_sha256(self.model_path))
+        engine.save(self.compiled_path)
+        return engine
+
+    def preload(self, include_model=False):
+        """Eagerly load the model, returning False instead of raising.
+
+        ``include_model`` also unpickles the sklearn forest when only the
+        compiled file was needed, so workers that fall back to it share it.
+        """
+        try:
+            self.load()
+            if include_model:
+                self._bundle.model
+            return True
+        except ModelUnavailableError:
+            return False
+
+    def status(self):
+        bundle = self._bundle
+        return {
+            'loaded': bundle is not None,
+            'version': bundle.version if bundle else None,
+            'checksum': bundle.checksum if bundle else None,
+            'model_path': str(bundle.model_path if bundle else self.model_path),
+            'engine_source': bundle.engine_source if bundle else None,
+            # How latitude/longitude (always sent in degrees) reach the model
+            'coordinates': (('encoded' if bundle.coordinates else 'degrees') if bundle else None),
+            'mmap_mode': self.mmap_mode,
+            'load_seconds': self.load_seconds,
+            'loaded_pid': self.loaded_pid,
+            'reload_interval': self.reload_interval,
+            'reloads': self.reloads,
+            'reloading': self._reloading,
+            'swapped_at': self.swapped_at,
+            'error': self.last_error
+        }
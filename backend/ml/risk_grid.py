@@ -0,0 +1,258 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from ml.countries import RasterCountry
+from ml.prediction_cache import file_sha256
+
+# Representative magnitudes swept for each mag_scale_index, in the magnitude
+# scale encoder's order (low, typical, severe), in the units the prediction form uses
+DEFAULT_MAGNITUDES = {
+    0: [1000.0, 10000.0, 100000.0],  # Km²
+    1: [90.0, 150.0, 250.0],         # Wind speed (km/h)
+    2: [4.5, 6.0, 7.5],              # Richter
+    3: [1000.0, 10000.0, 100000.0],  # Vaccinated (people)
+    4: [-30.0, 35.0, 45.0],          # Temperature (°C)
+}
+
+# Last axis of the grid: predicted label and confidence scaled to 0..255
+CHANNELS = ['label', 'confidence']
+
+GRID_VERSION = 1
+
+
+def raster_country(path, fallback=0):
+    if not Path(path).exists():
+        raise ValueError(f'No country raster at {path}. Run `flask build-country-raster` first.')
+    return RasterCountry(path, fallback)
+
+
+# name -> factory returning a picklable callable ``resolver(lat, lon)`` that
+# maps coordinate arrays to country_code_index values. There is deliberately
+# no constant resolver: with one country everywhere the model gives every
+# cell the same label.
+COUNTRY_RESOLVERS = {
+    'raster': raster_country,
+}
+
+
+def get_country_resolver(name, **kwargs):
+    try:
+        factory = COUNTRY_RESOLVERS[name]
+    except KeyError:
+        raise ValueError(f'Unknown country resolver {name!r}. Available: {sorted(COUNTRY_RESOLVERS)}')
+    return factory(**kwargs)
+
+
+def sidecar_path(path):
+    return Path(path).with_suffix('.json')
+
+
+def grid_axes(resolution, lat_max=90.0, lon_min=-180.0, lat_min=-90.0, lon_max=180.0):
+    """Cell-centre latitudes (north to south) and longitudes (west to east)"""
+    n_lat = int(round((lat_max - lat_min) / resolution))
+    n_lon = int(round((lon_max - lon_min) / resolution))
+    lats = lat_max - (np.arange(n_lat) + 0.5) * resolution
+    lons = lon_min + (np.arange(n_lon) + 0.5) * resolution
+    return lats, lons
+
+
+# Per-process state for pool workers, set by _init_worker
+_worker = {}
+
+
+def _init_worker(path, metadata, resolver):
+    _worker['grid'] = np.load(path, mmap_mode='r+')
+    _worker['lats'], _worker['lons'] = grid_axes(metadata['resolution'])
+    _worker['metadata'] = metadata
+    _worker['resolver'] = resolver
+
+
+def _score_band(job):
+    """Score one latitude band of one (scale, year, magnitude) slab and
+    write it straight into the memory-mapped grid"""
+    from ml.predict import _forest_predict_proba, registry
+
+    s, y, m, row_start, row_stop = job
+    metadata = _worker['metadata']
+    scale = metadata['scales'][s]
+    lat, lon = np.meshgrid(_worker['lats'][row_start:row_stop], _worker['lons'], indexing='ij')
+    lat, lon = lat.ravel(), lon.ravel()
+
+    features = np.empty((len(lat), 6), dtype=np.float64)
+    features[:, 0] = metadata['years'][y]
+    features[:, 1] = scale
+    features[:, 2] = metadata['magnitudes'][str(scale)][m]
+    features[:, 3] = _worker['resolver'](lat, lon)
+    features[:, 4] = lon
+    features[:, 5] = lat
+
+    proba = _forest_predict_proba(features)
+    best = np.argmax(proba, axis=1)
+    band = _worker['grid'][s, y, m, row_start:row_stop]
+    band[..., 0] = registry.engine.classes.take(best).reshape(band.shape[:2])
+    band[..., 1] = np.rint(proba[np.arange(len(best)), best] * 255).reshape(band.shape[:2])
+    return len(lat)
+
+
+def build_risk_grid(path, model_path, resolver, resolution=1.0, years=None, magnitudes=None,
+                    workers=None, band_cells=100000):
+    """Sweep the lat/lon grid through the model and write it to ``path``.
+
+    The result is a uint8 ``.npy`` array shaped
+    ``(scale, year, magnitude, lat, lon, channel)`` with a JSON sidecar
+    describing the axes. Latitude bands are scored in vectorized batches
+    across a process pool; each worker memory-maps the output and writes
+    its band in place. Both files are written under temporary names and
+    renamed into place, so readers never see a half-built grid.
+
+    Cells are swept in degrees, so the active bundle must have a coordinate
+    encoder (``ml/coordinates.py``) to turn them into the features the
+    model was trained on; without one, ``ValueError`` is raised.
+    """
+    from ml.predict import registry
+
+    bundle = registry.bundle
+    if bundle.coordinates is None:
+        raise ValueError('The model was trained on label-encoded longitude/latitude, not degrees, and the '
+                         'active model has no coordinate encoder (coordinate_encoder.joblib); a grid swept '
+                         'in degrees would not vary with location.')
+    path = Path(path)
+    years = [int(year) for year in (years or [datetime.now(timezone.utc).year])]
+    magnitudes = magnitudes or DEFAULT_MAGNITUDES
+    scales = sorted(int(scale) for scale in magnitudes)
+    levels = {len(magnitudes[scale]) for scale in scales}
+    if len(levels) != 1:
+        raise ValueError('Every scale needs the same number of representative magnitudes')
+
+    lats, lons = grid_axes(resolution)
+    metadata = {
+        'version': GRID_VERSION,
+        'resolution': float(resolution),
+        'lat_max': 90.0,
+        'lon_min': -180.0,
+        'n_lat': len(lats),
+        'n_lon': len(lons),
+        'scales': scales,
+        'years': years,
+        'magnitudes': {str(scale): [float(value) for value in magnitudes[scale]] for scale in scales},
+        'channels': CHANNELS,
+        'country_resolver': resolver.describe() if hasattr(resolver, 'describe') else repr(resolver),
+        'model_sha256': file_sha256(model_path) if Path(model_path).exists() else None,
+        'model_version': bundle.version,
+    }
+    shape = (len(scales), len(years), levels.pop(), len(lats), len(lons), len(CHANNELS))
+    metadata['shape'] = list(shape)
+    metadata['dtype'] = 'uint8'
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp.npy')
+    tmp_sidecar = path.with_name(path.name + '.tmp.json')
+    np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape).flush()
+
+    rows_per_band = max(1, band_cells // len(lons))
+    jobs = [(s, y, m, start, min(start + rows_per_band, len(lats)))
+            for s in range(shape[0]) for y in range(shape[1]) for m in range(shape[2])
+            for start in range(0, len(lats), rows_per_band)]
+
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(tmp_path), metadata, resolver)) as pool:
+        cells = sum(pool.map(_score_band, jobs))
+    metadata['seconds'] = round(time.perf_counter() - start_time, 3)
+    metadata['cells'] = cells
+    metadata['workers'] = workers
+    metadata['created_at'] = datetime.now(timezone.utc).isoformat()
+
+    tmp_sidecar.write_text(json.dumps(metadata, indent=2))
+    os.replace(tmp_path, path)
+    os.replace(tmp_sidecar, sidecar_path(path))
+    return metadata
+
+
+class RiskGrid:
+    """Read-only view of a precomputed grid, memory-mapped so region reads
+    only touch the pages they slice"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.metadata = json.loads(sidecar_path(self.path).read_text())
+        self.data = np.load(self.path, mmap_mode='r')
+        if list(self.data.shape) != self.metadata['shape']:
+            raise ValueError(f'{self.path} does not match its sidecar')
+
+    def scale_index(self, scale):
+        try:
+            return self.metadata['scales'].index(int(scale))
+        except ValueError:
+            raise KeyError(f"Scale {scale} is not in the grid. Available: {self.metadata['scales']}")
+
+    def year_index(self, year):
+        try:
+            return self.metadata['years'].index(int(year))
+        except ValueError:
+            raise KeyError(f"Year {year} is not in the grid. Available: {self.metadata['years']}")
+
+    def magnitude_index(self, scale, magnitude=None, level=None):
+        """Pick a magnitude level directly or as the nearest representative value"""
+        values = self.metadata['magnitudes'][str(int(scale))]
+        if level is not None:
+            if not 0 <= int(level) < len(values):
+                raise KeyError(f'Level must be between 0 and {len(values) - 1}')
+            return int(level)
+        if magnitude is None:
+            return len(values) // 2
+        return int(np.argmin(np.abs(np.asarray(values) - float(magnitude))))
+
+    def cell_bounds(self, south, north, west, east):
+        """Row/column slices covering a bounding box, clipped to the grid"""
+        meta = self.metadata
+        res = meta['resolution']
+        row_start = int(np.clip(np.floor((meta['lat_max'] - north) / res), 0, meta['n_lat']))
+        row_stop = int(np.clip(np.ceil((meta['lat_max'] - south) / res), 0, meta['n_lat']))
+        col_start = int(np.clip(np.floor((west - meta['lon_min']) / res), 0, meta['n_lon']))
+        col_stop = int(np.clip(np.ceil((east - meta['lon_min']) / res), 0, meta['n_lon']))
+        return slice(row_start, row_stop), slice(col_start, col_stop)
+
+    def region(self, s, y, m, south, north, west, east):
+        """A view (no copy) of the cells covering the bounding box, plus the
+        bounds of the cells actually returned"""
+        rows, cols = self.cell_bounds(south, north, west, east)
+        meta = self.metadata
+        res = meta['resolution']
+        bounds = {
+            'north': meta['lat_max'] - rows.start * res,
+            'south': meta['lat_max'] - rows.stop * res,
+            'west': meta['lon_min'] + cols.start * res,
+            'east': meta['lon_min'] + cols.stop * res,
+        }
+        return self.data[s, y, m, rows, cols], bounds
+
+
+_grid_lock = threading.Lock()
+_loaded = {}
+
+
+def load_risk_grid(path):
+    """Open the grid once per process, reopening it after a rebuild.
+
+    Returns ``None`` when no grid has been built yet.
+    """
+    path = Path(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _grid_lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, RiskGrid(path))
+            _loaded[path] = cached
+        return cached[1]
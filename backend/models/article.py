@@ -0,0 +1,50 @@
+from datetime import datetime
+from database import db
+
+class Article(db.Model):
+    """One news story, stored once however many providers or queries return it"""
+    __tablename__ = 'article'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # sha256 of the normalized URL; the same story from two providers shares it
+    url_hash = db.Column(db.String(64), unique=True, nullable=False)
+    # sha256 of the normalized title, to catch syndicated copies under other URLs
+    title_hash = db.Column(db.String(64), index=True)
+    provider = db.Column(db.String(20), nullable=False)
+    external_id = db.Column(db.String(500))
+    title = db.Column(db.String(500))
+    url = db.Column(db.String(2000))
+    image = db.Column(db.String(2000))
+    content = db.Column(db.Text)
+    source = db.Column(db.String(200))
+    published = db.Column(db.DateTime)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Article {self.id} {self.provider}>'
+
+
+class ArticleQuery(db.Model):
+    """Which articles a search query returned. ``published`` is copied from
+    the article so the newest-first listing is one index range scan."""
+    __tablename__ = 'article_query'
+    __table_args__ = (
+        db.Index('ix_article_query_query_published', 'query', 'published'),
+    )
+
+    query = db.Column(db.String(200), primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), primary_key=True)
+    published = db.Column(db.DateTime, nullable=False)
+
+
+class NewsCursor(db.Model):
+    """Ingestion state per provider and query"""
+    __tablename__ = 'news_cursor'
+
+    query = db.Column(db.String(200), primary_key=True)
+    provider = db.Column(db.String(20), primary_key=True)
+    # Newest published time seen; the next fetch asks only for articles since then
+    newest_published = db.Column(db.DateTime)
+    # Last fetch that got an answer, and last attempt whether or not it did
+    fetched_at = db.Column(db.DateTime)
+    attempted_at = db.Column(db.DateTime)
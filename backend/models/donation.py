@@ -3,6 +3,10 @@ from database import db
 
 class Donation(db.Model):
     __tablename__ = 'donation'
+    __table_args__ = (
+        # Serves per-user history in date order and keyset pagination
+        db.Index('ix_donation_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -10,6 +14,8 @@ class Donation(db.Model):
     currency = db.Column(db.String(3), default='USD')
     payment_method = db.Column(db.String(50))
     transaction_id = db.Column(db.String(100))
+    # pending -> processing -> completed | failed, set by the background payment workers
+    status = db.Column(db.String(20), nullable=False, default='completed', server_default='completed')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
@@ -1,9 +1,18 @@
-from flask import Blueprint, jsonify, request, current_app, make_response
-from datetime import datetime, timedelta
-import jwt
+from flask import Blueprint, jsonify, request, g, make_response
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models.user import User
+from services.auth import (AuthBusyError, AuthNotConfiguredError, check_password, create_token, hash_password,
+                           jwt_secret, login_required)
+from metrics import stage
 
 auth_bp = Blueprint('auth', __name__)
 
+# bcrypt only looks at the first 72 bytes (and newer releases refuse longer input)
+MAX_PASSWORD_BYTES = 72
+MIN_PASSWORD_LENGTH = 8
+
 def add_cors_headers(response):
     response.headers['Access-Control-Allow-Origin'] = 'https://disasterpredict.vercel.app'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
@@ -11,6 +20,30 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Credentials'] = 'true'
     return response
 
+def _busy(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def _text_fields(data, *names):
+    """The named fields as strings ('' when missing or null), or None when any
+    of them is some other JSON type"""
+    values = [data.get(name) or '' for name in names]
+    return values if all(isinstance(value, str) for value in values) else None
+
+def _user_json(user):
+    return {'id': user.id, 'username': user.username, 'email': user.email}
+
+def _find_user(username=None, email=None):
+    """User by username or email; both columns are unique, so indexed"""
+    conditions = []
+    if username:
+        conditions.append(User.username == username)
+    if email:
+        conditions.append(User.email == email)
+    with stage('user_lookup'):
+        return db.session.scalars(select(User).where(or_(*conditions)).limit(1)).first()
+
 @auth_bp.route('/register', methods=['POST', 'OPTIONS'])
 def register():
     if request.method == 'OPTIONS':
@@ -18,18 +51,42 @@ def register():
         return add_cors_headers(response)
 
     data = request.get_json()
-    if not data:
+    if not data or not isinstance(data, dict):
         return jsonify({'message': 'No data provided'}), 400
 
+    fields = _text_fields(data, 'username', 'email', 'password')
+    if fields is None:
+        return jsonify({'error': 'Username, email and password must be strings'}), 400
+    username, email, password = fields[0].strip(), fields[1].strip().lower(), fields[2]
+    if not username or not email or not password:
+        return jsonify({'error': 'Username, email and password are required'}), 400
+    if len(username) > 80 or len(email) > 120 or '@' not in email:
+        return jsonify({'error': 'Invalid username or email'}), 400
+    if len(password) < MIN_PASSWORD_LENGTH or len(password.encode('utf-8')) > MAX_PASSWORD_BYTES:
+        return jsonify({'error': f'Password must be {MIN_PASSWORD_LENGTH} to {MAX_PASSWORD_BYTES} bytes long'}), 400
+
+    # Check before paying for a hash; the unique constraints catch races
+    if _find_user(username, email) is not None:
+        return jsonify({'error': 'Username or email already registered'}), 409
+    try:
+        password_hash = hash_password(password)
+    except AuthBusyError as e:
+        return _busy(e)
+
+    user = User(username=username, email=email, password=password_hash)
+    try:
+        db.session.add(user)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Username or email already registered'}), 409
+
     response = make_response(jsonify({
         'success': True,
         'message': 'Registration successful',
-        'user': {
-            'username': data.get('username', 'guest'),
-            'email': data.get('email', 'guest@example.com')
-        }
-    }))
-    
+        'user': _user_json(user)
+    }), 201)
+
     return add_cors_headers(response)
 
 @auth_bp.route('/login', methods=['POST', 'OPTIONS'])
@@ -38,25 +95,51 @@ def login():
         response = make_response()
         return add_cors_headers(response)
 
+    # Refuse before paying for a password check when no token could be issued
+    try:
+        jwt_secret()
+    except AuthNotConfiguredError as e:
+        return jsonify({'error': str(e)}), 503
+
     data = request.get_json()
-    if not data:
+    if not data or not isinstance(data, dict):
         return jsonify({'message': 'No data provided'}), 400
 
-    # Generate a dummy token
-    token = jwt.encode(
-        {
-            'username': data.get('username', 'guest'),
-            'exp': datetime.utcnow() + timedelta(days=1)
-        },
-        'dummy-secret-key',
-        algorithm='HS256'
-    )
+    # Either field may carry the username or the email address
+    fields = _text_fields(data, 'username', 'email', 'password')
+    if fields is None:
+        return jsonify({'error': 'Username, email and password must be strings'}), 400
+    identifier = (fields[0] or fields[1]).strip()
+    password = fields[2]
+    if not identifier or not password:
+        return jsonify({'error': 'Username and password are required'}), 400
+
+    user = _find_user(username=identifier, email=identifier.lower())
+    try:
+        valid = check_password(user.password if user else None, password)
+    except AuthBusyError as e:
+        return _busy(e)
+    except ValueError:
+        valid = False  # over-long password or a stored value that isn't a bcrypt hash
+    if not valid:
+        return jsonify({'error': 'Invalid username or password'}), 401
 
     response = make_response(jsonify({
         'success': True,
         'message': 'Login successful',
-        'token': token,
-        'username': data.get('username', 'guest')
+        'token': create_token(user),
+        'username': user.username,
+        'user': _user_json(user)
     }))
-    
-    return add_cors_headers(response)
\ No newline at end of file
+
+    return add_cors_headers(response)
+
+@auth_bp.route('/me', methods=['GET'])
+@login_required
+def me():
+    if g.user_id is None:
+        return jsonify({'error': 'Authentication required'}), 401
+    user = db.session.get(User, g.user_id)
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(_user_json(user))
@@ -1,12 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, url_for, g
 from flask_cors import cross_origin
+from sqlalchemy import and_, or_, func
+from datetime import datetime
 from models.donation import Donation
 from database import db
-import time
-import random
+from services.payment_service import process_donation, submit_donation
+from services.donation_import import parse_amount, import_donations, iter_records, detect_format, text_lines
+from services.auth import admin_required, login_required
+from metrics import stage
 
 donation_bp = Blueprint('donations', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
 @donation_bp.route('/donate', methods=['POST', 'OPTIONS'])
 @cross_origin(
     origins=[
@@ -16,50 +23,107 @@ donation_bp = Blueprint('donations', __name__)
     ],
     supports_credentials=True
 )
+@login_required
 def create_donation():
     try:
         data = request.get_json()
         if not data:
             return jsonify({"error": "No data provided"}), 400
             
-        if 'user_id' not in data or 'amount' not in data:
+        # With a token the donor is the token's user; user_id may be left out
+        user_id = data.get('user_id', g.user_id)
+        if user_id is None or 'amount' not in data:
             return jsonify({"error": "Missing required fields"}), 400
+        if _other_user(user_id):
+            return jsonify({"error": "Cannot donate as another user"}), 403
 
         # Validate amount
         try:
-            amount = float(data['amount'])
-            if amount <= 0:
-                raise ValueError
+            amount = parse_amount(data['amount'])
         except ValueError:
             return jsonify({"error": "Invalid amount"}), 400
 
-        time.sleep(1.5)
-        
-        transaction_id = f"TX{random.randint(100000000, 999999999)}"
-        
         donation = Donation(
-            user_id=data['user_id'],
+            user_id=user_id,
             amount=amount,
             currency=data.get('currency', 'USD'),
             payment_method=data.get('payment_method', 'credit_card'),
-            transaction_id=transaction_id
+            status='pending'
         )
         
-        db.session.add(donation)
-        db.session.commit()
+        with stage('db_commit'):
+            db.session.add(donation)
+            db.session.commit()
 
-        return jsonify({
-            'message': 'Donation successful!',
-            'transaction_id': transaction_id,
-            'amount': donation.amount,
-            'currency': donation.currency
-        }), 201
+        if current_app.config['DONATION_INLINE_PROCESSING']:
+            process_donation(donation.id)
+            return jsonify(_donation_status(donation)), 201
+
+        # Charge off the request thread; the client polls the status URL
+        submit_donation(current_app._get_current_object(), donation.id)
+        return jsonify(_donation_status(donation)), 202
 
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@donation_bp.route('/donations/<int:user_id>', methods=['GET'])
+@donation_bp.route('/donations/bulk', methods=['POST'])
+@admin_required
+def bulk_import_donations():
+    """Stream a CSV or JSONL body of donations into the database in batches.
+
+    Rows are stored as completed for whatever user_id they name, so only
+    ADMIN_USERNAMES may call this.
+
+    The format comes from ``?format=csv|jsonl`` or the Content-Type.
+    ``?batch_size=`` sets rows per commit.
+    """
+    try:
+        fmt = request.args.get('format') or detect_format(content_type=request.content_type)
+        if fmt not in ('csv', 'jsonl'):
+            return jsonify({"error": "Unsupported format"}), 400
+        batch_size = int(request.args.get('batch_size', current_app.config['DONATION_IMPORT_BATCH_SIZE']))
+        if batch_size <= 0:
+            return jsonify({"error": "Invalid batch_size"}), 400
+
+        lines = text_lines(request.stream)
+        report = import_donations(iter_records(lines, fmt), batch_size=batch_size)
+        return jsonify(report), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _encode_cursor(created_at, donation_id):
+    return f"{created_at.isoformat()}_{donation_id}"
+
+def _decode_cursor(cursor):
+    created_at, _, donation_id = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(donation_id)
+
+def _other_user(user_id):
+    """True when the request's token belongs to someone other than ``user_id``"""
+    try:
+        return g.user_id is not None and g.user_id != int(user_id)
+    except (TypeError, ValueError):
+        return True
+
+def _donation_status(donation):
+    messages = {
+        'pending': 'Donation is being processed',
+        'processing': 'Donation is being processed',
+        'completed': 'Donation successful!',
+        'failed': 'Donation failed'
+    }
+    return {
+        'message': messages.get(donation.status, 'Unknown status'),
+        'donation_id': donation.id,
+        'status': donation.status,
+        'transaction_id': donation.transaction_id,
+        'amount': donation.amount,
+        'currency': donation.currency,
+        'status_url': url_for('donations.get_donation_status', donation_id=donation.id)
+    }
+
+@donation_bp.route('/donate/<int:donation_id>', methods=['GET'])
 @cross_origin(
     origins=[
         "http://localhost:5173",
@@ -68,14 +132,110 @@ def create_donation():
     ],
     supports_credentials=True
 )
+@login_required
+def get_donation_status(donation_id):
+    try:
+        donation = db.session.get(Donation, donation_id)
+        if donation is None or _other_user(donation.user_id):
+            return jsonify({"error": "Donation not found"}), 404
+        return jsonify(_donation_status(donation)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@donation_bp.route('/donations/<int:user_id>', methods=['GET'])
+@cross_origin(
+    origins=[
+        "http://localhost:5173",
+        "https://disasterpredict.vercel.app",
+        "https://disaster-predict-1nfpgalad-tina-pudaris-projects.vercel.app"
+    ],
+    supports_credentials=True,
+    expose_headers=["X-Next-Cursor"]
+)
+@login_required
 def get_user_donations(user_id):
+    """Newest-first donation history, one page at a time.
+
+    Uses keyset pagination on (created_at, id): pass the ``X-Next-Cursor``
+    header of a response as ``?cursor=`` to get the next page. Only the
+    serialized columns are selected, no ORM objects are built.
+    """
+    if _other_user(user_id):
+        return jsonify({"error": "Forbidden"}), 403
     try:
-        donations = Donation.query.filter_by(user_id=user_id).all()
-        return jsonify([{
-            'id': d.id,
-            'amount': float(d.amount),
-            'currency': d.currency,
-            'date': d.created_at.isoformat()
-        } for d in donations]), 200
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if limit <= 0:
+            return jsonify({"error": "Invalid limit"}), 400
+
+        query = db.session.query(
+            Donation.id, Donation.amount, Donation.currency, Donation.status, Donation.created_at
+        ).filter(Donation.user_id == user_id)
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                cursor_date, cursor_id = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+            query = query.filter(or_(
+                Donation.created_at < cursor_date,
+                and_(Donation.created_at == cursor_date, Donation.id < cursor_id)
+            ))
+
+        rows = query.order_by(Donation.created_at.desc(), Donation.id.desc()).limit(limit + 1).all()
+        page = rows[:limit]
+
+        response = jsonify([{
+            'id': row.id,
+            'amount': float(row.amount),
+            'currency': row.currency,
+            'status': row.status,
+            'date': row.created_at.isoformat()
+        } for row in page])
+        if len(rows) > limit:
+            response.headers['X-Next-Cursor'] = _encode_cursor(page[-1].created_at, page[-1].id)
+        return response, 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@donation_bp.route('/donations/<int:user_id>/summary', methods=['GET'])
+@cross_origin(
+    origins=[
+        "http://localhost:5173",
+        "https://disasterpredict.vercel.app",
+        "https://disaster-predict-1nfpgalad-tina-pudaris-projects.vercel.app"
+    ],
+    supports_credentials=True
+)
+@login_required
+def get_user_donation_summary(user_id):
+    """Completed-donation totals per currency and per month, aggregated in SQL"""
+    if _other_user(user_id):
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        if db.engine.dialect.name == 'sqlite':
+            month = func.strftime('%Y-%m', Donation.created_at)
+        else:
+            month = func.to_char(Donation.created_at, 'YYYY-MM')
+
+        completed = (Donation.user_id == user_id, Donation.status == 'completed')
+        by_currency = db.session.query(
+            Donation.currency, func.sum(Donation.amount), func.count(Donation.id)
+        ).filter(*completed).group_by(Donation.currency).order_by(Donation.currency).all()
+        by_month = db.session.query(
+            month.label('month'), Donation.currency, func.sum(Donation.amount), func.count(Donation.id)
+        ).filter(*completed).group_by('month', Donation.currency).order_by('month', Donation.currency).all()
+
+        return jsonify({
+            'user_id': user_id,
+            'by_currency': [
+                {'currency': currency, 'total': float(total), 'count': count}
+                for currency, total, count in by_currency
+            ],
+            'by_month': [
+                {'month': month_key, 'currency': currency, 'total': float(total), 'count': count}
+                for month_key, currency, total, count in by_month
+            ]
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
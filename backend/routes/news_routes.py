@@ -1,51 +1,139 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, jsonify, request, current_app
 from datetime import datetime
-from services.news_service import get_newsapi_news, get_guardian_news, standardize_article
+from database import db
+from services import news_store
+from services.news_service import fetch_all_news
+from services.http_client import client_stats
+from metrics import stage
 
 news_bp = Blueprint('news', __name__, url_prefix='/api')
 
-cache = None  # Will be set by app.py
-
-
-def register_cache(c):
-    global cache
-    cache = c
+# Striped locks so concurrent misses/refreshes of a query share a single fetch.
+# A fixed set rather than one per query: queries come from users, and a
+# per-query dict would grow without bound. Two queries sharing a stripe
+# only wait for each other, or put off a background refresh to the next read.
+KEY_LOCK_STRIPES = 64
+_key_locks = tuple(threading.Lock() for _ in range(KEY_LOCK_STRIPES))
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='news-refresh')
+# query -> when its first provider falls due; until then reads skip the cursor check
+_next_due = {}
+_warmer_pid = None
+
+
+def _key_lock(query):
+    return _key_locks[hash(query) % KEY_LOCK_STRIPES]
+
+
+def _refresh(query, margin=0):
+    """Fetch what is new since each due provider's cursor and store it.
+    Returns the number of new articles."""
+    since = news_store.claim_due(query, margin)
+    if not since:
+        return 0  # nothing due, or another worker is already on it
+    with stage('upstream_fetch'):
+        results = fetch_all_news(current_app.config['NEWS_INGEST_PAGE_SIZE'], query,
+                                 providers=since, since=since)
+    with stage('ingest'):
+        return news_store.ingest(query, results)
+
+
+def _refresh_in_background(query):
+    """Start a refresh unless one is already running for this query"""
+    lock = _key_lock(query)
+    if not lock.acquire(blocking=False):
+        return False
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                _refresh(query)
+        except Exception as e:
+            app.logger.error(f"Background news refresh failed for {query!r}: {str(e)}")
+        finally:
+            lock.release()
+
+    _refresh_executor.submit(run)
+    return True
 
 
 def get_cached_disaster_news(limit, query):
-    cache_key = f"disaster_news:{query}:{limit}"
-    
-    if cache:
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data
-
+    """Newest ``limit`` stored articles for ``query``, refreshing the store as needed.
+
+    Queries no provider has answered for yet are fetched before returning;
+    concurrent callers wait on that single fetch. Once the store holds a
+    query it is always served straight from the database, and a query that
+    is due for a refresh gets one background fetch of only what is new.
+    """
+    query = news_store.normalize_query(query)
     try:
-        newsapi_articles = get_newsapi_news(limit, query)
-        guardian_articles = get_guardian_news(limit, query)
-
-        all_articles = []
-        if newsapi_articles:
-            all_articles.extend([standardize_article(item, "newsapi") for item in newsapi_articles])
-        if guardian_articles:
-            all_articles.extend([standardize_article(item, "guardian") for item in guardian_articles])
-
-        all_articles = sorted(all_articles, key=lambda x: x.get('published', ''), reverse=True)[:limit]
-
-        if cache:
-            cache.set(cache_key, all_articles, timeout=3600)
-
-        return all_articles
+        due_at = _next_due.get(query)
+        if due_at is None or due_at <= datetime.utcnow():
+            with stage('store_state'):
+                fetched, due_at = news_store.ingest_state(query)
+            if not fetched:
+                with _key_lock(query):
+                    # Another request may have fetched it while we waited
+                    _refresh(query)
+            elif due_at <= datetime.utcnow():
+                _refresh_in_background(query)
+            else:
+                if len(_next_due) >= 1000:
+                    _next_due.clear()
+                _next_due[query] = due_at
+        with stage('store_read'):
+            return news_store.latest_articles(query, limit)
+    except news_store.QueryLimitError as e:
+        db.session.rollback()
+        return {"error": str(e)}, 503
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Error in disaster news endpoint: {str(e)}")
         return {"error": str(e)}, 500
 
 
+def _warm_loop(app):
+    """Keep the default query fresh so users never wait on the providers,
+    and drop the queries that have gone idle"""
+    query = news_store.normalize_query(app.config['NEWS_WARM_QUERY'])
+    while True:
+        try:
+            with app.app_context():
+                # Refresh shortly before the query falls due; claiming makes
+                # the first worker to get there the only one that fetches
+                with _key_lock(query):
+                    _refresh(query, margin=app.config['NEWS_WARM_INTERVAL'] * 2)
+                if news_store.prune_idle():
+                    db.session.commit()
+        except Exception as e:
+            app.logger.error(f"News warmer failed: {str(e)}")
+        time.sleep(app.config['NEWS_WARM_INTERVAL'])
+
+
+@news_bp.before_app_request
+def start_news_warmer():
+    """Start the warmer once per worker process (threads don't survive fork)"""
+    global _warmer_pid
+    if _warmer_pid == os.getpid() or not current_app.config['NEWS_WARMER_ENABLED']:
+        return
+    _warmer_pid = os.getpid()
+    app = current_app._get_current_object()
+    threading.Thread(target=_warm_loop, args=(app,), name='news-warmer', daemon=True).start()
+
+
 @news_bp.route('/disaster-news')
 def get_disaster_news():
     try:
         limit = int(request.args.get('limit', 5))
         query = request.args.get('query', 'natural disasters')
+        if len(query) > 200:
+            return jsonify({"error": "query must be at most 200 characters"}), 400
+        if not news_store.allowed_query(news_store.normalize_query(query)):
+            return jsonify({"error": "query is not one of the news queries served"}), 400
 
         result = get_cached_disaster_news(limit, query)
 
@@ -60,3 +148,9 @@ def get_disaster_news():
 @news_bp.route('/health')
 def health_check():
     return jsonify({"status": "ok", "timestamp": datetime.now().isoformat()})
+
+
+@news_bp.route('/news/providers')
+def news_provider_stats():
+    """Connection reuse and circuit breaker state per news provider"""
+    return jsonify(client_stats())
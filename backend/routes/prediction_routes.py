@@ -1,8 +1,25 @@
-from flask import Blueprint, request, jsonify
-from ml.predict import predict_disaster
+from flask import Blueprint, current_app, request, jsonify
+from services.donation_import import UploadTooLargeError, detect_format, iter_records, spool_to_disk, text_lines
+from metrics import stage
 
 prediction_bp = Blueprint('prediction', __name__)
 
+shared_cache = None  # Will be set by app.py when PREDICTION_CACHE_SHARED
+
+
+def register_cache(c):
+    global shared_cache
+    shared_cache = c
+
+
+def _predict():
+    """ml.predict pulls in NumPy and the model registry, so it is imported on
+    first use instead of when the app is created"""
+    from ml import predict
+    if shared_cache is not None and predict.prediction_cache.shared is None:
+        predict.register_cache(shared_cache)
+    return predict
+
 @prediction_bp.route('/predict', methods=['POST', 'OPTIONS'])
 def predict():
     """
@@ -21,4 +38,106 @@ def predict():
         response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
         return response
     
-    return predict_disaster(request)
\ No newline at end of file
+    return _predict().predict_disaster(request)
+
+@prediction_bp.route('/predict/batch', methods=['POST', 'OPTIONS'])
+def predict_batch():
+    """
+    Endpoint for batch disaster prediction
+    Expects JSON with either:
+    - a list of events with the same fields as /predict
+    - {"events": [...]} wrapping that list
+    - a columnar object mapping each field to a list of values
+    Results are returned in input order, with per-row errors.
+    """
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'preflight'})
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        return response
+
+    return _predict().predict_disaster_batch(request)
+
+
+@prediction_bp.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Streaming batch prediction for files too large for /predict/batch
+    Body: NDJSON (one event per line) or CSV with a header row, read
+    incrementally; the format comes from ?format=ndjson|csv or the Content-Type
+    Query parameters: chunk_size (rows per vectorized pass), top_k
+    Returns NDJSON: one result per input row, then a summary line
+    """
+    fmt = request.args.get('format') or detect_format(content_type=request.content_type)
+    fmt = 'jsonl' if fmt == 'ndjson' else fmt
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+
+    # Most HTTP clients send the whole body before reading any of the
+    # response, so streaming results back while the upload is still arriving
+    # would deadlock once both socket buffers fill. Spool it to disk first.
+    max_bytes = current_app.config['PREDICT_STREAM_MAX_BYTES']
+    if request.content_length is not None and request.content_length > max_bytes:
+        return jsonify({'success': False, 'error': f'Upload too large. Maximum bytes: {max_bytes}'}), 413
+    try:
+        with stage('spool_upload'):
+            body = spool_to_disk(request.stream, max_bytes=max_bytes)
+    except UploadTooLargeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    response = _predict().predict_disaster_stream(request, iter_records(text_lines(body), fmt), fmt)
+    if isinstance(response, tuple):
+        body.close()
+    else:
+        response.call_on_close(body.close)
+    return response
+
+
+@prediction_bp.route('/predict/status', methods=['GET'])
+def predict_status():
+    """Report whether the model is loaded in this worker, plus cache counters"""
+    predict = _predict()
+    status = predict.registry.status()
+    status['cache'] = predict.prediction_cache.stats()
+    status['country_lookup'] = predict.country_lookup_status()
+    return jsonify(status)
+
+
+@prediction_bp.route('/countries/lookup', methods=['GET'])
+def country_lookup():
+    """
+    Resolve a country_code_index from either
+    - name (fuzzy: 'Philippines', 'South Korea', 'Cote d'Ivoire'), or
+    - lat and lon in degrees, via the country raster (400 when none is installed)
+    """
+    predict = _predict()
+    try:
+        bundle = predict.registry.bundle
+    except predict.ModelUnavailableError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    country_names, countries = bundle.country_names, bundle.countries
+    name = request.args.get('name')
+    if name:
+        index = country_names.lookup(name)
+        suggestions = [{'country_code_index': i, 'country_name': n, 'score': score}
+                       for i, n, score in country_names.matches(name)]
+        if index is None:
+            return jsonify({'success': False, 'error': f'Unknown country: {name!r}', 'suggestions': suggestions}), 404
+        return jsonify({'success': True, 'country_code_index': index, 'country_name': countries[index]})
+
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+    except KeyError:
+        return jsonify({'success': False, 'error': 'Provide name, or lat and lon'}), 400
+    except ValueError:
+        return jsonify({'success': False, 'error': 'lat and lon must be numeric'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'success': False, 'error': predict.COORDINATE_RANGE_ERROR}), 400
+    try:
+        index = int(predict.resolve_countries(lat, lon))
+    except ValueError as e:
+        # No raster installed: the caller has to send a country name or index instead
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if index < 0:
+        return jsonify({'success': False, 'error': 'No country at these coordinates'}), 404
+    return jsonify({'success': True, 'country_code_index': index, 'country_name': countries.get(index, "Unknown")})
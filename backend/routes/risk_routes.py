@@ -0,0 +1,114 @@
+import json
+import math
+
+from flask import Blueprint, Response, request, jsonify
+from config import Config
+
+risk_bp = Blueprint('risk', __name__)
+
+
+def _grid_or_404():
+    from ml.risk_grid import load_risk_grid  # NumPy is only imported once the grid is used
+    grid = load_risk_grid(Config.RISK_GRID_PATH)
+    if grid is None:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Risk grid has not been built. Run `flask build-risk-grid`.'
+        }), 404)
+    return grid, None
+
+
+def _tile_bounds(z, x, y):
+    """Lat/lon bounding box of a Web Mercator (XYZ) map tile"""
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, north, west, east
+
+
+def _region_response(grid, south, north, west, east):
+    """Slice the memory-mapped grid for the requested scale/year/magnitude"""
+    try:
+        scale = int(request.args.get('scale', 1))
+        s = grid.scale_index(scale)
+        y = grid.year_index(request.args.get('year', grid.metadata['years'][-1]))
+        m = grid.magnitude_index(scale, request.args.get('magnitude'), request.args.get('level'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'scale, year, magnitude and level must be numeric'}), 400
+    except KeyError as e:
+        return jsonify({'success': False, 'error': e.args[0]}), 404
+
+    cells, bounds = grid.region(s, y, m, south, north, west, east)
+    if cells.shape[0] * cells.shape[1] > Config.RISK_REGION_MAX_CELLS:
+        return jsonify({
+            'success': False,
+            'error': f'Region too large. Maximum cells: {Config.RISK_REGION_MAX_CELLS}'
+        }), 413
+
+    magnitude = grid.metadata['magnitudes'][str(scale)][m]
+    if request.args.get('format') == 'binary':
+        # Raw uint8 (lat, lon, channel) bytes straight from the mapped file
+        response = Response(cells.tobytes(), mimetype='application/octet-stream')
+        response.headers['X-Risk-Shape'] = ','.join(str(n) for n in cells.shape)
+        response.headers['X-Risk-Bounds'] = json.dumps(bounds)
+        response.headers['X-Risk-Magnitude'] = str(magnitude)
+        return response
+
+    return jsonify({
+        'success': True,
+        'scale': scale,
+        'year': grid.metadata['years'][y],
+        'magnitude': magnitude,
+        'resolution': grid.metadata['resolution'],
+        'bounds': bounds,
+        # Contiguous arrays, which the JSON provider encodes without a Python list
+        'labels': cells[..., 0].copy(),
+        'confidence': (cells[..., 1] / 255.0).round(3)
+    })
+
+
+@risk_bp.route('/risk/grid', methods=['GET'])
+def risk_grid_info():
+    """Describe the precomputed grid: resolution, scales, years and magnitudes"""
+    grid, error = _grid_or_404()
+    if error:
+        return error
+    return jsonify({'success': True, **grid.metadata})
+
+
+@risk_bp.route('/risk/region', methods=['GET'])
+def risk_region():
+    """
+    Predicted disaster label and confidence for every grid cell in a box
+    Query parameters:
+    - south, north, west, east (degrees; default the whole world)
+    - scale (MAGNITUDE_SCALE_MAPPING index), year
+    - magnitude (nearest representative value) or level (its index)
+    - format=binary for raw uint8 bytes instead of JSON
+    """
+    grid, error = _grid_or_404()
+    if error:
+        return error
+    try:
+        south = float(request.args.get('south', -90))
+        north = float(request.args.get('north', 90))
+        west = float(request.args.get('west', -180))
+        east = float(request.args.get('east', 180))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Bounds must be numeric'}), 400
+    if south >= north or west >= east:
+        return jsonify({'success': False, 'error': 'Bounds must satisfy south < north and west < east'}), 400
+    return _region_response(grid, south, north, west, east)
+
+
+@risk_bp.route('/risk/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def risk_tile(z, x, y):
+    """Same as /risk/region, for the area of one XYZ map tile"""
+    grid, error = _grid_or_404()
+    if error:
+        return error
+    if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'success': False, 'error': 'Invalid tile coordinates'}), 400
+    return _region_response(grid, *_tile_bounds(z, x, y))
@@ -0,0 +1,124 @@
+"""Response JSON and compression.
+
+``init_serialization(app)`` installs the JSON provider named by
+``JSON_PROVIDER`` and, with ``COMPRESS_ENABLED``, gzip/brotli-compresses
+responses of at least ``COMPRESS_MIN_SIZE`` bytes for clients that accept
+it. Both providers serialize NumPy scalars and arrays, so results can be
+built straight from model output.
+"""
+import gzip
+import json
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+from metrics import stage
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib provider is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+# Mimetypes worth compressing; everything else (images, binary grids) is left alone
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+if orjson is not None:
+    # Datetimes go through Flask's default (HTTP dates) so output matches the stdlib provider
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _json_default(o):
+    """NumPy scalars and arrays (anything with ``tolist``), then Flask's types"""
+    if hasattr(o, 'tolist'):
+        return o.tolist()
+    return DefaultJSONProvider.default(o)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib JSON provider, plus NumPy values"""
+
+    default = staticmethod(_json_default)
+
+
+class OrjsonProvider(NumpyJSONProvider):
+    """orjson-backed provider. Encodes several times faster than the stdlib,
+    NumPy scalars and contiguous arrays natively. Keys keep insertion order.
+
+    Calls that pass stdlib-only options (``indent``, ``sort_keys``...) go
+    to the stdlib provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_json_default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = _ORJSON_OPTIONS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, default=_json_default, option=option),
+                                        mimetype=self.mimetype)
+
+
+def dumps(obj):
+    """``obj`` as compact JSON bytes, outside a request (NDJSON lines, files)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_json_default, separators=(',', ':')).encode()
+
+
+def _negotiate(accept_encodings):
+    """'br', 'gzip' or None, by the client's q-values; brotli wins ties"""
+    best, best_q = None, 0
+    for encoding in ('br', 'gzip') if brotli is not None else ('gzip',):
+        q = accept_encodings.quality(encoding)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compress_response(response):
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+    config = current_app.config
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+    with stage('compress'):
+        if encoding == 'br':
+            data = brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            data = gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_serialization(app):
+    if app.config['JSON_PROVIDER'] == 'orjson':
+        if orjson is not None:
+            app.json = OrjsonProvider(app)
+        else:
+            app.logger.warning('JSON_PROVIDER is orjson but orjson is not installed; using the stdlib')
+            app.json = NumpyJSONProvider(app)
+    else:
+        app.json = NumpyJSONProvider(app)
+    if app.config['COMPRESS_ENABLED']:
+        app.after_request(_compress_response)
@@ -0,0 +1,235 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+import jwt
+from flask import current_app, g, jsonify, request
+from config import Config
+from database import bcrypt
+from metrics import stage
+
+JWT_ALGORITHM = 'HS256'
+# Signs tokens in debug/testing when JWT_SECRET_KEY is unset; never in production
+DEV_JWT_SECRET = 'insecure-development-only-jwt-secret'
+
+
+class AuthBusyError(Exception):
+    """Raised instead of queueing more password hashing than the pool allows"""
+
+
+class AuthNotConfiguredError(Exception):
+    """Raised when tokens are needed but JWT_SECRET_KEY is not set"""
+
+
+def _native_thread_pool(max_workers, thread_name_prefix):
+    """A thread pool on OS threads, also under gevent, where the standard
+    pool's threads would be greenlets and a CPU-bound job on them would
+    stall every other request in the worker"""
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('threading'):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work beyond ``max_workers`` running plus
+    ``max_queue`` waiting jobs.
+
+    bcrypt releases the GIL, so hashing on these threads leaves the request
+    threads free to serve other routes; the bound keeps a burst of logins
+    from queueing up (each waiting login holds a request thread) and from
+    using more cores than ``max_workers``. The pool is created on first use,
+    in the worker process.
+    """
+
+    def __init__(self, max_workers, max_queue, thread_name_prefix=''):
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self.rejected = 0
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = _native_thread_pool(self._max_workers, self._thread_name_prefix)
+            return self._executor
+
+    def run(self, fn, *args):
+        """``fn(*args)`` on the pool; raises AuthBusyError when it is full"""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise AuthBusyError('Too many logins in progress, try again shortly')
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+# The pool is created on first submit, so this is safe to import in the gunicorn master
+hash_executor = BoundedExecutor(Config.AUTH_HASH_WORKERS, Config.AUTH_HASH_QUEUE, thread_name_prefix='bcrypt')
+_dummy_hash = None
+
+
+def hash_password(password):
+    with stage('password_hash'):
+        return hash_executor.run(bcrypt.generate_password_hash, password).decode('utf-8')
+
+
+def check_password(password_hash, password):
+    """Verify ``password``. With no ``password_hash`` (unknown user) a dummy
+    hash is checked instead, so the response time doesn't reveal which
+    usernames exist."""
+    global _dummy_hash
+    if password_hash is None and _dummy_hash is None:
+        _dummy_hash = hash_password('not a real password')
+    with stage('password_check'):
+        matches = hash_executor.run(bcrypt.check_password_hash, password_hash or _dummy_hash, password)
+    return matches and password_hash is not None
+
+
+class TokenCache:
+    """LRU of verified JWT claims keyed on the token string.
+
+    Entries expire with the token's ``exp``; tokens that fail verification
+    are never stored, so garbage tokens can't push out good ones.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token, claims):
+        if self.max_size <= 0 or 'exp' not in claims:
+            return
+        with self._lock:
+            self._entries[token] = (claims, claims['exp'])
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(max_size=Config.JWT_CACHE_SIZE)
+
+
+def jwt_secret():
+    """The token signing key. Outside debug and testing JWT_SECRET_KEY must be
+    set: signing with a key everyone can read would let anyone mint tokens."""
+    secret = current_app.config['JWT_SECRET_KEY']
+    if secret:
+        return secret
+    if current_app.debug or current_app.testing:
+        return DEV_JWT_SECRET
+    raise AuthNotConfiguredError('Login is unavailable: JWT_SECRET_KEY is not configured')
+
+
+def create_token(user):
+    now = datetime.now(timezone.utc)
+    return jwt.encode({
+        'sub': str(user.id),
+        'username': user.username,
+        'iat': now,
+        'exp': now + timedelta(hours=current_app.config['JWT_EXPIRES_HOURS'])
+    }, jwt_secret(), algorithm=JWT_ALGORITHM)
+
+
+def decode_token(token):
+    """Verified claims of ``token``; raises ``jwt.InvalidTokenError``.
+
+    A token that verified once is served from ``token_cache`` until it
+    expires, skipping the signature check.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, jwt_secret(), algorithms=[JWT_ALGORITHM],
+                            options={'require': ['exp', 'sub']})
+        token_cache.set(token, claims)
+    return claims
+
+
+def bearer_claims():
+    """Claims of the request's bearer token, or None when there is none"""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    return decode_token(header[7:].strip())
+
+
+def _verify_bearer():
+    """``(claims, None)`` for the request's bearer token, or ``(None, response)``
+    when one was sent but doesn't verify"""
+    with stage('auth'):
+        try:
+            return bearer_claims(), None
+        except jwt.ExpiredSignatureError:
+            return None, (jsonify({"error": "Token expired"}), 401)
+        except jwt.InvalidTokenError:
+            return None, (jsonify({"error": "Invalid token"}), 401)
+        except AuthNotConfiguredError as e:
+            return None, (jsonify({"error": str(e)}), 503)
+
+
+def login_required(view):
+    """Verify the request's bearer token and set ``g.user_id``.
+
+    A token that is sent must be valid (401 otherwise). Requests without
+    one are let through with ``g.user_id`` None unless AUTH_REQUIRED is set;
+    the frontend doesn't send tokens everywhere yet.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        claims, error = _verify_bearer()
+        if error is not None:
+            return error
+        if claims is None and current_app.config['AUTH_REQUIRED']:
+            return jsonify({"error": "Authentication required"}), 401
+        g.user_id = int(claims['sub']) if claims is not None else None
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def admin_required(view):
+    """Like ``login_required``, but a token is always required (whatever
+    AUTH_REQUIRED says) and its user must be listed in ADMIN_USERNAMES.
+    With no admins configured the route is closed to everyone.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        claims, error = _verify_bearer()
+        if error is not None:
+            return error
+        if claims is None:
+            return jsonify({"error": "Authentication required"}), 401
+        if claims.get('username') not in current_app.config['ADMIN_USERNAMES']:
+            return jsonify({"error": "Admin access required"}), 403
+        g.user_id = int(claims['sub'])
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+from metrics import observe_upstream
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker.
+
+    After ``failure_threshold`` failures in a row the breaker opens and
+    calls are refused for ``reset_timeout`` seconds. The first call after
+    that is let through as a probe (half-open): success closes the breaker,
+    failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                return True
+            if self._state == self.HALF_OPEN:
+                # Only one probe at a time
+                self.rejected += 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        return {
+            'state': self._state,
+            'consecutive_failures': self._failures,
+            'times_opened': self.times_opened,
+            'rejected': self.rejected
+        }
+
+
+class ProviderClient:
+    """Keep-alive session for one upstream, with retries and a breaker.
+
+    Connections are pooled per host (bounded by ``pool_size``). 429 and 5xx
+    responses are retried with jittered exponential backoff; Retry-After is
+    ignored so retries stay inside the caller's deadline. A response that is
+    still failing after the retries counts against the breaker.
+    """
+
+    def __init__(self, name, pool_size=10, max_retries=2, backoff_factor=0.2,
+                 backoff_max=2.0, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        retry = Retry(
+            total=max_retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=['GET'],
+            backoff_factor=backoff_factor,
+            backoff_max=backoff_max,
+            backoff_jitter=backoff_factor,
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.calls = 0
+        self.failures = 0
+
+    def get(self, url, **kwargs):
+        if not self.breaker.allow():
+            observe_upstream(self.name, 'circuit_open', 0.0)
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            observe_upstream(self.name, 'error', time.perf_counter() - start)
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        if response.status_code in RETRY_STATUSES:
+            observe_upstream(self.name, 'http_error', time.perf_counter() - start)
+            self.failures += 1
+            self.breaker.record_failure()
+        else:
+            observe_upstream(self.name, 'ok', time.perf_counter() - start)
+            self.breaker.record_success()
+        return response
+
+    def stats(self):
+        pools = [self.adapter.poolmanager.pools[key] for key in self.adapter.poolmanager.pools.keys()]
+        new_connections = sum(pool.num_connections for pool in pools)
+        http_requests = sum(pool.num_requests for pool in pools)
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'http_requests': http_requests,
+            'new_connections': new_connections,
+            'connection_reuse_rate': 1 - new_connections / http_requests if http_requests else 0.0,
+            'breaker': self.breaker.stats()
+        }
+
+
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def get_client(name):
+    """Return this process's client for ``name``.
+
+    Clients are rebuilt after a fork so gunicorn workers never share
+    sockets inherited from the master.
+    """
+    global _clients_pid
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = ProviderClient(
+                name,
+                pool_size=Config.NEWS_POOL_SIZE,
+                max_retries=Config.NEWS_MAX_RETRIES,
+                backoff_factor=Config.NEWS_BACKOFF_FACTOR,
+                backoff_max=Config.NEWS_BACKOFF_MAX,
+                failure_threshold=Config.NEWS_BREAKER_THRESHOLD,
+                reset_timeout=Config.NEWS_BREAKER_RESET
+            )
+        return client
+
+
+def client_stats():
+    with _clients_lock:
+        clients = list(_clients.values()) if _clients_pid == os.getpid() else []
+    return {client.name: client.stats() for client in clients}
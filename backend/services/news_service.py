@@ -1,21 +1,31 @@
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from flask import current_app
 from config import Config
+from services.http_client import get_client
 
-def get_guardian_news(limit=10, query="disaster OR flood OR earthquake OR tsunami OR wildfire"):
-    """getting disaster news from the Guardian API"""
+# Shared pool for provider fetches; threads are only started on first use,
+# so importing this module in the gunicorn master is fork-safe
+_executor = ThreadPoolExecutor(max_workers=Config.NEWS_FETCH_WORKERS, thread_name_prefix='news-fetch')
+
+def get_guardian_news(limit=10, query="disaster OR flood OR earthquake OR tsunami OR wildfire", timeout=10, since=None):
+    """getting disaster news from the Guardian API, newest first.
+
+    ``since`` (a UTC datetime) limits results to that day onwards; the
+    Guardian only filters by date. Returns None if the call failed.
+    """
+    params = {
+        "q": query,
+        "section": "world|environment|us-news",
+        "show-fields": "thumbnail,trailText",
+        "order-by": "newest",
+        "page-size": limit,
+        "api-key": Config.GUARDIAN_KEY
+    }
+    if since is not None:
+        params["from-date"] = since.date().isoformat()
     try:
-        response = requests.get(
-            "https://content.guardianapis.com/search",
-            params={
-                "q": query,
-                "section": "world|environment|us-news",
-                "show-fields": "thumbnail,trailText",
-                "page-size": limit,
-                "api-key": Config.GUARDIAN_KEY
-            },
-            timeout=10 
-        )
+        response = get_client("guardian").get(Config.GUARDIAN_URL, params=params, timeout=timeout)
         
         if response.status_code == 200:
             data = response.json()
@@ -23,25 +33,28 @@ def get_guardian_news(limit=10, query="disaster OR flood OR earthquake OR tsunam
                 return data['response']['results']
         
         current_app.logger.error(f"Guardian API error: {response.status_code}, {response.text}")
-        return []
+        return None
     except Exception as e:
         current_app.logger.error(f"Guardian API exception: {str(e)}")
-        return []
+        return None
+
+def get_newsapi_news(limit=10, query="natural disasters", timeout=10, since=None):
+    """getting disaster news from the NewsAPI, newest first.
 
-def get_newsapi_news(limit=10, query="natural disasters"):
-    """getting disaster news from the NewsAPI"""
+    ``since`` (a UTC datetime) limits results to articles published from
+    then on. Returns None if the call failed.
+    """
+    params = {
+        "q": query,
+        "apiKey": Config.NEWSAPI_KEY,
+        "pageSize": limit,
+        "language": "en",
+        "sortBy": "publishedAt"
+    }
+    if since is not None:
+        params["from"] = since.strftime('%Y-%m-%dT%H:%M:%S')
     try:
-        response = requests.get(
-            "https://newsapi.org/v2/everything",
-            params={
-                "q": query,
-                "apiKey": Config.NEWSAPI_KEY,
-                "pageSize": limit,
-                "language": "en",
-                "sortBy": "publishedAt"
-            },
-            timeout=10  
-        )
+        response = get_client("newsapi").get(Config.NEWSAPI_URL, params=params, timeout=timeout)
         
         if response.status_code == 200:
             data = response.json()
@@ -49,10 +62,57 @@ def get_newsapi_news(limit=10, query="natural disasters"):
                 return data['articles']
         
         current_app.logger.error(f"NewsAPI error: {response.status_code}, {response.text}")
-        return []
+        return None
     except Exception as e:
         current_app.logger.error(f"NewsAPI exception: {str(e)}")
-        return []
+        return None
+
+# provider name -> (fetch function, per-provider deadline in seconds)
+NEWS_PROVIDERS = {
+    "newsapi": (get_newsapi_news, Config.NEWSAPI_TIMEOUT),
+    "guardian": (get_guardian_news, Config.GUARDIAN_TIMEOUT),
+}
+
+def fetch_all_news(limit, query, total_timeout=None, providers=None, since=None):
+    """Fetch every provider (or just ``providers``) concurrently.
+
+    Each provider gets its own deadline and the whole call is bounded by
+    ``total_timeout``; providers that haven't answered by then are left out
+    of the result instead of holding up the response. ``since`` maps a
+    provider name to the published time to fetch from. Returns a dict of
+    provider name -> raw article list (None if the call failed) for the
+    providers that finished.
+    """
+    if total_timeout is None:
+        total_timeout = Config.NEWS_TOTAL_TIMEOUT
+    app = current_app._get_current_object()
+
+    since = since or {}
+
+    def run(fetch, timeout, since):
+        with app.app_context():
+            return fetch(limit, query, timeout=timeout, since=since)
+
+    start = time.monotonic()
+    deadlines = {}
+    pending = {}
+    for name, (fetch, timeout) in NEWS_PROVIDERS.items():
+        if providers is not None and name not in providers:
+            continue
+        future = _executor.submit(run, fetch, timeout, since.get(name))
+        pending[future] = name
+        deadlines[future] = start + min(timeout, total_timeout)
+
+    results = {}
+    while pending:
+        remaining = max(0, min(deadlines[future] for future in pending) - time.monotonic())
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+        now = time.monotonic()
+        for future in [f for f in pending if deadlines[f] <= now]:
+            current_app.logger.warning(f"News provider {pending.pop(future)} missed its deadline")
+    return results
 
 def standardize_article(item, source="unknown"):
     """Standardization of both of em api's data"""
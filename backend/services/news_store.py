@@ -0,0 +1,313 @@
+"""Persistent, deduplicated news store behind /api/disaster-news.
+
+Articles are ingested incrementally: each (query, provider) pair has a
+``NewsCursor`` holding the newest published time seen, and a refresh only
+asks the provider for articles from then on. An article is stored once,
+keyed on a hash of its normalized URL (and matched on a hash of its
+normalized title), however many providers or queries return it. Reads are
+a single indexed query on ``article_query``.
+
+Queries come from users, so the store tracks at most NEWS_MAX_QUERIES of
+them. A query nobody has read for NEWS_QUERY_IDLE seconds is pruned with
+its cursors and listing rows, and articles no query lists any more go too.
+"""
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, distinct, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models.article import Article, ArticleQuery, NewsCursor
+from services.news_service import NEWS_PROVIDERS, standardize_article
+
+# Query parameters that track the click rather than pick the page
+_TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'cmpid', 'ocid')
+_NON_WORD = re.compile(r'[\W_]+')
+# Article.url / Article.image column size; a cut-off URL would be a broken link
+MAX_URL_LENGTH = 2000
+
+
+class QueryLimitError(Exception):
+    """Raised instead of tracking a new query when NEWS_MAX_QUERIES are
+    tracked and none of them is idle"""
+
+
+def normalize_query(query):
+    return ' '.join(query.split()).casefold()
+
+
+def allowed_query(query):
+    """Whether ``query`` (normalized) may be served; any query is unless
+    NEWS_ALLOWED_QUERIES lists them"""
+    allowed = current_app.config['NEWS_ALLOWED_QUERIES']
+    return not allowed or query in {normalize_query(q) for q in allowed}
+
+
+def normalize_url(url):
+    """Scheme, ``www.``, fragment, trailing slash and tracking parameters dropped"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    params = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if not key.lower().startswith(_TRACKING_PARAMS))
+    return urlunsplit(('', host, parts.path.rstrip('/'), urlencode(params), ''))
+
+
+def normalize_title(title):
+    return _NON_WORD.sub(' ', title).strip().casefold()
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def parse_published(value):
+    """ISO 8601 timestamp -> naive UTC datetime, or None"""
+    if not value:
+        return None
+    try:
+        published = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if published.tzinfo is not None:
+        published = published.astimezone(timezone.utc).replace(tzinfo=None)
+    return published
+
+
+def _prepare(item, provider):
+    """A raw provider item as an ``article`` row, or None if it can't be keyed"""
+    article = standardize_article(item, provider)
+    title = article['title'] or ''
+    url = article['url'] if article['url'] not in (None, '', '#') else None
+    # NewsAPI keeps withdrawn articles in results under this title
+    if title == '[Removed]':
+        return None
+    if url is not None and len(url) > MAX_URL_LENGTH:
+        return None
+    image = article['image'] if article['image'] and len(article['image']) <= MAX_URL_LENGTH else None
+    title_key = normalize_title(title) if title != 'No title' else ''
+    if url is None and not title_key:
+        return None
+    return {
+        'url_hash': _hash(normalize_url(url) if url else 'title:' + title_key),
+        'title_hash': _hash(title_key) if title_key else None,
+        'provider': provider,
+        'external_id': (article['id'] or '')[:500],
+        'title': title[:500],
+        'url': url,
+        'image': image,
+        'content': article['content'],
+        'source': (article['source'] or '')[:200],
+        'published': parse_published(article['published']),
+    }
+
+
+def _insert_ignore(model, rows):
+    """INSERT ``rows``, skipping those that hit a unique key; another worker
+    may be storing the same rows at the same time"""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(model).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(model).on_conflict_do_nothing()
+    elif dialect in ('mysql', 'mariadb'):
+        statement = insert(model).prefix_with('IGNORE')
+    else:
+        # No portable upsert: insert row by row, each in a savepoint
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(model), [row])
+            except IntegrityError:
+                pass
+        return
+    db.session.execute(statement, rows)
+
+
+def _exempt_query():
+    """The warmer's query, kept whatever the limits"""
+    return normalize_query(current_app.config['NEWS_WARM_QUERY'])
+
+
+def prune_idle(now=None):
+    """Forget the queries nobody has read for NEWS_QUERY_IDLE seconds.
+
+    Reads refresh a query at least every NEWS_CACHE_TTL, so a query whose
+    last attempt is older than that is idle. Its cursors and listing rows
+    are deleted, then the articles no query lists any more. Returns the
+    number of queries pruned; the caller commits.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config['NEWS_QUERY_IDLE'])
+    idle = db.session.scalars(
+        select(NewsCursor.query)
+        .where(NewsCursor.query != _exempt_query())
+        .group_by(NewsCursor.query)
+        .having(func.max(NewsCursor.attempted_at) < cutoff)).all()
+    if not idle:
+        return 0
+    db.session.execute(delete(ArticleQuery).where(ArticleQuery.query.in_(idle)))
+    db.session.execute(delete(NewsCursor).where(NewsCursor.query.in_(idle)))
+    db.session.execute(delete(Article).where(~Article.id.in_(select(ArticleQuery.article_id))))
+    return len(idle)
+
+
+def _query_count():
+    return db.session.scalar(select(func.count(distinct(NewsCursor.query))))
+
+
+def _track(query):
+    """Make sure ``query`` has a cursor per provider, pruning idle queries
+    to make room; raises QueryLimitError if there is none"""
+    tracked = db.session.scalar(select(func.count()).select_from(NewsCursor).where(NewsCursor.query == query))
+    if tracked >= len(NEWS_PROVIDERS):
+        return
+    if not tracked and query != _exempt_query():
+        limit = current_app.config['NEWS_MAX_QUERIES']
+        if _query_count() >= limit and (not prune_idle() or _query_count() >= limit):
+            db.session.commit()
+            raise QueryLimitError(f"At most {limit} news queries are tracked; try again later")
+    _insert_ignore(NewsCursor, [{'query': query, 'provider': name} for name in NEWS_PROVIDERS])
+
+
+def ingest_state(query):
+    """``(fetched, due_at)`` for ``query``: whether any provider has answered
+    for it yet, and when the first provider falls due for a refresh"""
+    config = current_app.config
+    ttl = timedelta(seconds=config['NEWS_CACHE_TTL'])
+    retry = timedelta(seconds=config['NEWS_PARTIAL_CACHE_TIMEOUT'])
+    cursors = {provider: (fetched_at, attempted_at) for provider, fetched_at, attempted_at in db.session.execute(
+        select(NewsCursor.provider, NewsCursor.fetched_at, NewsCursor.attempted_at).where(NewsCursor.query == query))}
+    fetched = any(fetched_at is not None for fetched_at, _ in cursors.values())
+    due_at = None
+    for provider in NEWS_PROVIDERS:
+        fetched_at, attempted_at = cursors.get(provider, (None, None))
+        at = max(fetched_at + ttl if fetched_at else datetime.min,
+                 attempted_at + retry if attempted_at else datetime.min)
+        due_at = at if due_at is None else min(due_at, at)
+    return fetched, due_at
+
+
+def claim_due(query, margin=0):
+    """Claim the providers due for a refresh of ``query``; returns
+    ``{provider: newest published time seen, or None}``.
+
+    A provider is due once its last answer is older than NEWS_CACHE_TTL,
+    unless it was tried in the last NEWS_PARTIAL_CACHE_TIMEOUT seconds.
+    Claiming stamps ``attempted_at`` with a conditional UPDATE, so when
+    several workers refresh the same query only one calls each provider.
+    Raises QueryLimitError for a new query the store has no room for.
+    """
+    config = current_app.config
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=config['NEWS_CACHE_TTL'] - margin)
+    retry = now - timedelta(seconds=config['NEWS_PARTIAL_CACHE_TIMEOUT'])
+    _track(query)
+    claimed = []
+    for provider in NEWS_PROVIDERS:
+        result = db.session.execute(
+            update(NewsCursor)
+            .where(NewsCursor.query == query, NewsCursor.provider == provider,
+                   or_(NewsCursor.fetched_at.is_(None), NewsCursor.fetched_at < stale),
+                   or_(NewsCursor.attempted_at.is_(None), NewsCursor.attempted_at < retry))
+            .values(attempted_at=now))
+        if result.rowcount:
+            claimed.append(provider)
+    since = dict(db.session.execute(
+        select(NewsCursor.provider, NewsCursor.newest_published)
+        .where(NewsCursor.query == query, NewsCursor.provider.in_(claimed))).all()) if claimed else {}
+    db.session.commit()
+    return since
+
+
+def ingest(query, results):
+    """Store the articles in ``fetch_all_news`` results for ``query`` and
+    move the cursor of every provider that answered. Returns the number of
+    articles that were new to the store."""
+    now = datetime.utcnow()
+    rows = {}  # url_hash -> row, first provider wins
+    titles = {}  # title_hash -> url_hash
+    newest = {}
+    for provider, items in results.items():
+        for item in items or ():
+            row = _prepare(item, provider)
+            if row is None:
+                continue
+            if row['published'] and (provider not in newest or row['published'] > newest[provider]):
+                newest[provider] = row['published']
+            if row['url_hash'] in rows or row['title_hash'] in titles:
+                continue
+            rows[row['url_hash']] = row
+            if row['title_hash']:
+                titles[row['title_hash']] = row['url_hash']
+
+    added = 0
+    if rows:
+        ids = {}
+        for article_id, url_hash, title_hash in db.session.execute(
+                select(Article.id, Article.url_hash, Article.title_hash)
+                .where(or_(Article.url_hash.in_(list(rows)), Article.title_hash.in_(list(titles))))):
+            if url_hash in rows:
+                ids[url_hash] = article_id
+            if title_hash in titles:
+                ids.setdefault(titles[title_hash], article_id)
+        new = [dict(row, fetched_at=now) for url_hash, row in rows.items() if url_hash not in ids]
+        if new:
+            _insert_ignore(Article, new)
+            ids.update(db.session.execute(
+                select(Article.url_hash, Article.id).where(Article.url_hash.in_([row['url_hash'] for row in new]))).all())
+            added = len(new)
+        # Undated articles sort by when they were first seen
+        _insert_ignore(ArticleQuery, [
+            {'query': query, 'article_id': ids[url_hash], 'published': row['published'] or now}
+            for url_hash, row in rows.items() if url_hash in ids])
+
+    for provider, items in results.items():
+        if items is None:
+            continue  # the call failed; retried after NEWS_PARTIAL_CACHE_TIMEOUT
+        where = (NewsCursor.query == query, NewsCursor.provider == provider)
+        db.session.execute(update(NewsCursor).where(*where).values(fetched_at=now))
+        if provider in newest:
+            # Never move a cursor back; another worker may have got further
+            db.session.execute(
+                update(NewsCursor)
+                .where(*where, or_(NewsCursor.newest_published.is_(None),
+                                   NewsCursor.newest_published < newest[provider]))
+                .values(newest_published=newest[provider]))
+    db.session.commit()
+    return added
+
+
+_latest = (
+    select(Article.title, Article.url, Article.image, Article.content, Article.source,
+           Article.published, Article.external_id)
+    .join(ArticleQuery, ArticleQuery.article_id == Article.id)
+    .where(ArticleQuery.query == bindparam('query'))
+    .order_by(ArticleQuery.published.desc())
+    .limit(bindparam('limit'))
+)
+
+
+def latest_articles(query, limit):
+    """The newest ``limit`` stored articles for ``query``, newest first, in
+    the shape ``standardize_article`` returns"""
+    return [{
+        'title': title,
+        'url': url,
+        'image': image,
+        'content': content,
+        'source': source,
+        'published': published.strftime('%Y-%m-%dT%H:%M:%SZ') if published else None,
+        'id': external_id,
+    } for title, url, image, content, source, published, external_id
+        # Core execution on the session's connection skips the ORM's per-statement setup
+        in db.session.connection().execute(_latest, {'query': query, 'limit': max(limit, 0)})]
@@ -0,0 +1,105 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from config import Config
+from database import db
+from models.donation import Donation
+from metrics import stage
+
+# Threads are started on first submit, so this is safe to import in the gunicorn master
+_executor = ThreadPoolExecutor(max_workers=Config.DONATION_WORKERS, thread_name_prefix='donation')
+
+
+class PaymentError(Exception):
+    """Raised by a processor when a charge is declined"""
+
+
+class LocalPaymentProcessor:
+    """Stand-in for the payment provider: waits ``delay`` seconds and
+    returns a transaction id"""
+
+    def __init__(self, delay=1.5):
+        self.delay = delay
+
+    def charge(self, amount, currency, payment_method):
+        time.sleep(self.delay)
+        return f"TX{random.randint(100000000, 999999999)}"
+
+
+processor = LocalPaymentProcessor(delay=Config.PAYMENT_PROCESSING_DELAY)
+
+
+def _set_status(donation_id, status, from_status, **values):
+    """Move a donation from ``from_status`` to ``status`` in one UPDATE;
+    False when it wasn't in ``from_status`` (another worker has it)"""
+    result = db.session.execute(
+        update(Donation)
+        .where(Donation.id == donation_id, Donation.status == from_status)
+        .values(status=status, **values)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def process_donation(donation_id):
+    """Charge a pending donation and record the outcome. Needs an app context.
+
+    The donation is claimed first (pending -> processing), so one queued
+    twice, by a retry or by ``recover_stale_donations``, is charged once.
+    Any error other than a decline still marks it failed before re-raising.
+    """
+    if not _set_status(donation_id, 'processing', 'pending'):
+        return db.session.get(Donation, donation_id)
+    donation = db.session.get(Donation, donation_id)
+    amount, currency, payment_method = donation.amount, donation.currency, donation.payment_method
+    # End the read transaction so the pooled connection isn't held during the charge
+    db.session.commit()
+    try:
+        with stage('payment_charge'):
+            transaction_id = processor.charge(amount, currency, payment_method)
+        status = 'completed'
+    except PaymentError:
+        transaction_id, status = None, 'failed'
+    except Exception:
+        db.session.rollback()
+        _set_status(donation_id, 'failed', 'processing')
+        raise
+    _set_status(donation_id, status, 'processing', transaction_id=transaction_id)
+    return db.session.get(Donation, donation_id)
+
+
+def submit_donation(app, donation_id):
+    """Queue a pending donation on the background worker pool"""
+    def run():
+        with app.app_context():
+            try:
+                process_donation(donation_id)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Donation {donation_id} processing failed: {str(e)}")
+
+    return _executor.submit(run)
+
+
+def recover_stale_donations(stale_after):
+    """Deal with donations older than ``stale_after`` seconds that a worker
+    took and never finished (the queue is in memory and dies with it).
+
+    Ones still ``processing`` may or may not have been charged, so they are
+    marked failed rather than charged again. Ones still ``pending`` were
+    never claimed; their ids are returned for the caller to process or
+    submit again. Returns ``(pending_ids, failed_count)``.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    failed = db.session.execute(
+        update(Donation)
+        .where(Donation.status == 'processing', Donation.created_at < cutoff)
+        .values(status='failed')
+    ).rowcount
+    pending = db.session.scalars(
+        select(Donation.id).where(Donation.status == 'pending', Donation.created_at < cutoff)
+    ).all()
+    db.session.commit()
+    return pending, failed
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The backend imports its modules as top-level packages (config, ml, routes...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Config reads the environment at import time: keep the tests off the
+# instance database and away from the news providers
+_db_dir = tempfile.mkdtemp(prefix='disaster-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{Path(_db_dir, 'test.db').as_posix()}"
+os.environ['NEWS_WARMER_ENABLED'] = 'false'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    from database import db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def event():
+    """A valid /api/predict event; coordinates in degrees"""
+    return {
+        'year': 2020,
+        'latitude': 35.0,
+        'longitude': 139.0,
+        'dis_mag_value': 6.5,
+        'mag_scale_index': 2,
+        'country_code_index': 10,
+    }
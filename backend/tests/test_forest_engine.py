@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from ml.forest_engine import CompiledForest
+
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1)
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+
+def random_rows(n, seed=1):
+    return np.random.default_rng(seed).normal(scale=2.0, size=(n, 6))
+
+
+def test_matches_sklearn(forest):
+    engine = CompiledForest.from_sklearn(forest)
+    X = random_rows(1000)
+    np.testing.assert_array_equal(engine.predict_proba(X), forest.predict_proba(X))
+    np.testing.assert_array_equal(engine.predict(X), forest.predict(X))
+
+
+def test_matches_sklearn_across_chunks(forest, monkeypatch):
+    # Force several traversal chunks to check they are stitched back in order
+    monkeypatch.setattr('ml.forest_engine._MAX_CELLS', forest.n_estimators * 7)
+    X = random_rows(50, seed=2)
+    np.testing.assert_array_equal(CompiledForest.from_sklearn(forest).predict_proba(X), forest.predict_proba(X))
+
+
+def test_matches_sklearn_with_missing_values():
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(300, 4))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = (np.nan_to_num(X[:, 0]) > 0).astype(int)
+    forest = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    test = rng.normal(size=(200, 4))
+    test[rng.random(test.shape) < 0.2] = np.nan
+    np.testing.assert_array_equal(CompiledForest.from_sklearn(forest).predict_proba(test), forest.predict_proba(test))
+
+
+def test_save_and_load(forest, tmp_path):
+    engine = CompiledForest.from_sklearn(forest, source_sha256='abc')
+    engine.save(tmp_path / 'forest.joblib')
+    loaded = CompiledForest.load(tmp_path / 'forest.joblib')
+    X = random_rows(100, seed=4)
+    assert loaded.source_sha256 == 'abc'
+    np.testing.assert_array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+
+def test_rejects_wrong_width(forest):
+    with pytest.raises(ValueError):
+        CompiledForest.from_sklearn(forest).predict_proba(np.zeros((3, 5)))
+
+
+def test_shipped_model_matches_sklearn():
+    from ml.predict import registry
+    bundle = registry.bundle
+    # The forest sees scaled features, so standard normal rows cover its splits
+    X = np.random.default_rng(5).normal(size=(500, bundle.engine.n_features))
+    np.testing.assert_array_equal(bundle.engine.predict_proba(X), bundle.model.predict_proba(X))
@@ -0,0 +1,79 @@
+import pytest
+
+from ml.predict import COORDINATE_RANGE_ERROR, predict_batch, registry
+
+
+def post_batch(client, body, **params):
+    response = client.post('/api/predict/batch', json=body, query_string=params)
+    return response.status_code, response.get_json()
+
+
+def test_per_row_errors(client, event):
+    missing = {key: value for key, value in event.items() if key != 'year'}
+    events = [
+        event,
+        dict(event, year='abc'),
+        missing,
+        dict(event, dis_mag_value=float('inf')),
+        dict(event, latitude=95.0),
+        'not an event',
+        dict(event, year=2010),
+    ]
+    status, body = post_batch(client, events)
+
+    assert status == 200
+    assert body['count'] == len(events)
+    assert body['errors'] == 5
+    results = body['results']
+    assert [result['index'] for result in results] == list(range(len(events)))
+    assert [result['success'] for result in results] == [True, False, False, False, False, False, True]
+    assert results[1]['error'] == 'All fields must be numeric'
+    assert results[3]['error'] == 'All fields must be finite numbers'
+    assert results[4]['error'] == COORDINATE_RANGE_ERROR
+    assert results[0]['disaster_name']
+
+
+def test_matches_single_predictions(client, event):
+    events = [event, dict(event, year=1990, dis_mag_value=1.0), dict(event, latitude=-33.9, longitude=18.4)]
+    _, body = post_batch(client, {'events': events, 'debug': True})
+    for event, result in zip(events, body['results']):
+        single = client.post('/api/predict', json=dict(event, debug=True)).get_json()
+        assert result['original_data']['predicted_label'] == single['original_data']['predicted_label']
+
+
+def test_columnar_input(client, event):
+    columns = {key: [value, value] for key, value in event.items()}
+    columns['year'] = [2020, 'abc']
+    status, body = post_batch(client, columns)
+    assert status == 200
+    assert [result['success'] for result in body['results']] == [True, False]
+
+
+def test_top_k_is_clamped_to_the_number_of_classes(client, event):
+    n_classes = len(registry.bundle.engine.classes)
+    status, body = post_batch(client, {'events': [event], 'top_k': n_classes + 50})
+    assert status == 200
+    top = body['results'][0]['top_predictions']
+    assert len(top) == n_classes
+    probabilities = [entry['probability'] for entry in top]
+    assert probabilities == sorted(probabilities, reverse=True)
+    assert body['results'][0]['confidence'] == probabilities[0]
+
+
+@pytest.mark.parametrize('top_k', [0, -1, 'many'])
+def test_invalid_top_k(client, event, top_k):
+    status, body = post_batch(client, [event], top_k=top_k)
+    assert status == 400
+    assert body['error'] == 'top_k must be a positive integer'
+
+
+def test_top_k_matches_the_prediction(event):
+    result = predict_batch([event], top_k=3)[0]
+    assert len(result['top_predictions']) == 3
+    assert result['top_predictions'][0]['disaster_name'] == result['disaster_name']
+
+
+def test_single_row_rejects_non_numeric_fields(client, event):
+    response = client.post('/api/predict', json=dict(event, year='abc'))
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'All fields must be numeric'
@@ -0,0 +1,59 @@
+import json
+
+from ml.predict import predict_batch, predict_stream
+
+
+def events(event, n):
+    return [dict(event, year=1950 + i, dis_mag_value=float(i)) for i in range(n)]
+
+
+def test_chunks_keep_input_order_and_indices(event):
+    records = events(event, 10)
+    records[4] = dict(event, year='abc')
+    records[7] = None  # a line that was not valid JSON
+
+    results = list(predict_stream(iter(records), chunk_size=3))
+
+    assert [result['index'] for result in results] == list(range(10))
+    assert results[4] == {'index': 4, 'success': False, 'error': 'All fields must be numeric'}
+    assert results[7]['success'] is False
+    assert results[7]['error'] == 'Row is not valid JSON'
+    expected = predict_batch([record for record in records], debug=True)
+    for i in (0, 2, 3, 5, 9):
+        assert results[i]['original_data'] == expected[i]['original_data']
+
+
+def test_chunk_size_does_not_change_results(event):
+    records = events(event, 11)
+    whole = list(predict_stream(iter(records), chunk_size=100))
+    for chunk_size in (1, 4, 11):
+        assert list(predict_stream(iter(records), chunk_size=chunk_size)) == whole
+
+
+def test_stream_is_lazy(event):
+    consumed = []
+
+    def source():
+        for i, record in enumerate(events(event, 9)):
+            consumed.append(i)
+            yield record
+
+    stream = predict_stream(source(), chunk_size=3)
+    next(stream)
+    assert len(consumed) == 3
+
+
+def test_csv_endpoint(client, event):
+    header = ','.join(event)
+    rows = [','.join(str(value) for value in dict(event, year=2000 + i).values()) for i in range(5)]
+    rows[2] = rows[2].replace('2002', 'abc', 1)
+    response = client.post('/api/predict/stream', query_string={'format': 'csv', 'chunk_size': 2},
+                           data='\n'.join([header] + rows) + '\n', content_type='text/csv')
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    results, summary = lines[:-1], lines[-1]
+    assert [result['index'] for result in results] == list(range(5))
+    assert [result['success'] for result in results] == [True, True, False, True, True]
+    assert summary['count'] == 5
+    assert summary['errors'] == 1
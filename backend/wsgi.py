@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# Add the backend directory to the Python path (as app.py does)
+sys.path.append(str(Path(__file__).parent))
+
+from app import create_app
+
+app = create_app()
@@ -10,6 +10,7 @@ import MapComponent from './components/MapComponent';
 import DonationForm from './components/DonationForm';
 import DisasterPrediction from './components/DisasterPrediction';
 import Navbar from './components/Navbar'; // Make sure this is the updated Navbar
+import { authHeaders, getAuthToken } from './auth';
 
 const App = () => {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
@@ -17,13 +18,19 @@ const App = () => {
   const [isLoading, setIsLoading] = useState(true);
 
   useEffect(() => {
-    const token = localStorage.getItem('authToken');
-    if (token) {
-      const mockUser = { id: 1, name: "Test User" }; // Replace with real fetch
-      setCurrentUser(mockUser);
-      setIsAuthenticated(true);
+    if (!getAuthToken()) {
+      setIsLoading(false);
+      return;
     }
-    setIsLoading(false);
+    // The stored token names the user; drop it if the backend no longer accepts it
+    fetch(`${import.meta.env.VITE_API_BASE_URL}/me`, { headers: authHeaders() })
+      .then((response) => (response.ok ? response.json() : Promise.reject(response)))
+      .then((user) => {
+        setCurrentUser(user);
+        setIsAuthenticated(true);
+      })
+      .catch(() => localStorage.removeItem('authToken'))
+      .finally(() => setIsLoading(false));
   }, []);
 
   const handleLogout = () => {
@@ -0,0 +1,7 @@
+// The token /login returns, sent as a bearer token on API calls that act for the user
+export const getAuthToken = () => localStorage.getItem('authToken');
+
+export const authHeaders = () => {
+  const token = getAuthToken();
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
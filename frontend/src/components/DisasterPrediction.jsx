@@ -14,13 +14,13 @@ function DisasterPrediction() {
   // Ref for the output/error message section
   const outputRef = useRef(null);
 
+  // Same order as the model's magnitude scale encoder (see MAGNITUDE_SCALE_NAMES in ml/bundle.py)
   const magnitudeScaleMapping = {
     0: "Km²",
-    1: "Richter Scale",
-    2: "Wind Speed (km/h)",
-    3: "Water Level (m)",
-    4: "Temperature (°C)",
-    5: "Rainfall (mm)"
+    1: "Wind Speed (km/h)",
+    2: "Richter Scale",
+    3: "Vaccinated",
+    4: "Temperature (°C)"
   };
 
   const countryCodeMapping = {
@@ -78,6 +78,7 @@ function DisasterPrediction() {
           country_code_index: parseInt(countryCode),
           longitude: parseFloat(longitude),
           latitude: parseFloat(latitude),
+          top_k: 3,
         }),
       });
 
@@ -233,6 +234,18 @@ function DisasterPrediction() {
             <p><strong>Magnitude Scale:</strong> {prediction.magnitude_scale}</p>
             <p><strong>Magnitude Value:</strong> {prediction.magnitude_value}</p>
             <p><strong>Country:</strong> {countryCodeMapping[countryCode]}</p>
+            {prediction.top_predictions && (
+              <div className="mt-2">
+                <strong>Most likely:</strong>
+                <ul className="list-disc list-inside">
+                  {prediction.top_predictions.map((item) => (
+                    <li key={item.label}>
+                      {item.disaster_name} ({(item.probability * 100).toFixed(1)}%)
+                    </li>
+                  ))}
+                </ul>
+              </div>
+            )}
           </div>
         )}
       </div>
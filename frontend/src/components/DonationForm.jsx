@@ -1,5 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { authHeaders } from '../auth';
+
+const STATUS_POLL_INTERVAL_MS = 500;
+const STATUS_POLL_TIMEOUT_MS = 30000;
 
 const DonationForm = ({ userId }) => {
     const [amount, setAmount] = useState('');
@@ -25,6 +29,7 @@ const DonationForm = ({ userId }) => {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    ...authHeaders(),
                 },
                 credentials: 'include',
                 body: JSON.stringify({
@@ -40,7 +45,30 @@ const DonationForm = ({ userId }) => {
                 throw new Error(errorData.error || 'Donation failed');
             }
 
-            const result = await response.json();
+            let result = await response.json();
+            // Payments are processed in the background; poll until settled, or give up
+            // after a while and let the donor know it is still going through
+            const deadline = Date.now() + STATUS_POLL_TIMEOUT_MS;
+            while (result.status === 'pending' || result.status === 'processing') {
+                if (Date.now() >= deadline) {
+                    throw new Error(
+                        'Your donation is still processing. It will be recorded once the payment clears, so please don\'t submit it again.'
+                    );
+                }
+                await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+                const statusResponse = await fetch(
+                    `${import.meta.env.VITE_API_BASE_URL}/api/donate/${result.donation_id}`,
+                    { credentials: 'include', headers: authHeaders() }
+                );
+                result = await statusResponse.json();
+                if (!statusResponse.ok) {
+                    throw new Error(result.error || 'Donation failed');
+                }
+            }
+
+            if (result.status === 'failed') {
+                throw new Error(result.message || 'Donation failed');
+            }
             setTransaction(result);
         } catch (error) {
             console.error('Donation error:', error);
@@ -29,8 +29,7 @@ const Login = ({ setIsAuthenticated, setCurrentUser }) => {
 
       localStorage.setItem("authToken", response.data.token);
       setIsAuthenticated(true);
-      const mockUser = { id: 1, name: "Test User" }; // Replace later
-      setCurrentUser(mockUser);
+      setCurrentUser(response.data.user);
       toast.success("Logged in successfully!");
       navigate("/home");
     } catch (error) {
@@ -0,0 +1,68 @@
+"""Add the news article store (article, article_query, news_cursor).
+
+Revision ID: c4d7e1a95b62
+Revises: 8b2e4d6f9a31
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e1a95b62'
+down_revision = '8b2e4d6f9a31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('article',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url_hash', sa.String(length=64), nullable=False),
+    sa.Column('title_hash', sa.String(length=64), nullable=True),
+    sa.Column('provider', sa.String(length=20), nullable=False),
+    sa.Column('external_id', sa.String(length=500), nullable=True),
+    sa.Column('title', sa.String(length=500), nullable=True),
+    sa.Column('url', sa.String(length=2000), nullable=True),
+    sa.Column('image', sa.String(length=2000), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('source', sa.String(length=200), nullable=True),
+    sa.Column('published', sa.DateTime(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('url_hash')
+    )
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_article_title_hash'), ['title_hash'], unique=False)
+
+    op.create_table('article_query',
+    sa.Column('query', sa.String(length=200), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('published', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['article.id'], ),
+    sa.PrimaryKeyConstraint('query', 'article_id')
+    )
+    with op.batch_alter_table('article_query', schema=None) as batch_op:
+        batch_op.create_index('ix_article_query_query_published', ['query', 'published'], unique=False)
+
+    op.create_table('news_cursor',
+    sa.Column('query', sa.String(length=200), nullable=False),
+    sa.Column('provider', sa.String(length=20), nullable=False),
+    sa.Column('newest_published', sa.DateTime(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    sa.Column('attempted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('query', 'provider')
+    )
+
+
+def downgrade():
+    op.drop_table('news_cursor')
+    with op.batch_alter_table('article_query', schema=None) as batch_op:
+        batch_op.drop_index('ix_article_query_query_published')
+
+    op.drop_table('article_query')
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_article_title_hash'))
+
+    op.drop_table('article')